@@ -0,0 +1,144 @@
+"""
+End-to-end cost of a chain: one CLI process per step versus one chain command.
+
+Runs the same steps on the same collection both ways and times them:
+``cli <step>`` once per step, each in a fresh interpreter with its own
+imports, connections and schema profile, against ``cli chain <steps>``,
+which runs them in one process on shared connections and hands the
+profiled schema from step to step. Both modes migrate into a fresh table
+of their own, and the row counts are checked after every run.
+
+A MongoDB server is needed for the source; the collection is filled with
+--documents synthetic documents first (pass 0 to use an existing one).
+The target is a temporary SQLite file unless --sql-uri is given.
+
+Run from the src directory:
+    python -m benchmarks.chain_bench --documents 20000 --repeat 3
+    python -m benchmarks.chain_bench --collection users --documents 0 --steps migrate
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from sqlalchemy import text
+
+from benchmarks.generators import SHAPES, SyntheticCollection
+from connectors import MongoDBConnector, SQLConnector, get_manager
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(SRC_DIR, 'cli.py')
+# validate is left out: the command compares checksums, the chain step only checks the schema
+STEPS = ('schema', 'migrate')
+
+
+def step_args(step: str, args: argparse.Namespace, sql_uri: str, table: str) -> List[str]:
+    """Arguments of one standalone command, as the chain passes them to its steps."""
+    command = [step, '--mongodb-uri', args.mongodb_uri, '--collection', args.collection]
+    if step == 'migrate':
+        command += ['--sql-uri', sql_uri, '--table', table, '--batch-size', str(args.batch_size)]
+    return command
+
+
+def timed_run(commands: List[List[str]]) -> float:
+    """Wall time of running the CLI commands one after another."""
+    start = time.perf_counter()
+    for command in commands:
+        result = subprocess.run([sys.executable, CLI] + command, cwd=SRC_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{command[0]} failed:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+    return time.perf_counter() - start
+
+
+def count_rows(target: SQLConnector, table: str) -> int:
+    with target.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def seed(mongodb_uri: str, collection: str, shape: str, count: int, batch_size: int = 5000):
+    source = MongoDBConnector(mongodb_uri)
+    if not source.connect():
+        raise SystemExit(1)
+    target = source.get_collection(collection)
+    target.drop()
+    documents = SyntheticCollection(shape, count)
+    for start in range(0, count, batch_size):
+        target.insert_many([documents.document(i) for i in range(start, min(start + batch_size, count))])
+    source.disconnect()
+
+
+def document_count(mongodb_uri: str, collection: str) -> int:
+    source = MongoDBConnector(mongodb_uri)
+    if not source.connect():
+        raise SystemExit(1)
+    try:
+        return source.get_collection(collection).count_documents({})
+    finally:
+        source.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', nargs='+', default=list(STEPS), choices=STEPS,
+                        help="Steps of the chain, in order")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of each mode; the median counts")
+    parser.add_argument('--documents', type=int, default=10000,
+                        help="Synthetic documents written to the collection first (0: use it as it is)")
+    parser.add_argument('--shape', default='flat', choices=list(SHAPES), help="Shape of the synthetic documents")
+    parser.add_argument('--collection', default='chain_bench')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--mongodb-uri', default=os.getenv("MONGODB_URI", "mongodb://localhost:27017/etl_bench"))
+    parser.add_argument('--sql-uri', default=None, help="Target database (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    if args.documents:
+        seed(args.mongodb_uri, args.collection, args.shape, args.documents)
+    expected = document_count(args.mongodb_uri, args.collection)
+
+    tmp_dir = None
+    sql_uri = args.sql_uri
+    if sql_uri is None:
+        tmp_dir = tempfile.mkdtemp(prefix='chain_bench')
+        sql_uri = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    target = SQLConnector(sql_uri)
+    if not target.connect():
+        raise SystemExit(1)
+
+    modes = {
+        'process per step': ('chain_bench_steps', lambda table: [step_args(step, args, sql_uri, table)
+                                                                 for step in args.steps]),
+        'one chain': ('chain_bench_chain', lambda table: [['chain'] + args.steps + step_args(
+            'migrate', args, sql_uri, table)[1:]]),
+    }
+    try:
+        print(f"{' '.join(args.steps)} on {args.collection} ({expected} documents) into "
+              f"{target.engine.dialect.name}, median of {args.repeat} runs")
+        print(f"{'mode':<18} {'seconds':>10}")
+        times = {}
+        for mode, (table, commands) in modes.items():
+            runs = []
+            for _ in range(args.repeat):
+                target.drop_table(table)
+                runs.append(timed_run(commands(table)))
+                if 'migrate' in args.steps and count_rows(target, table) != expected:
+                    raise RuntimeError(f"{mode} wrote {count_rows(target, table)} rows, expected {expected}")
+            times[mode] = statistics.median(runs)
+            print(f"{mode:<18} {times[mode]:>10.2f}")
+            target.drop_table(table)
+        saved = times['process per step'] - times['one chain']
+        print(f"one chain saves {saved:.2f}s ({saved / times['process per step']:.0%})")
+    finally:
+        target.disconnect()
+        get_manager().close()
+        if tmp_dir:
+            for name in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, name))
+            os.rmdir(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Micro-benchmark for the BSON -> SQL value converters.
+
+For every type in the conversion registry, times its converter on the way
+in and its decoder on the way back as resolved for one dialect, and the
+per-value dispatch used for columns of several types. JSON columns are
+timed with the orjson encoder when it is installed and with json.
+
+Run from the src directory:
+    python -m benchmarks.convert_bench --values 200000
+    python -m benchmarks.convert_bench --dialect postgresql --types Decimal128 UUID dict
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from bson import Binary, Code, Decimal128, Int64, MaxKey, MinKey, ObjectId, Regex, Timestamp
+
+from transformers import REGISTRY
+from transformers import conversions
+
+START = datetime(2024, 1, 1)
+
+# type name: value of row i, in the shapes the profiler names that way
+SAMPLES: Dict[str, Callable[[int], Any]] = {
+    'str': lambda i: f"value-{i}",
+    'int': lambda i: i,
+    'float': lambda i: i * 0.5,
+    'bool': lambda i: i % 2 == 0,
+    'bytes': lambda i: i.to_bytes(8, 'little'),
+    'datetime': lambda i: START + timedelta(seconds=i),
+    'ObjectId': lambda i: ObjectId(i.to_bytes(12, 'big')),
+    'UUID': lambda i: uuid.UUID(int=i),
+    'Int64': lambda i: Int64(i * 1000003),
+    'Binary': lambda i: Binary(i.to_bytes(16, 'little'), 4),
+    'Timestamp': lambda i: Timestamp(1700000000 + i, i % 100),
+    'Decimal128': lambda i: Decimal128(f"{i}.{i % 100:02d}"),
+    'Regex': lambda i: Regex(f"^v{i % 10}"),
+    'Code': lambda i: Code(f"return {i}"),
+    'MinKey': lambda i: MinKey(),
+    'MaxKey': lambda i: MaxKey(),
+    'dict': lambda i: {'sku': f"s{i}", 'qty': i % 7, 'price': i * 0.25, 'tags': ['a', 'b']},
+    'list': lambda i: [i, i + 1, {'k': f"v{i}"}],
+}
+
+
+def timed(fn: Callable[[], Any], repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def convert_all(convert, values: List[Any]) -> List[Any]:
+    return list(map(convert, values)) if convert else list(values)
+
+
+def bench_type(type_name: str, values: List[Any], dialect: str, repeat: int) -> Dict[str, float]:
+    """Seconds to convert the values in, back out, and in through per-value dispatch."""
+    info = {'type': type_name, 'types': [type_name]}
+    to_sql = REGISTRY.converter(info, dialect)
+    from_sql = REGISTRY.decoder(info, dialect)
+    stored = convert_all(to_sql, values)
+    dispatch = REGISTRY.value_converter(dialect)
+    return {
+        'to_sql': timed(lambda: convert_all(to_sql, values), repeat),
+        'from_sql': timed(lambda: convert_all(from_sql, stored), repeat),
+        'dispatch': timed(lambda: convert_all(dispatch, values), repeat),
+    }
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:>14,.0f}" if seconds else f"{'-':>14}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', type=int, default=100000, help="Values per type and run")
+    parser.add_argument('--dialect', default='', help="Dialect whose conversions are timed (default: generic)")
+    parser.add_argument('--types', nargs='+', default=list(SAMPLES), choices=list(SAMPLES))
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the fastest counts")
+    args = parser.parse_args()
+
+    print(f"{args.values} values per type, dialect {args.dialect or 'generic'}, "
+          f"JSON with {'orjson' if conversions.orjson else 'json'}")
+    print(f"{'type':<12} {'to SQL/sec':>14} {'from SQL/sec':>14} {'dispatch/sec':>14}")
+    for type_name in args.types:
+        make = SAMPLES[type_name]
+        values = [make(i) for i in range(args.values)]
+        seconds = bench_type(type_name, values, args.dialect, args.repeat)
+        print(f"{type_name:<12} {rate(args.values, seconds['to_sql'])} {rate(args.values, seconds['from_sql'])} "
+              f"{rate(args.values, seconds['dispatch'])}")
+
+    aware = [(START + timedelta(seconds=i)).replace(tzinfo=timezone.utc) for i in range(args.values)]
+    to_sql = REGISTRY.converter({'type': 'datetime'}, args.dialect)
+    print(f"{'datetime+tz':<12} {rate(args.values, timed(lambda: convert_all(to_sql, aware), args.repeat))}")
+
+    documents = [SAMPLES['dict'](i) for i in range(args.values)]
+    print(f"\n{'JSON encoder':<12} {'values/sec':>14}")
+    encoders = {'json': conversions._std_json_dumps}
+    if conversions.orjson:
+        encoders['orjson'] = conversions.json_dumps
+    for name, encode in encoders.items():
+        print(f"{name:<12} {rate(args.values, timed(lambda: convert_all(encode, documents), args.repeat))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Synthetic document generators for the benchmarks.
+
+Every shape is deterministic for a seed and document index, so a
+collection of any size can be regenerated on every scan instead of held in
+memory, and two runs of a benchmark see the same documents.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator
+
+from bson import ObjectId
+
+EPOCH = datetime(2024, 1, 1)
+WIDE_FIELDS = 200
+NESTED_DEPTH = 5
+
+
+def object_id(index: int) -> ObjectId:
+    """ObjectId that sorts in index order."""
+    return ObjectId(f"{index:024x}")
+
+
+def flat_document(i: int, rng: random.Random) -> Dict[str, Any]:
+    """A dozen scalar fields of the common BSON types."""
+    return {
+        '_id': object_id(i),
+        'user_id': object_id(rng.randrange(1, 10 ** 6)),
+        'name': f"user{i}",
+        'email': f"user{i}@example.com",
+        'age': rng.randrange(18, 90),
+        'score': rng.random() * 100,
+        'active': rng.random() < 0.8,
+        'country': rng.choice(('DE', 'FR', 'IN', 'US', 'BR', 'JP')),
+        'created': EPOCH + timedelta(seconds=i),
+        'balance': round(rng.uniform(-1000, 1000), 2),
+        'visits': rng.randrange(0, 10000),
+        'note': None if i % 7 else f"note {i}",
+    }
+
+
+def nested_document(i: int, rng: random.Random) -> Dict[str, Any]:
+    """Subdocuments NESTED_DEPTH levels deep, a few scalars per level."""
+    def level(depth: int) -> Dict[str, Any]:
+        node = {'id': i * NESTED_DEPTH + depth, 'label': f"n{i}-{depth}", 'value': rng.random()}
+        if depth < NESTED_DEPTH:
+            node['child'] = level(depth + 1)
+        return node
+
+    return {
+        '_id': object_id(i),
+        'name': f"doc{i}",
+        'created': EPOCH + timedelta(seconds=i),
+        'address': {'street': f"{i} Main St", 'city': rng.choice(('Berlin', 'Paris', 'Pune')),
+                    'geo': {'lat': rng.uniform(-90, 90), 'lng': rng.uniform(-180, 180)}},
+        'meta': level(1),
+    }
+
+
+def array_document(i: int, rng: random.Random) -> Dict[str, Any]:
+    """Arrays of scalars and of subdocuments, from empty to a few dozen elements."""
+    return {
+        '_id': object_id(i),
+        'order_no': i,
+        'created': EPOCH + timedelta(seconds=i),
+        'tags': [f"t{rng.randrange(50)}" for _ in range(rng.randrange(0, 8))],
+        'scores': [rng.random() for _ in range(rng.randrange(0, 20))],
+        'items': [{'sku': f"sku{rng.randrange(10 ** 4)}", 'qty': rng.randrange(1, 10),
+                   'price': round(rng.uniform(1, 500), 2)}
+                  for _ in range(rng.randrange(0, 30))],
+    }
+
+
+def wide_document(i: int, rng: random.Random) -> Dict[str, Any]:
+    """WIDE_FIELDS top-level scalar fields, rotating through int, float, string and bool."""
+    doc: Dict[str, Any] = {'_id': object_id(i)}
+    for k in range(WIDE_FIELDS):
+        kind = k % 4
+        if kind == 0:
+            doc[f"c{k:03d}"] = rng.randrange(10 ** 6)
+        elif kind == 1:
+            doc[f"c{k:03d}"] = rng.random()
+        elif kind == 2:
+            doc[f"c{k:03d}"] = f"v{i}-{k}"
+        else:
+            doc[f"c{k:03d}"] = rng.random() < 0.5
+    return doc
+
+
+SHAPES: Dict[str, Callable[[int, random.Random], Dict[str, Any]]] = {
+    'flat': flat_document,
+    'nested': nested_document,
+    'arrays': array_document,
+    'wide': wide_document,
+}
+
+
+class SyntheticCollection:
+    """count documents of one shape, generated again on every iteration in ascending _id order."""
+
+    # documents come out sorted by this key, so ordered scans need no sort
+    sorted_by = '_id'
+
+    def __init__(self, shape: str, count: int, seed: int = 0):
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown shape: {shape}. Available: {', '.join(SHAPES)}")
+        self.shape = shape
+        self.count = count
+        self.seed = seed
+
+    def document(self, index: int) -> Dict[str, Any]:
+        return SHAPES[self.shape](index, random.Random(self.seed * 1_000_003 + index))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.document(i) for i in range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f"SyntheticCollection({self.shape!r}, {self.count}, seed={self.seed})"
@@ -0,0 +1,160 @@
+"""
+In-memory stand-in for the MongoDB connector.
+
+Serves lists of documents or SyntheticCollections through the methods the
+Migrator calls on a source, so the pipeline can be benchmarked without a
+server. Queries support equality and the $gt/$gte/$lt/$lte/$ne/$in
+operators joined by $and, which covers key ranges and watermarks.
+Projections, hints and raw BSON are ignored.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from connectors.connector import Connector
+from connectors.mongodb import SCAN_MODES, CursorOptions, KeyRange, ScanPlan, key_type
+from transformers.flatten import DEFAULT_MAX_DEPTH
+from transformers.profiler import profile_documents
+
+_MISSING = object()
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '$gt': lambda value, bound: value is not None and value > bound,
+    '$gte': lambda value, bound: value is not None and value >= bound,
+    '$lt': lambda value, bound: value is not None and value < bound,
+    '$lte': lambda value, bound: value is not None and value <= bound,
+    '$ne': lambda value, bound: value != bound,
+    '$in': lambda value, bound: value in bound,
+}
+
+
+def _get(document: Dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key, _MISSING)
+        if value is _MISSING:
+            return None
+    return value
+
+
+def matches(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Whether a document satisfies a query in the supported subset."""
+    for field, condition in (query or {}).items():
+        if field == '$and':
+            if not all(matches(document, part) for part in condition):
+                return False
+            continue
+        value = _get(document, field)
+        if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            for op, bound in condition.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f"MemorySource does not support {op}")
+                if not _OPERATORS[op](value, bound):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class MemorySource(Connector):
+    """A source whose collections are Python iterables of documents."""
+
+    def __init__(self, collections: Optional[Dict[str, Iterable[Dict[str, Any]]]] = None,
+                 uri: str = 'memory://'):
+        super().__init__(uri)
+        self.collections: Dict[str, Iterable[Dict[str, Any]]] = dict(collections or {})
+
+    def connect(self) -> bool:
+        return True
+
+    def validate_connection(self) -> bool:
+        return True
+
+    def disconnect(self):
+        pass
+
+    def get_collection(self, collection_name: str) -> Iterable[Dict[str, Any]]:
+        if collection_name not in self.collections:
+            raise ValueError(f"Unknown collection: {collection_name}")
+        return self.collections[collection_name]
+
+    def find(self, collection_name: str, query: Optional[Dict[str, Any]] = None,
+             sort: Optional[List[Tuple[str, int]]] = None,
+             options: Optional[CursorOptions] = None) -> Iterator[Dict[str, Any]]:
+        collection = self.get_collection(collection_name)
+        documents: Iterable[Dict[str, Any]] = collection
+        if sort and [tuple(s) for s in sort] != [(getattr(collection, 'sorted_by', None), 1)]:
+            for key, direction in reversed(sort):
+                documents = sorted(documents, key=lambda doc: (_get(doc, key) is not None, _get(doc, key)),
+                                   reverse=direction < 0)
+        if not query:
+            return iter(documents)
+        return (doc for doc in documents if matches(doc, query))
+
+    def get_document_count(self, collection_name: str, query: Optional[Dict[str, Any]] = None) -> int:
+        collection = self.get_collection(collection_name)
+        if not query and hasattr(collection, '__len__'):
+            return len(collection)
+        return sum(1 for _ in self.find(collection_name, query))
+
+    def get_collection_schema(self, collection_name: str, sample_size: int = 1000, full_scan: bool = False,
+                              workers: int = 1, max_depth: int = DEFAULT_MAX_DEPTH) -> Dict[str, Any]:
+        """Profile the first sample_size documents, or all of them with full_scan."""
+        documents = self.find(collection_name)
+        if not full_scan:
+            documents = (doc for _, doc in zip(range(sample_size), documents))
+        return profile_documents(documents, max_depth).to_schema(complete=full_scan)
+
+    def get_partitions(self, collection_name: str, partitions: int, key: str = '_id',
+                       query: Optional[Dict[str, Any]] = None) -> List[KeyRange]:
+        """One unbounded range: worker processes cannot reach an in-memory collection."""
+        return [KeyRange(key)]
+
+    def key_types(self, collection_name: str, key: str = '_id', query: Optional[Dict[str, Any]] = None) -> List[str]:
+        types = []
+        for doc in self.find(collection_name, query):
+            bracket = key_type(_get(doc, key))
+            if bracket not in types:
+                types.append(bracket)
+        return types
+
+    def plan_scan(self, mode: str = 'auto', key: str = '_id', resumable: bool = False,
+                  hint: Optional[Any] = None) -> ScanPlan:
+        if mode not in SCAN_MODES:
+            raise ValueError(f"Unknown scan mode: {mode}. Available: {', '.join(SCAN_MODES)}")
+        if mode == 'auto':
+            mode = 'keyset' if resumable else 'natural'
+        return ScanPlan(mode, key, None, ordered=mode == 'keyset' or resumable)
+
+    def explain_scan(self, collection_name: str, query: Optional[Dict[str, Any]] = None,
+                     sort: Optional[List[Tuple[str, int]]] = None, hint: Optional[Any] = None) -> List[str]:
+        return []
+
+    def iter_batches(self, collection_name: str, batch_size: int = 1000, query: Optional[Dict[str, Any]] = None,
+                     sort: Optional[List[Tuple[str, int]]] = None,
+                     options: Optional[CursorOptions] = None,
+                     next_size: Optional[Callable[[], int]] = None) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        size = next_size() if next_size else batch_size
+        for doc in self.find(collection_name, query, sort, options):
+            batch.append(doc)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+                size = next_size() if next_size else batch_size
+        if batch:
+            yield batch
+
+    def scan_batches(self, collection_name: str, batch_size: int, query: Optional[Dict[str, Any]] = None,
+                     scan: Optional[ScanPlan] = None,
+                     options: Optional[CursorOptions] = None,
+                     next_size: Optional[Callable[[], int]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Keyset pages over unchanging data are one ordered scan, so every mode streams once."""
+        scan = scan or ScanPlan('natural')
+        yield from self.iter_batches(collection_name, batch_size, query, scan.sort, options, next_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
@@ -0,0 +1,235 @@
+"""
+Benchmark suite over synthetic collections, with no MongoDB or SQL server needed.
+
+For every document shape (flat, nested, arrays, wide) and collection size,
+measures:
+    schema     get_collection_schema on a sample of the collection
+    transform  the compiled column plan turning documents into rows
+    insert     SQLConnector.insert_data of the rows into a SQLite file
+    migrate    the whole Migrator.migrate path from the in-memory source
+               into a SQLite file, checkpoints included
+
+Documents are generated on the fly, so sizes up to 10M only cost time.
+Generation is excluded from the schema, transform and insert timings and
+stands in for the server in the migrate timing. Each measurement is the
+best of --repeat runs.
+
+Results can be saved as a JSON baseline, and a later run compared with it:
+a docs/sec drop larger than --tolerance is reported as a regression and
+the exit status is 1.
+
+Run from the src directory:
+    python -m benchmarks.suite --sizes 10000 100000 --save baseline.json
+    python -m benchmarks.suite --sizes 10000 100000 --baseline baseline.json
+    python -m benchmarks.suite --shapes flat wide --stages transform migrate --sizes 1000000
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from connectors import SQLConnector, get_manager
+from migrator import Migrator
+from transformers import compile_plan
+
+from .generators import SHAPES, SyntheticCollection
+from .memory_source import MemorySource
+
+STAGES = ('schema', 'transform', 'insert', 'migrate')
+# docs/sec may drop this much against the baseline before it counts as a regression
+DEFAULT_TOLERANCE = 0.15
+
+
+def best_of(repeat: int, run: Callable[[], float]) -> float:
+    """Smallest of repeat timings; run returns the seconds it measured."""
+    return min(run() for _ in range(repeat))
+
+
+class Case:
+    """One shape and size: its source, profiled schema and a scratch directory for SQLite files."""
+
+    def __init__(self, shape: str, docs: int, batch_size: int, sample_size: int, work_dir: str, seed: int = 0):
+        self.shape = shape
+        self.docs = docs
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+        self.work_dir = work_dir
+        self.source = MemorySource({shape: SyntheticCollection(shape, docs, seed)})
+        self.schema = self.source.get_collection_schema(shape, sample_size=sample_size)
+        self.plan = compile_plan(self.schema, name=shape)
+        self._runs = 0
+
+    def sql_uri(self) -> str:
+        """A new SQLite file for each run, so no run appends to the previous one."""
+        self._runs += 1
+        return f"sqlite:///{os.path.join(self.work_dir, f'{self.shape}_{self.docs}_{self._runs}.db')}"
+
+    def time_schema(self) -> float:
+        start = time.perf_counter()
+        self.source.get_collection_schema(self.shape, sample_size=self.sample_size)
+        return time.perf_counter() - start
+
+    def time_transform(self) -> float:
+        seconds = 0.0
+        for batch in self.source.iter_batches(self.shape, self.batch_size):
+            start = time.perf_counter()
+            self.plan.rows(batch)
+            seconds += time.perf_counter() - start
+        return seconds
+
+    def time_insert(self) -> float:
+        connector = SQLConnector(self.sql_uri())
+        connector.connect()
+        try:
+            connector.create_table(self.shape, self.plan.table_schema())
+            columns = list(self.plan.columns)
+            seconds = 0.0
+            for batch in self.source.iter_batches(self.shape, self.batch_size):
+                data = [dict(zip(columns, row)) for row in self.plan.rows(batch)]
+                start = time.perf_counter()
+                if not connector.insert_data(self.shape, data):
+                    raise RuntimeError(f"insert_data failed for {self.shape}")
+                seconds += time.perf_counter() - start
+            return seconds
+        finally:
+            connector.disconnect()
+
+    def time_migrate(self) -> float:
+        connector = SQLConnector(self.sql_uri())
+        migrator = Migrator(connector, self.source)
+        try:
+            start = time.perf_counter()
+            migrator.migrate(self.shape, self.shape, batch_size=self.batch_size, collection_schema=self.schema)
+            return time.perf_counter() - start
+        finally:
+            connector.disconnect()
+
+    def measured_docs(self, stage: str) -> int:
+        return min(self.sample_size, self.docs) if stage == 'schema' else self.docs
+
+
+def result_key(stage: str, shape: str, docs: int) -> str:
+    return f"{stage}:{shape}:{docs}"
+
+
+def run_suite(shapes: List[str], sizes: List[int], stages: List[str], batch_size: int, sample_size: int,
+              repeat: int, work_dir: str, report: Callable[[str, Dict[str, Any]], None]) -> Dict[str, Dict[str, Any]]:
+    """Measure every stage of every shape and size; report is called with each result as it is ready."""
+    results = {}
+    for docs in sizes:
+        for shape in shapes:
+            case = Case(shape, docs, batch_size, sample_size, work_dir)
+            for stage in stages:
+                seconds = best_of(repeat, getattr(case, f"time_{stage}"))
+                measured = case.measured_docs(stage)
+                result = {
+                    'stage': stage,
+                    'shape': shape,
+                    'docs': measured,
+                    'columns': len(case.plan.columns),
+                    'seconds': round(seconds, 6),
+                    'docs_per_sec': round(measured / seconds, 1) if seconds else 0.0,
+                }
+                key = result_key(stage, shape, docs)
+                results[key] = result
+                report(key, result)
+            get_manager().close()
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[Tuple[str, Optional[float], float, str]]:
+    """(key, baseline docs/sec, docs/sec, verdict) of every result; the verdict is ok, faster, regression or new."""
+    rows = []
+    for key, result in results.items():
+        rate = result['docs_per_sec']
+        before = baseline.get(key, {}).get('docs_per_sec')
+        if not before:
+            verdict = 'new'
+        elif rate < before * (1 - tolerance):
+            verdict = 'regression'
+        elif rate > before * (1 + tolerance):
+            verdict = 'faster'
+        else:
+            verdict = 'ok'
+        rows.append((key, before, rate, verdict))
+    return rows
+
+
+def print_result(key: str, result: Dict[str, Any]):
+    print(f"{key:<30} {result['columns']:>7} {result['seconds']:>10.3f} {result['docs_per_sec']:>14,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', nargs='+', default=list(SHAPES), choices=list(SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000], help="Documents per collection")
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=STAGES)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--sample-size', type=int, default=1000, help="Documents profiled by the schema stage")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the fastest counts")
+    parser.add_argument('--save', default=None, help="Write the results to this JSON file as a baseline")
+    parser.add_argument('--baseline', default=None, help="Compare the results with this JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative docs/sec drop reported as a regression")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix='etl_bench')
+    try:
+        print(f"{'benchmark':<30} {'columns':>7} {'seconds':>10} {'docs/sec':>14}")
+        results = run_suite(args.shapes, args.sizes, args.stages, args.batch_size, args.sample_size,
+                            args.repeat, work_dir, print_result)
+    finally:
+        get_manager().close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(),
+                'environment': environment(),
+                'settings': {'batch_size': args.batch_size, 'sample_size': args.sample_size, 'repeat': args.repeat},
+                'results': results,
+            }, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if baseline is None:
+        return
+    if baseline.get('environment') != environment():
+        print("The baseline was recorded in a different environment; differences may not be regressions")
+    rows = compare(results, baseline.get('results', {}), args.tolerance)
+    print(f"\n{'benchmark':<30} {'baseline':>14} {'docs/sec':>14} {'change':>8}  verdict")
+    for key, before, rate, verdict in rows:
+        change = f"{(rate / before - 1) * 100:+.1f}%" if before else ''
+        before_text = f"{before:,.0f}" if before else '-'
+        print(f"{key:<30} {before_text:>14} {rate:>14,.0f} {change:>8}  {verdict}")
+    regressions = [row for row in rows if row[3] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
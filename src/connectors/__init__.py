@@ -2,7 +2,10 @@
 Database connectors package
 """
 
-from .mongodb import MongoDBConnector
+from .mongodb import MongoDBConnector, KeyRange, CursorOptions, ScanPlan, SCAN_MODES
 from .sql import SQLConnector
+from .loaders import LoadResult, STRATEGIES
+from .pool import PoolSettings, get_manager
+from .writer import CommitStats, WriterSession
 
-__all__ = ['MongoDBConnector', 'SQLConnector'] 
\ No newline at end of file
+__all__ = ['MongoDBConnector', 'KeyRange', 'CursorOptions', 'ScanPlan', 'SCAN_MODES', 'SQLConnector', 'LoadResult', 'STRATEGIES', 'PoolSettings', 'get_manager', 'CommitStats', 'WriterSession'] 
\ No newline at end of file
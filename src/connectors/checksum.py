@@ -0,0 +1,139 @@
+import hashlib
+import math
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import BigInteger, Numeric, String, Text, case, cast, func
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.types import Boolean, DateTime, Float, Integer, LargeBinary, TypeEngine
+
+# Row checksums shared by both sides of a verification. A row is reduced to
+# the canonical text of each column joined by ROW_SEP, its digest is the
+# first DIGEST_HEX_DIGITS hex digits of the MD5 of that text, and a range's
+# checksum is the row count with the sum of the digests, which does not
+# depend on row order. Canonical text follows the column's SQL type, so a
+# value reads the same whether it came from a document or from the table:
+#   bool      1 or 0
+#   int       decimal digits
+#   float     the value in millionths, rounded half to even
+#   decimal   plain notation without trailing fractional zeros, e.g. 1.5 for 1.5000
+#   datetime  YYYY-MM-DD HH:MM:SS, fractions of a second dropped
+#   bytes     lowercase hex
+#   text      the string itself; NULL is NULL_MARK
+
+ROW_SEP = '|'
+NULL_MARK = '\\N'
+# 60 bits fit a signed BIGINT, so sums stay exact in every database
+DIGEST_HEX_DIGITS = 15
+FLOAT_SCALE = 1000000
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+KINDS = ('bool', 'int', 'float', 'decimal', 'datetime', 'bytes', 'text')
+
+
+def column_kind(sql_type: TypeEngine) -> str:
+    """Canonical kind of a reflected column type."""
+    if isinstance(sql_type, Boolean):
+        return 'bool'
+    if isinstance(sql_type, Integer):
+        return 'int'
+    if isinstance(sql_type, Float):
+        return 'float'
+    # after Float, which is a Numeric too
+    if isinstance(sql_type, Numeric):
+        return 'decimal'
+    if isinstance(sql_type, DateTime):
+        return 'datetime'
+    if isinstance(sql_type, LargeBinary):
+        return 'bytes'
+    return 'text'
+
+
+def canonical(value: Any, kind: str) -> str:
+    """Canonical text of a value stored in a column of the given kind."""
+    if value is None:
+        return NULL_MARK
+    try:
+        if kind == 'bool':
+            return '1' if value else '0'
+        if kind == 'int':
+            return str(int(value))
+        if kind == 'float':
+            value = float(value)
+            return str(round(value * FLOAT_SCALE)) if math.isfinite(value) else str(value)
+        if kind == 'decimal':
+            return format(Decimal(str(value)).normalize(), 'f')
+        if kind == 'datetime' and isinstance(value, datetime):
+            return value.strftime(DATETIME_FORMAT)
+        if kind == 'bytes':
+            return bytes(value).hex()
+    except (TypeError, ValueError, InvalidOperation):
+        pass
+    return str(value)
+
+
+def row_digest(row: Sequence[Any], kinds: Sequence[str]) -> int:
+    """Digest of one row; a range's checksum is the sum over its rows."""
+    data = ROW_SEP.join(canonical(value, kind) for value, kind in zip(row, kinds))
+    return int(hashlib.md5(data.encode('utf-8')).hexdigest()[:DIGEST_HEX_DIGITS], 16)
+
+
+def _trim_decimal(text_value):
+    # NUMERIC text keeps the column's scale; drop trailing fractional zeros and a bare point like normalize()
+    return case((text_value.like('%.%'), func.regexp_replace(text_value, r'\.?0+$', '')), else_=text_value)
+
+
+def _postgresql_text(column, kind: str):
+    if kind == 'bool':
+        # no ELSE, so NULL stays NULL
+        return case((column, '1'), (column.is_(False), '0'))
+    if kind == 'float':
+        return cast(cast(func.round(column * FLOAT_SCALE), Numeric), Text)
+    if kind == 'decimal':
+        return _trim_decimal(cast(column, Text))
+    if kind == 'datetime':
+        return func.to_char(column, 'YYYY-MM-DD HH24:MI:SS')
+    if kind == 'bytes':
+        return func.encode(column, 'hex')
+    return cast(column, Text)
+
+
+def _postgresql_digest(row):
+    hex_digits = func.substr(func.md5(row), 1, DIGEST_HEX_DIGITS)
+    return cast(cast(func.concat('x', hex_digits), BIT(DIGEST_HEX_DIGITS * 4)), BigInteger)
+
+
+def _mysql_text(column, kind: str):
+    if kind == 'float':
+        return cast(cast(func.round(column * FLOAT_SCALE), Numeric(65, 0)), String)
+    if kind == 'decimal':
+        # REGEXP_REPLACE needs MySQL 8.0
+        return _trim_decimal(cast(column, String))
+    if kind == 'datetime':
+        return func.date_format(column, '%Y-%m-%d %H:%i:%s')
+    if kind == 'bytes':
+        return func.lower(func.hex(column))
+    # BOOLEAN is TINYINT(1) on MySQL, so bools already read as 1 or 0
+    return cast(column, String)
+
+
+def _mysql_digest(row):
+    hex_digits = func.substring(func.md5(row), 1, DIGEST_HEX_DIGITS)
+    return cast(func.conv(hex_digits, 16, 10), Numeric(20, 0))
+
+
+# dialect: (canonical text of a column, digest of a row's text); others hash rows in Python
+SQL_CHECKSUMS = {
+    'postgresql': (_postgresql_text, _postgresql_digest),
+    'mysql': (_mysql_text, _mysql_digest),
+}
+
+
+def checksum_columns(dialect_name: str, columns: List[Any], kinds: Sequence[str]) -> Optional[List[Any]]:
+    """COUNT(*) and SUM(digest) expressions over the columns, or None where the dialect has no MD5."""
+    if dialect_name not in SQL_CHECKSUMS:
+        return None
+    to_text, digest = SQL_CHECKSUMS[dialect_name]
+    parts = [func.coalesce(to_text(column, kind), NULL_MARK) for column, kind in zip(columns, kinds)]
+    return [func.count(), func.sum(digest(func.concat_ws(ROW_SEP, *parts)))]
@@ -0,0 +1,255 @@
+from typing import List, Any, Optional, Tuple, Sequence
+from datetime import date, datetime
+import io
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on bind parameters in a single statement, per dialect.
+# sqlite builds before 3.32 stop at 999, so stay on the safe side there.
+MAX_BIND_PARAMS = {
+    'sqlite': 999,
+    'postgresql': 32767,
+    'mysql': 65535,
+    'mssql': 2099,
+    'oracle': 1000,
+}
+DEFAULT_MAX_BIND_PARAMS = 999
+
+STRATEGIES = ('auto', 'executemany', 'values', 'copy')
+
+
+class LoadResult:
+    """Outcome of loading one batch."""
+
+    def __init__(self, strategy: str, rows: int, seconds: float, statements: int = 1,
+                 rejected: Optional[List[Tuple[int, BaseException]]] = None):
+        self.strategy = strategy
+        self.rows = rows
+        self.seconds = seconds
+        self.statements = statements
+        # (position in the batch, error) of rows the database refused
+        self.rejected = rejected or []
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __repr__(self) -> str:
+        return (f"LoadResult(strategy={self.strategy!r}, rows={self.rows}, "
+                f"statements={self.statements}, rows_per_sec={self.rows_per_sec:.0f})")
+
+
+def max_bind_params(dialect_name: str) -> int:
+    """Bind parameter limit of a dialect."""
+    return MAX_BIND_PARAMS.get(dialect_name, DEFAULT_MAX_BIND_PARAMS)
+
+
+def placeholders(paramstyle: str, count: int, offset: int = 0) -> str:
+    """Build a DBAPI placeholder list for the given paramstyle."""
+    if paramstyle == 'qmark':
+        return ', '.join(['?'] * count)
+    if paramstyle == 'numeric':
+        return ', '.join(f':{offset + i + 1}' for i in range(count))
+    if paramstyle in ('format', 'pyformat'):
+        return ', '.join(['%s'] * count)
+    raise ValueError(f"Unsupported paramstyle for positional rows: {paramstyle}")
+
+
+class BulkLoader:
+    """Base class for the ways a batch of row tuples can be written."""
+
+    name = 'base'
+
+    def insert_prefix(self, conn, table_name: str, columns: Sequence[str]) -> str:
+        quote = conn.dialect.identifier_preparer.quote
+        return f"INSERT INTO {quote(table_name)} ({', '.join(quote(c) for c in columns)})"
+
+    def rows_per_statement(self, conn, column_count: int) -> int:
+        """Rows one statement can carry, or 0 when a statement takes the whole batch."""
+        return 0
+
+    def load(self, conn, table_name: str, columns: Sequence[str], rows: List[Tuple[Any, ...]]) -> int:
+        """Write rows on an open connection and return the number of statements used."""
+        raise NotImplementedError
+
+
+class ExecuteManyLoader(BulkLoader):
+    """One prepared INSERT executed with the whole batch through DBAPI executemany."""
+
+    name = 'executemany'
+
+    def load(self, conn, table_name, columns, rows):
+        stmt = (f"{self.insert_prefix(conn, table_name, columns)} "
+                f"VALUES ({placeholders(conn.dialect.paramstyle, len(columns))})")
+        conn.exec_driver_sql(stmt, rows)
+        return 1
+
+
+class MultiValuesLoader(BulkLoader):
+    """INSERT ... VALUES (...), (...) chunked to fit the dialect's bind parameter limit."""
+
+    name = 'values'
+
+    def rows_per_statement(self, conn, column_count: int) -> int:
+        return max(1, max_bind_params(conn.dialect.name) // max(1, column_count))
+
+    def load(self, conn, table_name, columns, rows):
+        paramstyle = conn.dialect.paramstyle
+        prefix = self.insert_prefix(conn, table_name, columns)
+        width = len(columns)
+        chunk_size = self.rows_per_statement(conn, width)
+
+        statements = 0
+        full_stmt = None
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            # every chunk but the last has the same shape, so build that statement once
+            if len(chunk) == chunk_size and full_stmt is not None:
+                stmt = full_stmt
+            else:
+                groups = ', '.join(
+                    f"({placeholders(paramstyle, width, i * width)})" for i in range(len(chunk))
+                )
+                stmt = f"{prefix} VALUES {groups}"
+                if len(chunk) == chunk_size:
+                    full_stmt = stmt
+            params = tuple(value for row in chunk for value in row)
+            conn.exec_driver_sql(stmt, params)
+            statements += 1
+        return statements
+
+
+def _copy_text_value(value: Any) -> str:
+    """Encode one value in PostgreSQL COPY text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    text = value if isinstance(value, str) else str(value)
+    return (text.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class PostgresCopyLoader(BulkLoader):
+    """COPY FROM STDIN fed from an in-memory text-format buffer (psycopg2 or psycopg 3)."""
+
+    name = 'copy'
+
+    def build_buffer(self, rows: List[Tuple[Any, ...]]) -> io.StringIO:
+        buf = io.StringIO()
+        write = buf.write
+        for row in rows:
+            write('\t'.join(_copy_text_value(v) for v in row))
+            write('\n')
+        buf.seek(0)
+        return buf
+
+    def load(self, conn, table_name, columns, rows):
+        quote = conn.dialect.identifier_preparer.quote
+        copy_stmt = (f"COPY {quote(table_name)} ({', '.join(quote(c) for c in columns)}) "
+                     f"FROM STDIN")
+        buf = self.build_buffer(rows)
+
+        dbapi_conn = conn.connection.dbapi_connection
+        cursor = dbapi_conn.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):
+                # psycopg2
+                cursor.copy_expert(copy_stmt, buf)
+            elif hasattr(cursor, 'copy'):
+                # psycopg 3
+                with cursor.copy(copy_stmt) as copy:
+                    copy.write(buf.getvalue())
+            else:
+                raise ValueError(f"Driver {conn.dialect.driver} does not support COPY")
+        finally:
+            cursor.close()
+        return 1
+
+
+def upsert_statement(conn, table_name: str, columns: Sequence[str], key_columns: Sequence[str]) -> str:
+    """Single-row upsert in the dialect's native form, for use with executemany."""
+    dialect = conn.dialect.name
+    quote = conn.dialect.identifier_preparer.quote
+    table = quote(table_name)
+    cols = ', '.join(quote(c) for c in columns)
+    keys = ', '.join(quote(c) for c in key_columns)
+    values = placeholders(conn.dialect.paramstyle, len(columns))
+    updates = [c for c in columns if c not in key_columns]
+
+    if dialect in ('postgresql', 'sqlite'):
+        if updates:
+            action = 'DO UPDATE SET ' + ', '.join(f"{quote(c)} = excluded.{quote(c)}" for c in updates)
+        else:
+            action = 'DO NOTHING'
+        return f"INSERT INTO {table} ({cols}) VALUES ({values}) ON CONFLICT ({keys}) {action}"
+    if dialect == 'mysql':
+        assignments = updates or list(key_columns)
+        action = ', '.join(f"{quote(c)} = VALUES({quote(c)})" for c in assignments)
+        return f"INSERT INTO {table} ({cols}) VALUES ({values}) ON DUPLICATE KEY UPDATE {action}"
+    if dialect == 'mssql':
+        paramstyle = conn.dialect.paramstyle
+        source_cols = ', '.join(
+            f"{placeholders(paramstyle, 1, i)} AS {quote(c)}" for i, c in enumerate(columns)
+        )
+        match = ' AND '.join(f"target.{quote(c)} = source.{quote(c)}" for c in key_columns)
+        stmt = f"MERGE INTO {table} AS target USING (SELECT {source_cols}) AS source ON {match}"
+        if updates:
+            stmt += " WHEN MATCHED THEN UPDATE SET " + ', '.join(
+                f"target.{quote(c)} = source.{quote(c)}" for c in updates
+            )
+        stmt += (f" WHEN NOT MATCHED THEN INSERT ({cols}) VALUES "
+                 f"({', '.join(f'source.{quote(c)}' for c in columns)});")
+        return stmt
+    raise ValueError(f"Upserts are not supported for dialect {dialect}")
+
+
+def delete_statement(conn, table_name: str, key_columns: Sequence[str]) -> str:
+    """Single-row delete by key, for use with executemany."""
+    quote = conn.dialect.identifier_preparer.quote
+    paramstyle = conn.dialect.paramstyle
+    conditions = ' AND '.join(
+        f"{quote(c)} = {placeholders(paramstyle, 1, i)}" for i, c in enumerate(key_columns)
+    )
+    return f"DELETE FROM {quote(table_name)} WHERE {conditions}"
+
+
+LOADERS = {
+    'executemany': ExecuteManyLoader,
+    'values': MultiValuesLoader,
+    'copy': PostgresCopyLoader,
+}
+
+
+def resolve_strategy(dialect_name: str, driver: str, strategy: str = 'auto') -> str:
+    """Pick the bulk load strategy to use for a dialect."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown load strategy: {strategy}. Available: {', '.join(STRATEGIES)}")
+    if strategy == 'copy' and dialect_name != 'postgresql':
+        raise ValueError("The copy load strategy is only available for PostgreSQL")
+    if strategy != 'auto':
+        return strategy
+    if dialect_name == 'postgresql' and driver in ('psycopg2', 'psycopg'):
+        return 'copy'
+    return 'executemany'
+
+
+def get_loader(strategy: str) -> BulkLoader:
+    """Instantiate the loader for a resolved strategy name."""
+    return LOADERS[strategy]()
+
+
+def run_load(conn, loader: BulkLoader, table_name: str, columns: Sequence[str],
+             rows: List[Tuple[Any, ...]]) -> LoadResult:
+    """Run a loader on an open connection and time it."""
+    start = time.perf_counter()
+    statements = loader.load(conn, table_name, columns, rows) if rows else 0
+    result = LoadResult(loader.name, len(rows), time.perf_counter() - start, statements)
+    logger.debug(f"Loaded batch into {table_name}: {result}")
+    return result
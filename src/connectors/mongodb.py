@@ -1,24 +1,158 @@
-from typing import Dict, List, Any, Optional, Iterator, Tuple           
+from typing import Callable, Dict, List, Any, Optional, Iterator, Tuple           
+from bson import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, PyMongoError
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from rich.console import Console
+from bson import Decimal128, Int64
+from transformers.flatten import DEFAULT_MAX_DEPTH, make_getter
+from transformers.profiler import SchemaProfile, json_safe, profile_documents
+from utils.metrics import get_registry
+from utils.schema_cache import SchemaCache
 from .connector import Connector
+from .pool import get_manager
 
 console = Console()
 logger = logging.getLogger(__name__)
 
+# documents sampled to estimate the share of a collection a query matches
+ESTIMATE_SAMPLE_SIZE = 1000
+
+
+def _record_fetch(batch: List[Any], seconds: float):
+    metrics = get_registry()
+    metrics.observe('etl_extract_fetch_seconds', seconds)
+    metrics.observe('etl_extract_batch_documents', len(batch))
+    metrics.inc('etl_extract_documents_total', len(batch))
+
+
+class KeyRange:
+    """Half-open range [lower, upper) over an indexed key; None means unbounded."""
+
+    def __init__(self, key: str, lower: Any = None, upper: Any = None, index: int = 0, after: Any = None):
+        self.key = key
+        self.lower = lower
+        self.upper = upper
+        self.index = index
+        # last key already migrated; resuming continues strictly after it
+        self.after = after
+
+    def resume_after(self, last_key: Any) -> 'KeyRange':
+        """Copy of this range that starts after an already migrated key."""
+        return KeyRange(self.key, self.lower, self.upper, self.index, after=last_key)
+
+    def to_query(self, query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the find() filter for this range, combined with an optional query."""
+        bounds = {}
+        if self.after is not None:
+            bounds['$gt'] = self.after
+        elif self.lower is not None:
+            bounds['$gte'] = self.lower
+        if self.upper is not None:
+            bounds['$lt'] = self.upper
+        range_query = {self.key: bounds} if bounds else {}
+        if query and range_query:
+            return {'$and': [query, range_query]}
+        return dict(query or range_query)
+
+    def __repr__(self) -> str:
+        return f"KeyRange({self.key!r}, {self.lower!r}, {self.upper!r}, index={self.index}, after={self.after!r})"
+
+class CursorOptions:
+    """Server-side read options pushed down to find(): projection, cursor batch size, index hint and raw BSON."""
+
+    def __init__(self, projection: Optional[Dict[str, Any]] = None, batch_size: Optional[int] = None,
+                 hint: Optional[Any] = None, raw: bool = False):
+        self.projection = projection
+        self.batch_size = batch_size
+        self.hint = hint
+        # RawBSONDocument defers decoding each field until it is read
+        self.raw = raw
+
+    def with_projection(self, projection: Optional[Dict[str, Any]]) -> 'CursorOptions':
+        return CursorOptions(projection, self.batch_size, self.hint, self.raw)
+
+    def __repr__(self) -> str:
+        return (f"CursorOptions(projection={self.projection!r}, batch_size={self.batch_size!r}, "
+                f"hint={self.hint!r}, raw={self.raw!r})")
+
+
+SCAN_MODES = ('auto', 'natural', 'keyset', 'hint')
+
+
+class ScanPlan:
+    """How a scan walks a collection.
+
+    ``natural`` reads in storage order with no sort, the cheapest way to
+    copy everything once. ``keyset`` reads pages in ascending key order,
+    each page starting after the last key of the previous one, so progress
+    can be checkpointed and no cursor has to live for the whole scan.
+    ``hint`` uses the given index, sorted by the key only when the scan
+    must be resumable.
+    """
+
+    def __init__(self, mode: str, key: str = '_id', hint: Optional[Any] = None, ordered: bool = False):
+        self.mode = mode
+        self.key = key
+        self.hint = hint
+        self.ordered = ordered
+
+    @property
+    def sort(self) -> Optional[List[Tuple[str, int]]]:
+        return [(self.key, 1)] if self.ordered else None
+
+    def __repr__(self) -> str:
+        return f"ScanPlan({self.mode!r}, key={self.key!r}, hint={self.hint!r}, ordered={self.ordered})"
+
+
+def key_type(value: Any) -> str:
+    """Type bracket of a key value: range queries only match values of the bound's bracket.
+
+    MongoDB compares numbers of every type with each other; any other type
+    only with its own.
+    """
+    if isinstance(value, (int, float, Int64, Decimal128)) and not isinstance(value, bool):
+        return 'number'
+    return type(value).__name__
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Stage names anywhere in an explain() plan tree, including per-shard plans."""
+    stages = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get('stage'), str):
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def _profile_range(uri: str, collection_name: str, key_range: KeyRange, max_depth: int) -> SchemaProfile:
+    """Worker entry point: profile one key range with its own client."""
+    with MongoDBConnector(uri) as connector:
+        collection = connector.get_collection(collection_name)
+        return profile_documents(collection.find(key_range.to_query(), batch_size=1000), max_depth)
+
+
 class MongoDBConnector(Connector):
-    def __init__(self, uri: str):
+    def __init__(self, uri: str, schema_cache: Optional[SchemaCache] = None):
         """Initialize MongoDB connection."""
         self.uri = uri
         self.client: Optional[MongoClient] = None
         self.db = None
+        self.schema_cache = schema_cache
 
     def connect(self) -> bool:
         """Establish connection to MongoDB."""
         try:
-            self.client = MongoClient(self.uri)
+            self.client = get_manager().client(self.uri)
             # Verify connection
             self.client.admin.command('ping')
             return True
@@ -27,9 +161,9 @@ class MongoDBConnector(Connector):
             return False
 
     def disconnect(self):
-        """Close MongoDB connection."""
-        if self.client:
-            self.client.close()
+        """Release the MongoDB client; the shared pool stays open for reuse until exit."""
+        self.client = None
+        self.db = None
 
     def get_collection(self, collection_name: str):
         """Get MongoDB collection."""
@@ -41,34 +175,146 @@ class MongoDBConnector(Connector):
         self.db = self.client[db_name]
         return self.db[collection_name]
 
-    def get_collection_schema(self, collection_name: str) -> Dict[str, Any]:
-        """Analyze collection schema."""
+    def list_collections(self) -> List[str]:
+        """Names of the database's collections, sorted, without the system ones."""
+        if not self.client:
+            raise ConnectionError("MongoDB connection not established")
+        db_name = self.uri.split('/')[-1].split('?')[0] if '/' in self.uri else 'test'
+        self.db = self.client[db_name]
+        return sorted(name for name in self.db.list_collection_names() if not name.startswith('system.'))
+
+    def get_collection_schema(self, collection_name: str, sample_size: int = 1000, full_scan: bool = False,
+                              workers: int = 1, max_depth: int = DEFAULT_MAX_DEPTH) -> Dict[str, Any]:
+        """Profile the collection schema with fixed-memory per-field sketches.
+
+        Profiles a $sample of sample_size documents, or every document with
+        full_scan, split into key ranges over worker processes when workers > 1.
+        Nested fields are reported as dotted paths and array elements with a
+        [] suffix.
+        """
+        if self.schema_cache is not None:
+            options = {'sample_size': None if full_scan else sample_size, 'max_depth': max_depth}
+            key = self.schema_cache.key(self.uri, collection_name, options)
+            fingerprint = self.get_fingerprint(collection_name)
+            cached = self.schema_cache.get(key, fingerprint)
+            if cached is not None:
+                logger.info(f"Using cached schema of {collection_name}")
+                return cached
+            schema = self._profile_collection(collection_name, sample_size, full_scan, workers, max_depth)
+            self.schema_cache.put(key, fingerprint, json_safe(schema), collection_name)
+            return schema
+
+        return self._profile_collection(collection_name, sample_size, full_scan, workers, max_depth)
+
+    def _profile_collection(self, collection_name: str, sample_size: int, full_scan: bool,
+                            workers: int, max_depth: int) -> Dict[str, Any]:
         collection = self.get_collection(collection_name)
-        schema = {}
-        
-        # Sample documents to analyze schema
-        sample_docs = collection.find().sort([('_id', -1)]).limit(100)
-        
-        for doc in sample_docs:
-            for field, value in doc.items():
-                if field not in schema:
-                    schema[field] = {
-                        'type': type(value).__name__,
-                        'required': True,
-                        'unique_values': set()
-                    }
-                schema[field]['unique_values'].add(str(value))
-        
-        # Convert sets to lists for JSON serialization
-        for field in schema:
-            schema[field]['unique_values'] = list(schema[field]['unique_values'])
-        
-        return schema
+        if not full_scan:
+            documents = collection.aggregate([{'$sample': {'size': sample_size}}])
+            return profile_documents(documents, max_depth).to_schema()
+
+        if workers <= 1:
+            return profile_documents(collection.find(batch_size=1000), max_depth).to_schema(complete=True)
+
+        ranges = self.get_partitions(collection_name, workers * 4)
+        profile = SchemaProfile(max_depth)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(_profile_range, self.uri, collection_name, key_range, max_depth)
+                for key_range in ranges
+            ]
+            for future in as_completed(futures):
+                profile.merge(future.result())
+        return profile.to_schema(complete=True)
+
+    def get_partitions(self, collection_name: str, num_partitions: int, key: str = '_id',
+                       query: Optional[Dict[str, Any]] = None, method: str = 'sample',
+                       sample_size: Optional[int] = None) -> List[KeyRange]:
+        """Split a collection into key ranges of roughly equal document counts.
+
+        ``sample`` picks split points from a $sample of the key, ``bucketAuto``
+        asks the server for exact boundaries at the cost of a full scan. The
+        first and last ranges are open-ended so documents outside the sampled
+        keys are still covered.
+        """
+        collection = self.get_collection(collection_name)
+        if num_partitions > 1:
+            # more ranges than documents would only add empty ones
+            num_partitions = min(num_partitions, collection.estimated_document_count())
+        if num_partitions <= 1:
+            return [KeyRange(key)]
+
+        pipeline = [{'$match': query}] if query else []
+        if method == 'bucketAuto':
+            pipeline.append({'$bucketAuto': {'groupBy': f'${key}', 'buckets': num_partitions}})
+            buckets = list(collection.aggregate(pipeline, allowDiskUse=True))
+            split_points = [bucket['_id']['min'] for bucket in buckets[1:]]
+        elif method == 'sample':
+            size = sample_size or num_partitions * 100
+            pipeline.extend([
+                {'$sample': {'size': size}},
+                {'$project': {'_id': 0, 'k': f'${key}'}},
+            ])
+            try:
+                keys = sorted(doc['k'] for doc in collection.aggregate(pipeline) if doc.get('k') is not None)
+            except TypeError:
+                raise ValueError(f"Partition key {key} must hold a single comparable type")
+            split_points = [keys[len(keys) * i // num_partitions] for i in range(1, num_partitions)] if keys else []
+        else:
+            raise ValueError(f"Unknown partition method: {method}")
+
+        # duplicate split points would produce empty ranges
+        bounds = []
+        for point in split_points:
+            if not bounds or point != bounds[-1]:
+                bounds.append(point)
+
+        edges = [None] + bounds + [None]
+        return [KeyRange(key, edges[i], edges[i + 1], index=i) for i in range(len(edges) - 1)]
 
     def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """Get collection statistics."""
         collection = self.get_collection(collection_name)
-        return collection.stats()
+        return self.db.command('collStats', collection.name)
+
+    def get_statistics(self, collection_name: str) -> Dict[str, Any]:
+        """Document count and sizes from collection metadata, without reading any documents.
+
+        The count is estimated_document_count, which can be off after an
+        unclean shutdown or in a sharded cluster with orphaned documents.
+        Sizes are None where collStats is not allowed.
+        """
+        collection = self.get_collection(collection_name)
+        stats = {'count': collection.estimated_document_count(), 'size_bytes': None,
+                 'avg_document_bytes': None, 'storage_bytes': None, 'index_bytes': None}
+        try:
+            coll_stats = self.get_collection_stats(collection_name)
+        except Exception as e:
+            logger.debug(f"collStats unavailable for {collection_name}: {str(e)}")
+            return stats
+        stats.update({
+            'size_bytes': coll_stats.get('size'),
+            'avg_document_bytes': coll_stats.get('avgObjSize'),
+            'storage_bytes': coll_stats.get('storageSize'),
+            'index_bytes': coll_stats.get('totalIndexSize'),
+        })
+        return stats
+
+    def get_fingerprint(self, collection_name: str) -> Dict[str, Any]:
+        """Cheap signature of the collection's contents: estimated count, max _id and data size.
+
+        Uses only metadata and one index lookup, so it is safe to call before
+        every schema profile.
+        """
+        collection = self.get_collection(collection_name)
+        newest = collection.find_one({}, projection={'_id': 1}, sort=[('_id', -1)])
+        stats = self.get_statistics(collection_name)
+        return {
+            'count': stats['count'],
+            'max_id': str(newest['_id']) if newest else None,
+            'size': stats['size_bytes'],
+        }
 
     def validate_connection(self) -> bool:
         """Validate MongoDB connection."""
@@ -81,25 +327,234 @@ class MongoDBConnector(Connector):
             logger.error(f"Connection validation failed: {str(e)}")
             return False
 
-    def get_document_count(self, collection_name: str) -> int:
-        """Get total document count in collection."""
+    def get_document_count(self, collection_name: str, query: Optional[Dict[str, Any]] = None) -> int:
+        """Get the number of documents in collection, optionally matching query.
+
+        Exact, but the server scans every matching document or index key;
+        estimate_document_count answers from metadata instead.
+        """
         collection = self.get_collection(collection_name)
-        return collection.count_documents({})
+        return collection.count_documents(query or {})
+
+    def estimate_document_count(self, collection_name: str, query: Optional[Dict[str, Any]] = None) -> int:
+        """Document count from collection metadata, scaled by the share of a $sample matching query.
+
+        Costs a metadata read and, with a query, one sample of
+        ESTIMATE_SAMPLE_SIZE documents, however large the collection is.
+        """
+        collection = self.get_collection(collection_name)
+        total = collection.estimated_document_count()
+        if not query or not total:
+            return total
+        if total <= ESTIMATE_SAMPLE_SIZE:
+            # no larger than the sample, so the exact count is as cheap
+            return collection.count_documents(query)
+        pipeline = [{'$sample': {'size': ESTIMATE_SAMPLE_SIZE}}, {'$match': query}, {'$count': 'matched'}]
+        try:
+            result = list(collection.aggregate(pipeline))
+        except PyMongoError as e:
+            # operators such as $near or $text are not allowed in a later $match
+            logger.debug(f"Cannot sample {collection_name} for {query}: {str(e)}")
+            return total
+        matched = result[0]['matched'] if result else 0
+        return round(total * matched / ESTIMATE_SAMPLE_SIZE)
 
     def get_sample_documents(self, collection_name: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Get sample documents from collection."""
         collection = self.get_collection(collection_name)
         return list(collection.find().limit(limit))
 
-    def get_data(self, collection_name: str, query: Dict[str, Any] = {}, limit: int = 1000, sort: List[Tuple[str, int]] = []) -> List[Dict[str, Any]]:
-        """Get data from collection."""
+    def find(self, collection_name: str, query: Optional[Dict[str, Any]] = None,
+             sort: Optional[List[Tuple[str, int]]] = None, options: Optional[CursorOptions] = None):
+        """Open a cursor with the read options pushed down to the server."""
         collection = self.get_collection(collection_name)
-        return list(collection.find(query).limit(limit).sort(sort))
+        options = options or CursorOptions()
+        if options.raw:
+            collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+        cursor = collection.find(query or {}, options.projection)
+        if options.batch_size:
+            cursor = cursor.batch_size(options.batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if options.hint is not None:
+            cursor = cursor.hint(options.hint)
+        return cursor
 
-    def iterator(self, collection_name: str, query: Dict[str, Any] = {}, limit: int = 1000, sort: List[Tuple[str, int]] = []) -> Iterator[Dict[str, Any]]:
+    def get_data(self, collection_name: str, query: Optional[Dict[str, Any]] = None, limit: int = 1000,
+                 sort: Optional[List[Tuple[str, int]]] = None,
+                 options: Optional[CursorOptions] = None) -> List[Dict[str, Any]]:
+        """Get data from collection."""
+        return list(self.find(collection_name, query, sort, options).limit(limit))
+
+    def iterator(self, collection_name: str, query: Optional[Dict[str, Any]] = None, limit: int = 1000,
+                 sort: Optional[List[Tuple[str, int]]] = None,
+                 options: Optional[CursorOptions] = None) -> Iterator[Dict[str, Any]]:
         """Iterator over data from collection."""
+        return self.find(collection_name, query, sort, options).limit(limit)
+
+    def iter_batches(self, collection_name: str, batch_size: int = 1000, query: Optional[Dict[str, Any]] = None,
+                     sort: Optional[List[Tuple[str, int]]] = None,
+                     options: Optional[CursorOptions] = None,
+                     next_size: Optional[Callable[[], int]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Stream the whole collection as lists of at most batch_size documents.
+
+        The server returns cursor batches of options.batch_size documents,
+        which defaults to batch_size. next_size, if given, is asked for the
+        size of every batch instead.
+        """
+        options = options or CursorOptions()
+        if not options.batch_size:
+            options = CursorOptions(options.projection, batch_size, options.hint, options.raw)
+        cursor = self.find(collection_name, query, sort, options)
+
+        batch = []
+        size = next_size() if next_size else batch_size
+        start = time.perf_counter()
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= size:
+                _record_fetch(batch, time.perf_counter() - start)
+                yield batch
+                batch = []
+                size = next_size() if next_size else batch_size
+                start = time.perf_counter()
+        if batch:
+            _record_fetch(batch, time.perf_counter() - start)
+            yield batch
+
+    def key_types(self, collection_name: str, key: str = '_id', query: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Type brackets of the smallest and largest key matching query, one entry when they agree.
+
+        Values sort by type bracket first, so a key of several types has
+        different ones at its two ends; both lookups use an index on the key.
+        """
         collection = self.get_collection(collection_name)
-        return collection.find(query).limit(limit).sort(sort)
+        get = make_getter(key)
+        types = []
+        for direction in (1, -1):
+            for document in collection.find(query or {}, {key: 1}).sort(key, direction).limit(1):
+                bracket = key_type(get(document))
+                if bracket not in types:
+                    types.append(bracket)
+        return types
+
+    def plan_scan(self, mode: str = 'auto', key: str = '_id', resumable: bool = False,
+                  hint: Optional[Any] = None) -> ScanPlan:
+        """Pick how to scan a collection.
+
+        ``auto`` uses keyset pages when the scan has to be resumable, the
+        hinted index when there is one, and natural order otherwise. Keyset
+        pages and resumed ranges continue with ``key > last``, which only
+        matches keys of the same type bracket as last; see key_types.
+        """
+        if mode not in SCAN_MODES:
+            raise ValueError(f"Unknown scan mode: {mode}. Available: {', '.join(SCAN_MODES)}")
+        if mode == 'auto':
+            mode = 'keyset' if resumable else 'hint' if hint is not None else 'natural'
+        if mode == 'hint' and hint is None:
+            raise ValueError("The hint scan mode needs an index hint")
+        if mode == 'natural' and resumable:
+            raise ValueError("A natural order scan has no stable position to resume from; "
+                             "use the keyset scan mode or disable checkpoints")
+        return ScanPlan(mode, key, hint if mode != 'natural' else None, ordered=mode == 'keyset' or resumable)
+
+    def explain_scan(self, collection_name: str, query: Optional[Dict[str, Any]] = None,
+                     sort: Optional[List[Tuple[str, int]]] = None, hint: Optional[Any] = None) -> List[str]:
+        """Warnings about a scan whose winning plan sorts in memory or scans the whole collection for a filter.
+
+        Uses the queryPlanner verbosity, so the query itself is not run.
+        """
+        collection = self.get_collection(collection_name)
+        command: Dict[str, Any] = {'find': collection.name, 'filter': query or {}}
+        if sort:
+            command['sort'] = dict(sort)
+        if hint is not None:
+            command['hint'] = dict(hint) if isinstance(hint, list) else hint
+        try:
+            explain = self.db.command('explain', command, verbosity='queryPlanner')
+        except Exception as e:
+            logger.debug(f"explain unavailable for {collection_name}: {str(e)}")
+            return []
+
+        stages = _plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+        keys = ', '.join(k for k, _ in sort or [])
+        warnings = []
+        if 'SORT' in stages and 'COLLSCAN' in stages:
+            warnings.append(f"Scanning {collection_name} sorted by {keys} needs a COLLSCAN and an in-memory SORT; "
+                            f"add an index on {keys} or scan in natural order")
+        elif 'SORT' in stages:
+            warnings.append(f"Scanning {collection_name} sorted by {keys} needs an in-memory SORT; "
+                            f"an index starting with {keys} would avoid it")
+        elif 'COLLSCAN' in stages and query:
+            warnings.append(f"The filter on {collection_name} is not supported by an index and scans every document")
+        for warning in warnings:
+            logger.warning(warning)
+        return warnings
+
+    def scan_batches(self, collection_name: str, batch_size: int, query: Optional[Dict[str, Any]] = None,
+                     scan: Optional[ScanPlan] = None,
+                     options: Optional[CursorOptions] = None,
+                     next_size: Optional[Callable[[], int]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Stream a collection in batches following a scan plan, sized by next_size if given."""
+        scan = scan or ScanPlan('natural')
+        options = options or CursorOptions()
+        if scan.hint is not None:
+            options = CursorOptions(options.projection, options.batch_size, scan.hint, options.raw)
+        if scan.mode != 'keyset':
+            yield from self.iter_batches(collection_name, batch_size, query, scan.sort, options, next_size)
+            return
+
+        if not options.batch_size:
+            options = CursorOptions(options.projection, batch_size, options.hint, options.raw)
+        last = None
+        while True:
+            page_query = query
+            if last is not None:
+                after = {scan.key: {'$gt': last}}
+                page_query = {'$and': [query, after]} if query else after
+            size = next_size() if next_size else batch_size
+            start = time.perf_counter()
+            batch = list(self.find(collection_name, page_query, scan.sort, options).limit(size))
+            if not batch:
+                return
+            _record_fetch(batch, time.perf_counter() - start)
+            yield batch
+            if len(batch) < size:
+                return
+            last = batch[-1].get(scan.key)
+            if last is None:
+                raise ValueError(f"Keyset scans need {scan.key} on every document")
+
+    def open_change_stream(self, collection_name: str, resume_token: Optional[Dict[str, Any]] = None,
+                           max_await_ms: int = 1000):
+        """Open a change stream on the collection with full documents for updates."""
+        collection = self.get_collection(collection_name)
+        return collection.watch(
+            full_document='updateLookup',
+            resume_after=resume_token,
+            max_await_time_ms=max_await_ms,
+        )
+
+    def iter_change_batches(self, stream, batch_size: int = 1000,
+                            max_wait_seconds: float = 1.0) -> Iterator[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """Group change events into batches, flushing on size or after max_wait_seconds.
+
+        Yields (events, resume_token) where the token points after the last
+        event of the batch. Empty batches are not yielded.
+        """
+        batch = []
+        deadline = time.monotonic() + max_wait_seconds
+        while stream.alive:
+            event = stream.try_next()
+            if event is not None:
+                batch.append(event)
+            if batch and (len(batch) >= batch_size or time.monotonic() >= deadline):
+                yield batch, stream.resume_token
+                batch = []
+            if not batch:
+                deadline = time.monotonic() + max_wait_seconds
+        if batch:
+            yield batch, stream.resume_token
 
     def __enter__(self):
         """Context manager entry."""
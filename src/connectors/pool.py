@@ -0,0 +1,348 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from pymongo import MongoClient, monitoring
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from utils.metrics import get_registry
+from utils.schema_cache import strip_credentials
+
+logger = logging.getLogger(__name__)
+
+# pool settings read from the environment; unset means the driver default
+POOL_ENV = {
+    'pool_size': 'ETL_POOL_SIZE',
+    'max_overflow': 'ETL_MAX_OVERFLOW',
+    'pool_timeout': 'ETL_POOL_TIMEOUT',
+    'pool_recycle': 'ETL_POOL_RECYCLE',
+    'pre_ping': 'ETL_POOL_PRE_PING',
+    'mongo_max_pool_size': 'ETL_MONGO_MAX_POOL_SIZE',
+    'mongo_min_pool_size': 'ETL_MONGO_MIN_POOL_SIZE',
+}
+
+
+def _env_value(name: str, value: str) -> Any:
+    if name == 'pre_ping':
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if name in ('pool_timeout', 'pool_recycle'):
+        return float(value)
+    return int(value)
+
+
+class PoolSettings:
+    """Connection pool sizing for SQLAlchemy engines and MongoDB clients."""
+
+    def __init__(self, pool_size: Optional[int] = None, max_overflow: Optional[int] = None,
+                 pool_timeout: Optional[float] = None, pool_recycle: Optional[float] = None,
+                 pre_ping: bool = False, mongo_max_pool_size: Optional[int] = None,
+                 mongo_min_pool_size: Optional[int] = None):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pre_ping = pre_ping
+        self.mongo_max_pool_size = mongo_max_pool_size
+        self.mongo_min_pool_size = mongo_min_pool_size
+
+    @classmethod
+    def from_env(cls) -> 'PoolSettings':
+        values = {}
+        for name, var in POOL_ENV.items():
+            raw = os.getenv(var)
+            if raw not in (None, ''):
+                values[name] = _env_value(name, raw)
+        return cls(**values)
+
+    def to_env(self) -> Dict[str, str]:
+        """Environment variables that reproduce these settings in a worker process."""
+        env = {}
+        for name, var in POOL_ENV.items():
+            value = getattr(self, name)
+            if value is not None:
+                env[var] = str(value).lower() if isinstance(value, bool) else str(value)
+        return env
+
+    def engine_kwargs(self, uri: str) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {'pool_pre_ping': self.pre_ping}
+        if self.pool_recycle is not None:
+            kwargs['pool_recycle'] = self.pool_recycle
+        url = make_url(uri)
+        if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+            # sqlite :memory: and similar use pools without a size
+            for name in ('pool_size', 'max_overflow', 'pool_timeout'):
+                value = getattr(self, name)
+                if value is not None:
+                    kwargs[name] = value
+        return kwargs
+
+    def client_kwargs(self) -> Dict[str, Any]:
+        kwargs = {}
+        if self.mongo_max_pool_size is not None:
+            kwargs['maxPoolSize'] = self.mongo_max_pool_size
+        if self.mongo_min_pool_size is not None:
+            kwargs['minPoolSize'] = self.mongo_min_pool_size
+        return kwargs
+
+
+class PoolStats:
+    """Checkout counts and wait times of one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def reset(self):
+        """Zero the counters; connections still checked out stay counted as in use."""
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.peak_in_use = self.in_use
+
+    def checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def checkin(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def timeout(self, wait: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def merge(self, summary: Dict[str, Any]):
+        """Fold in the summary of the same pool from another process."""
+        with self._lock:
+            self.connects += summary['connects']
+            self.checkouts += summary['checkouts']
+            self.timeouts += summary['timeouts']
+            self.wait_seconds += summary['wait_seconds']
+            self.max_wait_seconds = max(self.max_wait_seconds, summary['max_wait_seconds'])
+            self.peak_in_use = max(self.peak_in_use, summary['peak_in_use'])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_seconds': round(self.wait_seconds, 6),
+            'max_wait_seconds': round(self.max_wait_seconds, 6),
+            'peak_in_use': self.peak_in_use,
+        }
+
+
+class _TimedPool:
+    """Pool mixin timing every checkout; combined with the dialect's pool class per engine."""
+
+    stats: PoolStats
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.stats.timeout(time.perf_counter() - start)
+            raise
+        self.stats.checkout(time.perf_counter() - start)
+        return connection
+
+
+class _MongoCommandListener(monitoring.CommandListener):
+    """Times the server round trip of the read commands, to tell it apart from BSON decoding."""
+
+    COMMANDS = ('find', 'getMore', 'aggregate')
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name in self.COMMANDS:
+            get_registry().observe('etl_mongo_command_seconds', event.duration_micros / 1e6)
+
+    def failed(self, event):
+        pass
+
+
+class _MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Feeds pymongo's connection pool events into PoolStats."""
+
+    def __init__(self, stats: PoolStats):
+        self.stats = stats
+        self._started = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._started.value = time.perf_counter()
+
+    def _wait(self) -> float:
+        started = getattr(self._started, 'value', None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_checked_out(self, event):
+        self.stats.checkout(self._wait())
+
+    def connection_check_out_failed(self, event):
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self.stats.timeout(self._wait())
+
+    def connection_checked_in(self, event):
+        self.stats.checkin()
+
+    def connection_created(self, event):
+        self.stats.connect()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+class ConnectionManager:
+    """SQLAlchemy engines and MongoDB clients shared per URI within one process.
+
+    Connectors get their engine or client from here, so every command,
+    chain step and partition handled by the same process reuses one pool
+    per database instead of opening new connections.
+    """
+
+    def __init__(self, settings: Optional[PoolSettings] = None):
+        self.settings = settings or PoolSettings.from_env()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._engines: Dict[str, Any] = {}
+        self._clients: Dict[str, MongoClient] = {}
+        self._stats: Dict[str, PoolStats] = {}
+
+    def _check_pid(self):
+        # pooled connections must not be shared with a forked child
+        if os.getpid() != self._pid:
+            for engine in self._engines.values():
+                engine.dispose(close=False)
+            self._engines = {}
+            self._clients = {}
+            self._stats = {}
+            self._pid = os.getpid()
+
+    def stats_for(self, uri: str) -> PoolStats:
+        name = strip_credentials(uri)
+        if name not in self._stats:
+            self._stats[name] = PoolStats()
+        return self._stats[name]
+
+    def engine(self, uri: str):
+        """Shared engine for a SQL URI."""
+        with self._lock:
+            self._check_pid()
+            engine = self._engines.get(uri)
+            if engine is None:
+                stats = self.stats_for(uri)
+                url = make_url(uri)
+                base = url.get_dialect().get_pool_class(url)
+                poolclass = type(f"Timed{base.__name__}", (_TimedPool, base), {'stats': stats})
+                engine = create_engine(uri, poolclass=poolclass, **self.settings.engine_kwargs(uri))
+                event.listen(engine, 'connect', lambda *args: stats.connect())
+                event.listen(engine, 'checkin', lambda *args: stats.checkin())
+                self._engines[uri] = engine
+            return engine
+
+    def client(self, uri: str) -> MongoClient:
+        """Shared client for a MongoDB URI."""
+        with self._lock:
+            self._check_pid()
+            client = self._clients.get(uri)
+            if client is None:
+                listener = _MongoPoolListener(self.stats_for(uri))
+                client = MongoClient(uri, event_listeners=[listener, _MongoCommandListener()], **self.settings.client_kwargs())
+                self._clients[uri] = client
+            return client
+
+    def take_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Summaries of every pool since the last call, resetting the counters."""
+        with self._lock:
+            summaries = {uri: stats.summary() for uri, stats in self._stats.items()}
+            for stats in self._stats.values():
+                stats.reset()
+            return summaries
+
+    def merge_stats(self, summaries: Dict[str, Dict[str, Any]]):
+        """Fold in pool summaries taken in a worker process."""
+        with self._lock:
+            for uri, summary in summaries.items():
+                self.stats_for(uri).merge(summary)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Pool summaries keyed by URI without credentials."""
+        return {uri: stats.summary() for uri, stats in self._stats.items()}
+
+    def close(self):
+        """Dispose every engine and close every client."""
+        with self._lock:
+            if os.getpid() == self._pid:
+                for engine in self._engines.values():
+                    engine.dispose()
+                for client in self._clients.values():
+                    client.close()
+            self._engines = {}
+            self._clients = {}
+
+
+_manager: Optional[ConnectionManager] = None
+
+
+def get_manager() -> ConnectionManager:
+    """The process-wide connection manager, created from the environment on first use."""
+    global _manager
+    if _manager is None:
+        _manager = ConnectionManager()
+        atexit.register(_manager.close)
+    return _manager
+
+
+def configure(settings: PoolSettings) -> ConnectionManager:
+    """Replace the pool settings of this process and of worker processes started after it."""
+    global _manager
+    if _manager is not None:
+        _manager.close()
+    # spawned workers read their settings from the environment
+    os.environ.update(settings.to_env())
+    _manager = ConnectionManager(settings)
+    atexit.register(_manager.close)
+    return _manager
@@ -1,23 +1,90 @@
-from typing import Dict, List, Any, Optional
-from sqlalchemy import create_engine, inspect, text
+from typing import Dict, Iterator, List, Any, Optional, Tuple, Callable
+from sqlalchemy import MetaData, Table, and_, inspect, select, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
 import logging
+import time
 from rich.console import Console
+from transformers.conversions import REGISTRY
+from .checksum import checksum_columns, column_kind
+from .pool import get_manager
+from .loaders import (
+    BulkLoader, LoadResult, get_loader, resolve_strategy, delete_statement,
+)
+from .writer import CommitStats, WriterSession, DEFAULT_COMMIT_ROWS, DEFAULT_COMMIT_SECONDS
 
 console = Console()
 logger = logging.getLogger(__name__)
 
+# suffix of the table a staged load writes to before it is swapped into place
+STAGING_SUFFIX = '__staging'
+
+
+def _postgresql_stats(conn, table_name: str, quote: Callable[[str], str]) -> Dict[str, Any]:
+    row = conn.execute(text(
+        "SELECT c.reltuples, pg_total_relation_size(c.oid) FROM pg_class c WHERE c.oid = to_regclass(:name)"
+    ), {'name': quote(table_name)}).first()
+    if row is None:
+        return {}
+    # -1 until the table is first vacuumed or analyzed
+    return {'row_count': int(row[0]) if row[0] >= 0 else None, 'size_bytes': row[1]}
+
+
+def _mysql_stats(conn, table_name: str, quote: Callable[[str], str]) -> Dict[str, Any]:
+    row = conn.execute(text(
+        "SELECT table_rows, data_length + index_length FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = :name"
+    ), {'name': table_name}).first()
+    if row is None:
+        return {}
+    return {'row_count': row[0], 'size_bytes': row[1]}
+
+
+def _sqlite_stats(conn, table_name: str, quote: Callable[[str], str]) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    # sqlite_stat1 is written by ANALYZE; its stat column starts with the table's row count
+    if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first():
+        row = conn.execute(text("SELECT stat FROM sqlite_stat1 WHERE tbl = :name LIMIT 1"),
+                           {'name': table_name}).first()
+        if row is not None:
+            stats['row_count'] = int(row[0].split()[0])
+    try:
+        stats['size_bytes'] = conn.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"),
+                                           {'name': table_name}).scalar()
+    except SQLAlchemyError:
+        # dbstat is only there when SQLite was compiled with SQLITE_ENABLE_DBSTAT_VTAB
+        conn.rollback()
+    return stats
+
+
+# dialect: row count and size estimate from the catalog, read without scanning the table
+TABLE_STATISTICS = {
+    'postgresql': _postgresql_stats,
+    'mysql': _mysql_stats,
+    'sqlite': _sqlite_stats,
+}
+
+
 class SQLConnector:
-    def __init__(self, uri: str):
+    def __init__(self, uri: str, load_strategy: str = 'auto'):
         """Initialize SQL connection."""
         self.uri = uri
         self.engine = None
         self.inspector = None
+        self.load_strategy = load_strategy
+        self._loader: Optional[BulkLoader] = None
+        # relax durability on the load connection (SQLite synchronous=OFF) while filling a staging table
+        self.fast_load = False
+
+    @property
+    def dialect_name(self) -> str:
+        """Dialect of the URI, e.g. postgresql or sqlite, known before connecting."""
+        return make_url(self.uri).get_backend_name()
 
     def connect(self) -> bool:
         """Establish connection to SQL database."""
         try:
-            self.engine = create_engine(self.uri)
+            self.engine = get_manager().engine(self.uri)
             # Verify connection
             with self.engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
@@ -28,9 +95,9 @@ class SQLConnector:
             return False
 
     def disconnect(self):
-        """Close SQL connection."""
-        if self.engine:
-            self.engine.dispose()
+        """Release the engine; the shared pool stays open for reuse until exit."""
+        self.engine = None
+        self.inspector = None
 
     def get_table_schema(self, table_name: str) -> Dict[str, Any]:
         """Get table schema information."""
@@ -67,25 +134,32 @@ class SQLConnector:
         
         return schema
 
-    def get_table_stats(self, table_name: str) -> Dict[str, Any]:
-        """Get table statistics."""
+    def get_table_stats(self, table_name: str, exact: bool = False) -> Dict[str, Any]:
+        """Row count and size of a table from the database's statistics.
+
+        Estimates come from pg_class.reltuples on PostgreSQL,
+        information_schema.tables on MySQL and sqlite_stat1 on SQLite, and
+        lag behind writes since the last ANALYZE. exact counts the rows with
+        SELECT COUNT(*) instead. row_count or size_bytes is None where the
+        database has no estimate.
+        """
         if not self.engine:
             raise ConnectionError("SQL connection not established")
 
-        stats = {}
-        
-        # Get row count
+        quote = self.engine.dialect.identifier_preparer.quote
+        dialect = self.engine.dialect.name
+        stats: Dict[str, Any] = {'row_count': None, 'exact': False, 'size_bytes': None}
         with self.engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            stats['row_count'] = result.scalar()
-            
-            # Get table size (if supported by the database)
-            try:
-                result = conn.execute(text(f"SELECT pg_total_relation_size('{table_name}')"))
-                stats['size_bytes'] = result.scalar()
-            except:
-                pass
-        
+            estimate = TABLE_STATISTICS.get(dialect)
+            if estimate:
+                try:
+                    stats.update(estimate(conn, table_name, quote))
+                except SQLAlchemyError as e:
+                    logger.debug(f"No statistics for {table_name} on {dialect}: {str(e)}")
+                    conn.rollback()
+            if exact:
+                stats['row_count'] = conn.execute(text(f"SELECT COUNT(*) FROM {quote(table_name)}")).scalar()
+                stats['exact'] = True
         return stats
 
     def table_exists(self, table_name: str) -> bool:
@@ -122,27 +196,61 @@ class SQLConnector:
             result = conn.execute(text(f"SELECT * FROM {table_name} LIMIT {limit}"))
             return [dict(row) for row in result]
 
-    def create_table(self, table_name: str, schema: Dict[str, Any]) -> bool:
-        """Create table with given schema."""
+    def column_type(self, col_info: Dict[str, Any]) -> str:
+        """SQL type for a profiled column from the conversion registry, sized from its statistics.
+
+        Type names the registry does not know are used verbatim, so schemas
+        can also carry SQL types directly.
+        """
+        sql_type = REGISTRY.sql_type(col_info, self.dialect_name)
+        if sql_type is None:
+            return col_info['type']
+        return sql_type.compile(dialect=self.engine.dialect)
+
+    def create_table(self, table_name: str, schema: Dict[str, Any], staging: bool = False) -> bool:
+        """Create table with given schema.
+
+        A staging table gets no primary key so inserts maintain no index, and
+        is UNLOGGED on PostgreSQL; SQLite databases are switched to WAL.
+        Foreign keys (a column's 'references') are added with the indexes,
+        except on SQLite, where they are part of the table definition, staged
+        or not. They name the final parent table, which a staged parent
+        becomes when it is promoted.
+        """
         if not self.engine:
             raise ConnectionError("SQL connection not established")
 
         try:
             # Generate CREATE TABLE statement
+            quote = self.engine.dialect.identifier_preparer.quote
             columns = []
             for col_name, col_info in schema.items():
-                col_def = f"{col_name} {col_info['type']}"
+                col_def = f"{quote(col_name)} {self.column_type(col_info)}"
                 if not col_info.get('nullable', True):
                     col_def += " NOT NULL"
-                if col_info.get('primary_key', False):
+                if col_info.get('primary_key', False) and not staging:
                     col_def += " PRIMARY KEY"
+                references = col_info.get('references')
+                if references and self.engine.dialect.name == 'sqlite':
+                    # SQLite cannot add a foreign key to an existing table, so it is declared here;
+                    # it only checks it with PRAGMA foreign_keys on, so loading the staged rows is unaffected
+                    col_def += f" REFERENCES {quote(references['table'])} ({quote(references['column'])})"
                 columns.append(col_def)
 
-            create_stmt = f"CREATE TABLE {table_name} ({', '.join(columns)})"
-            
+            dialect = self.engine.dialect.name
+            unlogged = "UNLOGGED " if staging and dialect == 'postgresql' else ""
+            create_stmt = f"CREATE {unlogged}TABLE {quote(table_name)} ({', '.join(columns)})"
+
+            if staging and dialect == 'sqlite':
+                # persistent per database; readers no longer block the bulk writer
+                with self.engine.connect() as conn:
+                    conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+
             with self.engine.connect() as conn:
                 conn.execute(text(create_stmt))
                 conn.commit()
+            # the inspector caches reflection results, including has_table()
+            self.inspector.clear_cache()
             return True
         except SQLAlchemyError as e:
             console.print(f"[red]Failed to create table: {str(e)}")
@@ -152,17 +260,229 @@ class SQLConnector:
         """Insert data into table."""
         if not self.engine:
             raise ConnectionError("SQL connection not established")
+        if not data:
+            return True
 
+        # documents may not all carry the same keys, so bind the union of them
+        columns = list(dict.fromkeys(key for row in data for key in row))
+        rows = [tuple(row.get(col) for col in columns) for row in data]
         try:
-            with self.engine.connect() as conn:
-                conn.execute(text(f"INSERT INTO {table_name} ({', '.join(data[0].keys())}) VALUES ({', '.join([f':{key}' for key in data[0].keys()])})"))
-                conn.commit()
-                print(f"Inserted {len(data)} rows into {table_name}")
+            result = self.insert_rows(table_name, columns, rows)
+            logger.info(f"Inserted {result.rows} rows into {table_name} using {result.strategy}")
             return True
         except SQLAlchemyError as e:
             console.print(f"[red]Failed to insert data: {str(e)}")
             return False
 
+    def get_loader(self) -> BulkLoader:
+        """Loader for the configured strategy on this engine's dialect."""
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+        if self._loader is None:
+            dialect = self.engine.dialect
+            self._loader = get_loader(resolve_strategy(dialect.name, dialect.driver, self.load_strategy))
+        return self._loader
+
+    def session(self, commit_rows: int = DEFAULT_COMMIT_ROWS, commit_seconds: float = DEFAULT_COMMIT_SECONDS,
+                stats: Optional[CommitStats] = None) -> WriterSession:
+        """Writer session holding one connection and committing every commit_rows rows or commit_seconds seconds."""
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+        return WriterSession(self.engine, self.get_loader(), commit_rows, commit_seconds,
+                             fast_load=self.fast_load, stats=stats)
+
+    def insert_rows(self, table_name: str, columns: List[str], rows: List[Tuple[Any, ...]],
+                    before_commit: Optional[Callable[[Any], None]] = None, isolate: bool = False) -> LoadResult:
+        """Bulk load row tuples in one transaction using the configured strategy.
+
+        before_commit is called with the open connection so callers can record
+        bookkeeping (e.g. checkpoints) atomically with the batch. With isolate,
+        rows the database refuses are bisected out and listed in result.rejected.
+        """
+        with self.session() as session:
+            return session.insert(table_name, columns, rows, before_commit, isolate)
+
+    def staging_name(self, table_name: str) -> str:
+        return f"{table_name}{STAGING_SUFFIX}"
+
+    def drop_table(self, table_name: str) -> bool:
+        """Drop a table if it exists."""
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+        if not self.table_exists(table_name):
+            return False
+        quote = self.engine.dialect.identifier_preparer.quote
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE {quote(table_name)}")
+        self.inspector.clear_cache()
+        return True
+
+    def _rename_statement(self, old_name: str, new_name: str) -> str:
+        quote = self.engine.dialect.identifier_preparer.quote
+        dialect = self.engine.dialect.name
+        if dialect == 'mysql':
+            return f"RENAME TABLE {quote(old_name)} TO {quote(new_name)}"
+        if dialect == 'mssql':
+            return f"EXEC sp_rename '{old_name}', '{new_name}'"
+        return f"ALTER TABLE {quote(old_name)} RENAME TO {quote(new_name)}"
+
+    def _index_statements(self, table_name: str, indexes: List[Dict[str, Any]]) -> List[str]:
+        quote = self.engine.dialect.identifier_preparer.quote
+        statements = []
+        for index in indexes:
+            columns = ', '.join(quote(c) for c in index['columns'])
+            suffix = '_'.join(index['columns'])
+            if index.get('primary_key') and self.engine.dialect.name != 'sqlite':
+                statements.append(f"ALTER TABLE {quote(table_name)} "
+                                  f"ADD CONSTRAINT {quote(f'pk_{table_name}')} PRIMARY KEY ({columns})")
+            elif index.get('references'):
+                references = index['references']
+                if self.engine.dialect.name != 'sqlite':
+                    statements.append(f"ALTER TABLE {quote(table_name)} "
+                                      f"ADD CONSTRAINT {quote(f'fk_{table_name}_{suffix}')} FOREIGN KEY ({columns}) "
+                                      f"REFERENCES {quote(references['table'])} ({quote(references['column'])})")
+                # the constraint does not index the referencing column, and joins to the parent need it
+                statements.append(f"CREATE INDEX {quote(f'ix_{table_name}_{suffix}')} "
+                                  f"ON {quote(table_name)} ({columns})")
+            elif index.get('primary_key') or index.get('unique'):
+                # SQLite cannot add a primary key to an existing table; a unique index serves the same lookups
+                statements.append(f"CREATE UNIQUE INDEX {quote(f'ux_{table_name}_{suffix}')} "
+                                  f"ON {quote(table_name)} ({columns})")
+            else:
+                statements.append(f"CREATE INDEX {quote(f'ix_{table_name}_{suffix}')} "
+                                  f"ON {quote(table_name)} ({columns})")
+        return statements
+
+    def create_indexes(self, table_name: str, indexes: List[Dict[str, Any]]):
+        """Create the primary key and indexes of an index plan on a table."""
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+        with self.engine.begin() as conn:
+            for statement in self._index_statements(table_name, indexes):
+                conn.exec_driver_sql(statement)
+        self.inspector.clear_cache()
+
+    def promote_table(self, staging_table: str, table_name: str, indexes: List[Dict[str, Any]]) -> float:
+        """Swap a loaded staging table into place and build its keys and indexes once.
+
+        On PostgreSQL the table is made LOGGED first. Dropping the old table,
+        the rename and the index builds then run in one transaction, which is
+        atomic where DDL is transactional (PostgreSQL, SQLite). Returns the
+        seconds spent.
+        """
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+
+        start = time.perf_counter()
+        quote = self.engine.dialect.identifier_preparer.quote
+        dialect = self.engine.dialect.name
+        if dialect == 'postgresql':
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql(f"ALTER TABLE {quote(staging_table)} SET LOGGED")
+
+        replace = self.table_exists(table_name)
+        with self.engine.begin() as conn:
+            if replace:
+                conn.exec_driver_sql(f"DROP TABLE {quote(table_name)}")
+            conn.exec_driver_sql(self._rename_statement(staging_table, table_name))
+            for statement in self._index_statements(table_name, indexes):
+                logger.info(f"Building index: {statement}")
+                conn.exec_driver_sql(statement)
+        self.inspector.clear_cache()
+        return time.perf_counter() - start
+
+    def ensure_unique_key(self, table_name: str, key_columns: List[str]) -> bool:
+        """Make sure key_columns are covered by a primary key or unique index, creating one if not."""
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+
+        inspector = self.inspector
+        wanted = list(key_columns)
+        if inspector.get_pk_constraint(table_name).get('constrained_columns') == wanted:
+            return False
+        for index in inspector.get_indexes(table_name):
+            if index.get('unique') and index.get('column_names') == wanted:
+                return False
+        for constraint in inspector.get_unique_constraints(table_name):
+            if constraint.get('column_names') == wanted:
+                return False
+
+        quote = self.engine.dialect.identifier_preparer.quote
+        index_name = f"ux_{table_name}_{'_'.join(key_columns)}"
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"CREATE UNIQUE INDEX {quote(index_name)} ON {quote(table_name)} "
+                f"({', '.join(quote(c) for c in key_columns)})"
+            )
+        self.inspector.clear_cache()
+        return True
+
+    def column_kinds(self, table_name: str, columns: List[str]) -> List[str]:
+        """Checksum kinds of the columns, from their reflected types."""
+        types = {column['name']: column['type'] for column in self.inspector.get_columns(table_name)}
+        return [column_kind(types[name]) for name in columns]
+
+    def _range_select(self, table_name: str, expressions: Callable[[Table], List[Any]], key: str,
+                      lower: Any = None, upper: Any = None):
+        table = Table(table_name, MetaData(), autoload_with=self.engine)
+        conditions = []
+        if lower is not None:
+            conditions.append(table.c[key] >= lower)
+        if upper is not None:
+            conditions.append(table.c[key] < upper)
+        query = select(*expressions(table))
+        return query.where(and_(*conditions)) if conditions else query
+
+    def range_checksum(self, table_name: str, columns: List[str], kinds: List[str], key: str,
+                       lower: Any = None, upper: Any = None) -> Optional[Tuple[int, int]]:
+        """Row count and digest sum of the rows with lower <= key < upper, computed by the database.
+
+        Returns None where the dialect cannot hash rows, so the caller
+        reads them with range_rows and hashes them itself.
+        """
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+        dialect = self.engine.dialect.name
+        if checksum_columns(dialect, [], []) is None:
+            return None
+        query = self._range_select(
+            table_name, lambda table: checksum_columns(dialect, [table.c[c] for c in columns], kinds),
+            key, lower, upper,
+        )
+        with self.engine.connect() as conn:
+            count, digest = conn.execute(query).one()
+        return count, int(digest or 0)
+
+    def range_rows(self, table_name: str, columns: List[str], key: str, lower: Any = None,
+                   upper: Any = None) -> Iterator[Tuple[Any, ...]]:
+        """Stream the rows with lower <= key < upper, values typed by the driver."""
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+        query = self._range_select(table_name, lambda table: [table.c[c] for c in columns], key, lower, upper)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=10000).execute(query)
+            for row in result:
+                yield tuple(row)
+
+    def upsert_rows(self, table_name: str, columns: List[str], rows: List[Tuple[Any, ...]], key_columns: List[str],
+                    before_commit: Optional[Callable[[Any], None]] = None, isolate: bool = False) -> LoadResult:
+        """Insert or update row tuples by key (ON CONFLICT / ON DUPLICATE KEY / MERGE) in one transaction."""
+        with self.session() as session:
+            return session.upsert(table_name, columns, rows, key_columns, before_commit, isolate)
+
+    def delete_rows(self, table_name: str, key_columns: List[str], keys: List[Tuple[Any, ...]],
+                    before_commit: Optional[Callable[[Any], None]] = None) -> int:
+        """Delete rows by key tuples in one transaction."""
+        if not self.engine:
+            raise ConnectionError("SQL connection not established")
+
+        with self.engine.begin() as conn:
+            if keys:
+                conn.exec_driver_sql(delete_statement(conn, table_name, key_columns), keys)
+            if before_commit:
+                before_commit(conn)
+        return len(keys)
+
     def __enter__(self):
         """Context manager entry."""
         self.connect()
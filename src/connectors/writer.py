@@ -0,0 +1,302 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError, ProgrammingError
+
+from utils.metrics import get_registry
+from .loaders import BulkLoader, LoadResult, run_load, upsert_statement
+
+logger = logging.getLogger(__name__)
+
+# neither limit set: commit after every batch
+DEFAULT_COMMIT_ROWS = 0
+DEFAULT_COMMIT_SECONDS = 0.0
+
+# errors caused by the rows themselves; anything else (lost connection, lock timeout) fails the batch
+ROW_ERRORS = ('IntegrityError', 'DataError', 'ProgrammingError')
+
+
+def is_row_error(conn, error: BaseException) -> bool:
+    """Whether an error was caused by the data of a batch rather than by the database."""
+    if isinstance(error, (IntegrityError, DataError, ProgrammingError)):
+        return True
+    # COPY and other raw-cursor loaders raise the driver's exceptions unwrapped
+    dbapi = getattr(conn.dialect, 'loaded_dbapi', None) or getattr(conn.dialect, 'dbapi', None)
+    classes = tuple(getattr(dbapi, name) for name in ROW_ERRORS if hasattr(dbapi, name))
+    return bool(classes) and isinstance(error, classes)
+
+
+class CommitStats:
+    """Commits of a writer session: how many, how large and how long they took."""
+
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self.max_commit_rows = 0
+        self.rollbacks = 0
+        self.rejected = 0
+        self.bisect_statements = 0
+
+    def batch(self, rows: int):
+        self.batches += 1
+        self.rows += rows
+
+    def commit(self, rows: int, seconds: float):
+        self.commits += 1
+        self.commit_seconds += seconds
+        self.max_commit_rows = max(self.max_commit_rows, rows)
+
+    def merge(self, summary: Dict[str, Any]):
+        """Fold in the summary of a session in another worker."""
+        self.batches += summary['batches']
+        self.rows += summary['rows']
+        self.commits += summary['commits']
+        self.commit_seconds += summary['commit_seconds']
+        self.max_commit_rows = max(self.max_commit_rows, summary['max_commit_rows'])
+        self.rollbacks += summary['rollbacks']
+        self.rejected += summary['rejected']
+        self.bisect_statements += summary['bisect_statements']
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'commits': self.commits,
+            'rows_per_commit': round(self.rows / self.commits, 1) if self.commits else 0.0,
+            'max_commit_rows': self.max_commit_rows,
+            'commit_seconds': round(self.commit_seconds, 6),
+            'rollbacks': self.rollbacks,
+            'rejected': self.rejected,
+            'bisect_statements': self.bisect_statements,
+        }
+
+
+class WriterSession:
+    """One connection kept for a whole load, committing every commit_rows rows or commit_seconds seconds.
+
+    While several batches share a transaction, each one runs in a savepoint:
+    a failing batch is rolled back on its own and re-raised, and the batches
+    before it stay pending, so the caller can retry or split it. Leaving the
+    session commits what is pending, or rolls it back on an exception.
+    """
+
+    def __init__(self, engine, loader: BulkLoader, commit_rows: int = DEFAULT_COMMIT_ROWS,
+                 commit_seconds: float = DEFAULT_COMMIT_SECONDS, fast_load: bool = False,
+                 stats: Optional[CommitStats] = None):
+        if commit_rows < 0 or commit_seconds < 0:
+            raise ValueError("commit_rows and commit_seconds must not be negative")
+        self.engine = engine
+        self.loader = loader
+        self.commit_rows = commit_rows
+        self.commit_seconds = commit_seconds
+        self.fast_load = fast_load
+        self.stats = stats or CommitStats()
+        self.conn = None
+        self.transaction = None
+        self.pending_rows = 0
+        self._opened = 0.0
+        # SQLite synchronous level to restore before the connection goes back to the pool
+        self._synchronous = None
+
+    @property
+    def batching(self) -> bool:
+        """Whether batches share transactions instead of committing one by one."""
+        return self.commit_rows > 0 or self.commit_seconds > 0
+
+    def _connection(self):
+        if self.conn is None:
+            self.conn = self.engine.connect()
+            if self.fast_load and self.conn.dialect.name == 'sqlite':
+                # a crash loses the staging table at worst, which is rebuilt on the next run
+                self._synchronous = self.conn.exec_driver_sql("PRAGMA synchronous").scalar()
+                self.conn.exec_driver_sql("PRAGMA synchronous = OFF")
+                # end the transaction the PRAGMA autobegan so the batch can begin its own
+                self.conn.commit()
+        if self.transaction is None:
+            self.transaction = self.conn.begin()
+            if self.conn.dialect.name == 'sqlite':
+                # pysqlite only sends BEGIN before DML, so a leading SAVEPOINT would
+                # open the transaction itself and its RELEASE would commit it
+                self.conn.exec_driver_sql("BEGIN")
+            self._opened = time.perf_counter()
+        return self.conn
+
+    def _due(self) -> bool:
+        if not self.batching:
+            return True
+        if self.commit_rows > 0 and self.pending_rows >= self.commit_rows:
+            return True
+        return self.commit_seconds > 0 and time.perf_counter() - self._opened >= self.commit_seconds
+
+    def write(self, work: Callable[[Any], LoadResult],
+              before_commit: Optional[Callable[[Any], None]] = None) -> LoadResult:
+        """Run work(conn) for one batch, then commit if the interval is reached.
+
+        before_commit runs in the same savepoint as the batch, so bookkeeping
+        such as checkpoints becomes durable exactly when the batch does.
+        """
+        conn = self._connection()
+        metrics = get_registry()
+        start = time.perf_counter()
+        savepoint = conn.begin_nested() if self.batching else None
+        try:
+            result = work(conn)
+            if before_commit:
+                before_commit(conn)
+        except Exception:
+            self.stats.rollbacks += 1
+            metrics.inc('etl_load_rollbacks_total')
+            if savepoint is not None:
+                savepoint.rollback()
+            else:
+                self.rollback()
+            raise
+        if savepoint is not None:
+            savepoint.commit()
+        metrics.observe('etl_load_insert_seconds', time.perf_counter() - start)
+        metrics.observe('etl_load_batch_rows', result.rows)
+        metrics.inc('etl_load_rows_total', result.rows)
+        self.pending_rows += result.rows
+        self.stats.batch(result.rows)
+        if self._due():
+            self.commit()
+        return result
+
+    def _bisect(self, conn, load: Callable[[Any, List[Tuple[Any, ...]]], LoadResult],
+                rows: List[Tuple[Any, ...]], offset: int, rejected: List[Tuple[int, BaseException]]) -> int:
+        """Load rows in a savepoint, halving on a row error until the bad rows are alone.
+
+        k bad rows in a batch of n cost about 2k log2(n) extra statements.
+        Returns the number of rows written.
+        """
+        savepoint = conn.begin_nested()
+        try:
+            load(conn, rows)
+        except Exception as e:
+            savepoint.rollback()
+            if not is_row_error(conn, e):
+                raise
+            self.stats.bisect_statements += 1
+            get_registry().inc('etl_load_retries_total')
+            if len(rows) == 1:
+                rejected.append((offset, e))
+                return 0
+            middle = len(rows) // 2
+            return (self._bisect(conn, load, rows[:middle], offset, rejected)
+                    + self._bisect(conn, load, rows[middle:], offset + middle, rejected))
+        savepoint.commit()
+        return len(rows)
+
+    def _isolating(self, strategy: str, load: Callable[[Any, List[Tuple[Any, ...]]], LoadResult],
+                   rows: List[Tuple[Any, ...]]) -> Callable[[Any], LoadResult]:
+        def work(conn):
+            start = time.perf_counter()
+            rejected: List[Tuple[int, BaseException]] = []
+            written = self._bisect(conn, load, rows, 0, rejected) if rows else 0
+            self.stats.rejected += len(rejected)
+            if rejected:
+                get_registry().inc('etl_load_rejected_rows_total', len(rejected))
+            return LoadResult(strategy, written, time.perf_counter() - start, rejected=rejected)
+
+        return work
+
+    def insert(self, table_name: str, columns: List[str], rows: List[Tuple[Any, ...]],
+               before_commit: Optional[Callable[[Any], None]] = None, isolate: bool = False) -> LoadResult:
+        """Bulk load row tuples with the session's loader.
+
+        With isolate, a batch failing on bad rows is bisected so the good
+        rows are still written; the bad ones are listed in result.rejected.
+        """
+        def load(conn, part):
+            return run_load(conn, self.loader, table_name, columns, part)
+
+        work = self._isolating(self.loader.name, load, rows) if isolate else (lambda conn: load(conn, rows))
+        return self.write(work, before_commit)
+
+    def insert_tables(self, tables: Sequence[Tuple[str, List[str], List[Tuple[Any, ...]]]],
+                      before_commit: Optional[Callable[[Any], None]] = None,
+                      isolate: bool = False) -> List[LoadResult]:
+        """Bulk load (table, columns, rows) in order as one batch, so the tables commit or roll back together.
+
+        Parents go before the tables referencing them. Returns one result
+        per table; with isolate, each lists the rows it rejected.
+        """
+        results: List[LoadResult] = []
+
+        def work(conn):
+            start = time.perf_counter()
+            results.clear()
+            for table_name, columns, rows in tables:
+                def load(conn, part, table_name=table_name, columns=columns):
+                    return run_load(conn, self.loader, table_name, columns, part)
+
+                results.append(self._isolating(self.loader.name, load, rows)(conn) if isolate
+                               else load(conn, rows))
+            return LoadResult(self.loader.name, sum(r.rows for r in results), time.perf_counter() - start,
+                              statements=sum(r.statements for r in results))
+
+        self.write(work, before_commit)
+        return results
+
+    def upsert(self, table_name: str, columns: List[str], rows: List[Tuple[Any, ...]], key_columns: List[str],
+               before_commit: Optional[Callable[[Any], None]] = None, isolate: bool = False) -> LoadResult:
+        """Insert or update row tuples by key, isolating bad rows as insert does."""
+        def load(conn, part):
+            start = time.perf_counter()
+            if part:
+                conn.exec_driver_sql(upsert_statement(conn, table_name, columns, key_columns), part)
+            return LoadResult('upsert', len(part), time.perf_counter() - start)
+
+        work = self._isolating('upsert', load, rows) if isolate else (lambda conn: load(conn, rows))
+        return self.write(work, before_commit)
+
+    def commit(self):
+        """Commit the pending batches."""
+        if self.transaction is None:
+            return
+        start = time.perf_counter()
+        self.transaction.commit()
+        seconds = time.perf_counter() - start
+        self.stats.commit(self.pending_rows, seconds)
+        get_registry().observe('etl_load_commit_seconds', seconds)
+        logger.debug(f"Committed {self.pending_rows} rows")
+        self.transaction = None
+        self.pending_rows = 0
+
+    def rollback(self):
+        """Discard the pending batches."""
+        if self.transaction is not None:
+            self.transaction.rollback()
+            if self.pending_rows:
+                logger.warning(f"Rolled back {self.pending_rows} uncommitted rows")
+        self.transaction = None
+        self.pending_rows = 0
+
+    def close(self):
+        if self.conn is not None:
+            if self._synchronous is not None:
+                try:
+                    self.conn.exec_driver_sql(f"PRAGMA synchronous = {int(self._synchronous)}")
+                    self.conn.commit()
+                except Exception:
+                    # never hand a connection without durability to the shared pool
+                    self.conn.invalidate()
+                self._synchronous = None
+            self.conn.close()
+            self.conn = None
+            self.transaction = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
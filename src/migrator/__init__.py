@@ -0,0 +1,12 @@
+"""
+Migration engine package
+"""
+
+from .batching import BatchSizer
+from .migrator import Migrator, StageStats
+from .pipeline import CHAIN_STEPS, PipelineContext, run_chain, run_step
+from .scheduler import Job, Scheduler, load_manifest, match_collections
+from .spill import SPILL_FORMATS, SpillDirectory
+
+__all__ = ['BatchSizer', 'Migrator', 'StageStats', 'CHAIN_STEPS', 'PipelineContext', 'run_chain', 'run_step',
+           'Job', 'Scheduler', 'load_manifest', 'match_collections', 'SPILL_FORMATS', 'SpillDirectory']
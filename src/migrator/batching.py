@@ -0,0 +1,133 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_BATCH_SIZE = 50
+DEFAULT_MAX_BATCH_SIZE = 50000
+# transformed rows held per batch; documents are a little larger before conversion
+DEFAULT_TARGET_BATCH_BYTES = 8 * 2 ** 20
+# time to write one batch; longer batches hold locks and lose more work on a failure
+DEFAULT_TARGET_BATCH_SECONDS = 0.5
+
+# weight of the newest batch in the running averages
+SMOOTHING = 0.5
+# sizes within this fraction of the current one are not worth a change
+DEADBAND = 0.1
+# the most the size may grow or shrink between two batches
+MAX_STEP = 2.0
+
+
+class BatchSizer:
+    """Picks the size of the next batch from the bytes and write time of the batches so far.
+
+    Keeps rows per batch within [min_size, max_size] while aiming for
+    target_bytes of rows and target_seconds per insert, whichever allows
+    fewer rows. With the multi-row VALUES loader, sizes are whole
+    statements of rows_per_statement rows, the most the dialect's bind
+    parameter limit allows, so no batch ends in a short statement.
+
+    The extract stage reads size before every batch and the load stage
+    calls observe after writing one, so the size follows the documents as
+    they get larger or smaller over the collection.
+    """
+
+    def __init__(self, min_size: int = DEFAULT_MIN_BATCH_SIZE, max_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 target_bytes: int = DEFAULT_TARGET_BATCH_BYTES,
+                 target_seconds: float = DEFAULT_TARGET_BATCH_SECONDS):
+        if min_size <= 0 or max_size < min_size:
+            raise ValueError("Batch size bounds need 0 < min_size <= max_size")
+        if target_bytes <= 0 and target_seconds <= 0:
+            raise ValueError("Set a target batch size in bytes, in seconds, or both")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_bytes = target_bytes
+        self.target_seconds = target_seconds
+        self.reset(min_size)
+
+    def reset(self, initial: int):
+        """Start a new run at the initial size, clamped to the bounds."""
+        self.rows_per_statement = 0
+        self.size = self._bounded(initial)
+        self.initial = self.size
+        self.bytes_per_row = 0.0
+        self.seconds_per_row = 0.0
+        self.rows = 0
+        self.smallest = self.largest = self.size
+        # (rows loaded before the change, new size, reason)
+        self.changes: List[Any] = []
+
+    def align(self, rows_per_statement: int):
+        """Keep sizes to whole statements of the loader; 0 when a statement takes any number of rows."""
+        self.rows_per_statement = rows_per_statement
+        self.size = self._bounded(self.size)
+        if not self.rows:
+            self.initial = self.smallest = self.largest = self.size
+
+    def _bounded(self, size: float) -> int:
+        size = int(min(max(size, self.min_size), self.max_size))
+        step = self.rows_per_statement
+        if step and size > step:
+            size -= size % step
+        return max(size, 1)
+
+    def _average(self, current: float, value: float) -> float:
+        return value if not current else SMOOTHING * value + (1 - SMOOTHING) * current
+
+    def observe(self, rows: int, nbytes: int, seconds: Optional[float] = None):
+        """Record a written batch and pick the size of the next one.
+
+        seconds is None when nothing was written, as in a dry run, so only
+        the byte target applies.
+        """
+        if rows <= 0:
+            return
+        self.rows += rows
+        self.bytes_per_row = self._average(self.bytes_per_row, nbytes / rows)
+        if seconds is not None:
+            self.seconds_per_row = self._average(self.seconds_per_row, seconds / rows)
+
+        wanted, reason = float(self.max_size), 'max size'
+        if self.target_bytes > 0 and self.bytes_per_row:
+            by_bytes = self.target_bytes / self.bytes_per_row
+            if by_bytes < wanted:
+                wanted, reason = by_bytes, f"{self.bytes_per_row:,.0f} bytes/row"
+        if self.target_seconds > 0 and self.seconds_per_row:
+            by_time = self.target_seconds / self.seconds_per_row
+            if by_time < wanted:
+                wanted, reason = by_time, f"{self.seconds_per_row * 1e6:,.1f} us/row"
+        wanted = min(max(wanted, self.size / MAX_STEP), self.size * MAX_STEP)
+        if abs(wanted - self.size) <= DEADBAND * self.size:
+            return
+        size = self._bounded(wanted)
+        if size == self.size:
+            return
+        logger.info(f"Batch size {self.size} -> {size} after {self.rows} rows ({reason})")
+        self.changes.append((self.rows, size, reason))
+        self.size = size
+        self.smallest = min(self.smallest, size)
+        self.largest = max(self.largest, size)
+
+    def merge(self, summary: Dict[str, Any]):
+        """Fold in the summary of the sizer of another worker."""
+        if not summary['rows']:
+            return
+        if not self.rows:
+            self.initial, self.size = summary['initial'], summary['final']
+            self.smallest, self.largest = summary['smallest'], summary['largest']
+        self.rows += summary['rows']
+        self.smallest = min(self.smallest, summary['smallest'])
+        self.largest = max(self.largest, summary['largest'])
+        self.changes.extend(tuple(change) for change in summary['changes'])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'initial': self.initial,
+            'final': self.size,
+            'smallest': self.smallest,
+            'largest': self.largest,
+            'rows': self.rows,
+            'bytes_per_row': round(self.bytes_per_row, 1),
+            'seconds_per_row': round(self.seconds_per_row, 9),
+            'changes': list(self.changes),
+        }
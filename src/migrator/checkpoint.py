@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+from sqlalchemy import (
+    BigInteger, Boolean, Column, Integer, MetaData, String, Table, Text, and_, delete, insert, select, update,
+)
+
+from connectors import KeyRange
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_TABLE = '_etl_checkpoints'
+
+
+def schema_hash(columns: List[str], schema: Dict[str, Any]) -> str:
+    """Fingerprint of the column layout a checkpoint was written with."""
+    layout = [(col, str(schema.get(col, {}).get('type'))) for col in columns]
+    return hashlib.sha256(json.dumps(layout).encode()).hexdigest()
+
+
+def _dump_key(value: Any) -> Optional[str]:
+    # extended JSON keeps ObjectId, dates etc. intact for the range query on resume
+    return None if value is None else json_util.dumps(value)
+
+
+def _load_key(value: Optional[str]) -> Any:
+    return None if value is None else json_util.loads(value)
+
+
+class Checkpoint:
+    """Saved progress of one key range of a migration job."""
+
+    def __init__(self, key_range: KeyRange, last_key: Any = None, rows_written: int = 0,
+                 schema_hash: Optional[str] = None, done: bool = False):
+        self.key_range = key_range
+        self.last_key = last_key
+        self.rows_written = rows_written
+        self.schema_hash = schema_hash
+        self.done = done
+
+    def remaining(self) -> KeyRange:
+        """The part of the range that still has to be migrated."""
+        if self.last_key is None:
+            return self.key_range
+        return self.key_range.resume_after(self.last_key)
+
+
+class CheckpointStore:
+    """Migration progress kept in a control table of the target database.
+
+    Checkpoints are written on the same connection as the batch they
+    describe, so a batch and its high-water mark commit together.
+    """
+
+    def __init__(self, engine, table_name: str = CHECKPOINT_TABLE):
+        self.engine = engine
+        metadata = MetaData()
+        self.table = Table(
+            table_name, metadata,
+            Column('job', String(255), primary_key=True),
+            Column('partition_index', Integer, primary_key=True),
+            Column('key_name', String(255), nullable=False),
+            Column('lower_key', Text),
+            Column('upper_key', Text),
+            Column('last_key', Text),
+            Column('rows_written', BigInteger, nullable=False, default=0),
+            Column('schema_hash', String(64)),
+            Column('done', Boolean, nullable=False, default=False),
+            Column('updated_at', String(32)),
+        )
+        metadata.create_all(self.engine, checkfirst=True)
+
+    def _where(self, job: str, index: Optional[int] = None):
+        clause = self.table.c.job == job
+        if index is not None:
+            clause = and_(clause, self.table.c.partition_index == index)
+        return clause
+
+    def load(self, job: str) -> List[Checkpoint]:
+        """All checkpoints of a job ordered by range."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.table).where(self._where(job)).order_by(self.table.c.partition_index)
+            ).mappings().all()
+        return [
+            Checkpoint(
+                KeyRange(row['key_name'], _load_key(row['lower_key']), _load_key(row['upper_key']),
+                         index=row['partition_index']),
+                last_key=_load_key(row['last_key']),
+                rows_written=row['rows_written'],
+                schema_hash=row['schema_hash'],
+                done=bool(row['done']),
+            )
+            for row in rows
+        ]
+
+    def start(self, job: str, ranges: List[KeyRange], schema_hash: str):
+        """Replace any previous progress of the job with a fresh range plan."""
+        now = datetime.now(timezone.utc).isoformat()
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self._where(job)))
+            conn.execute(insert(self.table), [
+                {
+                    'job': job,
+                    'partition_index': key_range.index,
+                    'key_name': key_range.key,
+                    'lower_key': _dump_key(key_range.lower),
+                    'upper_key': _dump_key(key_range.upper),
+                    'last_key': None,
+                    'rows_written': 0,
+                    'schema_hash': schema_hash,
+                    'done': False,
+                    'updated_at': now,
+                }
+                for key_range in ranges
+            ])
+
+    def save(self, conn, job: str, index: int, last_key: Any, rows: int):
+        """Advance the high-water mark of a range inside the caller's transaction.
+
+        A last_key of None only counts the rows and keeps the previous mark.
+        """
+        values = {
+            'rows_written': self.table.c.rows_written + rows,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        if last_key is not None:
+            values['last_key'] = _dump_key(last_key)
+        conn.execute(update(self.table).where(self._where(job, index)).values(**values))
+
+    def mark_done(self, job: str, index: int):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(self.table).where(self._where(job, index)).values(
+                    done=True, updated_at=datetime.now(timezone.utc).isoformat()
+                )
+            )
+
+    def clear(self, job: str):
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self._where(job)))
+
+
+class CheckpointTracker:
+    """Binds a store to one range of a job for the migration loop."""
+
+    def __init__(self, store: CheckpointStore, job: str, key_range: KeyRange):
+        self.store = store
+        self.job = job
+        self.key_range = key_range
+
+    @property
+    def key(self) -> str:
+        return self.key_range.key
+
+    def saver(self, last_key: Any, rows: int):
+        """Callback for SQLConnector.insert_rows recording this batch's high-water mark."""
+        return lambda conn: self.store.save(conn, self.job, self.key_range.index, last_key, rows)
+
+    def finish(self):
+        self.store.mark_done(self.job, self.key_range.index)
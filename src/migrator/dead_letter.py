@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId, json_util
+
+from transformers import ColumnPlan
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEAD_LETTER_PATH = 'dead_letter.jsonl'
+
+
+def _error_message(error: BaseException) -> str:
+    # SQLAlchemy wraps the driver error and appends the statement and parameters
+    orig = getattr(error, 'orig', None)
+    return str(orig if orig is not None else error).strip().splitlines()[0]
+
+
+class DeadLetterFile:
+    """Rows the target database refused, one JSON object per line with the error attached.
+
+    Records carry the source collection, the target table, the row as it
+    was loaded and the document _id, so replay can write the stored row
+    again or re-read the document from MongoDB. Rows of a child table also
+    name their parent table; they are always replayed from the stored row.
+    """
+
+    def __init__(self, path: str = DEFAULT_DEAD_LETTER_PATH):
+        self.path = path
+
+    @staticmethod
+    def record(collection: str, table: str, columns: Sequence[str], row: Tuple[Any, ...],
+               error: BaseException, parent: Optional[str] = None) -> Dict[str, Any]:
+        values = dict(zip(columns, row))
+        record = {
+            'collection': collection,
+            'table': table,
+            '_id': values.get('_id'),
+            'row': values,
+            'error': _error_message(error),
+            'error_type': type(error).__name__,
+            'failed_at': datetime.now(timezone.utc).isoformat(),
+        }
+        if parent:
+            record['parent_table'] = parent
+        return record
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Add records with a single append, so worker processes can share the file."""
+        if not records:
+            return
+        data = ''.join(json_util.dumps(record) + '\n' for record in records)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(data)
+
+    def read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            return [json_util.loads(line) for line in f if line.strip()]
+
+    def replace(self, records: List[Dict[str, Any]]):
+        """Rewrite the file atomically with the given records, removing it when there are none."""
+        if not records:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(json_util.dumps(record) + '\n' for record in records)
+        os.replace(tmp_path, self.path)
+
+
+def _source_id(value: Any, id_type: str) -> Any:
+    # ObjectId keys are loaded as their hex string
+    if id_type == 'ObjectId' and isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+
+def _group(records: List[Dict[str, Any]]) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    # parent tables first, so replayed child rows find the parent rows they reference
+    for record in sorted(records, key=lambda record: 'parent_table' in record):
+        groups.setdefault((record['collection'], record['table']), []).append(record)
+    return groups
+
+
+def _dedupe(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # a batch retried after a crash may have been dead-lettered twice; keep the latest record per row.
+    # Jobs sharing the file can reuse _id values, so a row is its collection, table and _id
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for record in records:
+        if record.get('_id') is None:
+            key: Any = id(record)
+        else:
+            key = (record['collection'], record['table'], json.dumps(record['_id'], default=str))
+        latest[key] = record
+    return list(latest.values())
+
+
+def replay_records(migrator, records: List[Dict[str, Any]], refetch: bool = True, batch_size: int = 1000,
+                   progress_callback: Optional[Callable[[int], None]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+    """Load dead-lettered records again and return the rows written and the records still failing.
+
+    With refetch, the documents are read from the source again by _id and
+    converted with the current schema, which picks up fixes made in
+    MongoDB. Otherwise the stored rows are written as they are, which
+    helps after the target table was fixed instead. Child table rows have no
+    document of their own and are always written as stored.
+    """
+    written = 0
+    failing: List[Dict[str, Any]] = []
+    for (collection, table), group in _group(_dedupe(records)).items():
+        parent = group[0].get('parent_table')
+        if parent:
+            columns = list(group[0]['row'])
+            rows = [tuple(record['row'].get(col) for col in columns) for record in group]
+        else:
+            plan = migrator.prepare_target(collection, table)
+            columns = list(plan.columns)
+            if refetch:
+                rows = _refetched_rows(migrator, collection, plan, group, failing)
+            else:
+                rows = [tuple(record['row'].get(col) for col in columns) for record in group]
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            result = migrator.target_connector.insert_rows(table, columns, batch, isolate=True)
+            rejected = {index: error for index, error in result.rejected}
+            for index, row in enumerate(batch):
+                if index in rejected:
+                    failing.append(DeadLetterFile.record(collection, table, columns, row, rejected[index], parent))
+            written += result.rows
+            if progress_callback:
+                progress_callback(len(batch))
+        logger.info(f"Replayed {len(rows)} rows into {table}")
+    return written, failing
+
+
+def _refetched_rows(migrator, collection: str, plan: ColumnPlan, group: List[Dict[str, Any]],
+                    failing: List[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+    """Rows converted from the current source documents of a group of records."""
+    id_type = plan.schema.get('_id', {}).get('type', 'ObjectId')
+    by_id = {record['_id']: record for record in group if record.get('_id') is not None}
+    ids = [_source_id(value, id_type) for value in by_id]
+    documents = list(migrator.source_connector.find(collection, {'_id': {'$in': ids}})) if ids else []
+    found = {str(doc['_id']) if id_type == 'ObjectId' else doc['_id'] for doc in documents}
+    for value in by_id:
+        if value not in found:
+            logger.warning(f"Document {value} of {collection} no longer exists, dropping its dead letter")
+    # without an _id the document cannot be found again
+    failing.extend(record for record in group if record.get('_id') is None)
+    return plan.rows(documents)
@@ -1,4 +1,86 @@
-from src.connectors.connector import Connector
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from bson.raw_bson import RawBSONDocument
+
+from connectors import CommitStats, CursorOptions, KeyRange, ScanPlan
+from connectors.connector import Connector
+from transformers import ColumnPlan, compile_plan
+from utils.metrics import get_registry
+from .batching import BatchSizer
+from .checkpoint import CheckpointStore, CheckpointTracker, schema_hash
+from .dead_letter import DeadLetterFile, replay_records
+from .prefetch import DEFAULT_QUEUE_DEPTH, QueueStats, prefetch
+
+logger = logging.getLogger(__name__)
+
+# one transformed batch: rows, their estimated bytes, the batch's last key and the rows of each child table
+Chunk = Tuple[List[Tuple[Any, ...]], int, Any, Dict[str, List[Tuple[Any, ...]]]]
+
+# documents profiled to infer the nested schema the column plan is compiled from
+SCHEMA_SAMPLE_SIZE = 1000
+
+
+def estimate_size(value: Any) -> int:
+    """Cheap payload size estimate used for bytes/sec reporting."""
+    if value is None:
+        return 0
+    if isinstance(value, RawBSONDocument):
+        return len(value.raw)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return 8
+
+
+class StageStats:
+    """Running totals for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.bytes = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def add(self, rows: int, nbytes: int, seconds: float):
+        self.rows += rows
+        self.bytes += nbytes
+        self.batches += 1
+        self.seconds += seconds
+
+    def merge(self, summary: Dict[str, Any]):
+        """Fold in the summary of the same stage from another worker."""
+        self.rows += summary['rows']
+        self.bytes += summary['bytes']
+        self.batches += summary['batches']
+        self.seconds += summary['seconds']
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'batches': self.batches,
+            'seconds': round(self.seconds, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+            'bytes_per_sec': round(self.bytes_per_sec, 1),
+        }
+
 
 class Migrator:
     # this will be a higher level class that will be used to migrate data from mongodb to sql
@@ -7,25 +89,570 @@ class Migrator:
     # - migrating the data
     # - logging the data
     # - reporting the data
-    
+    #
+    # the migration itself is a generator pipeline: extract -> transform -> load.
+    # only one batch is alive at any point, so memory stays O(batch_size)
+    # regardless of the collection size.
+
     # target and source connectors are passed as arguments
     def __init__(self, target_connector: Connector, source_connector: Connector):
         self.target_connector = target_connector
         self.source_connector = source_connector
-        self.target_connector.connect()
-        self.source_connector.connect()
+        if self.target_connector.connect() is False:
+            raise ConnectionError("Could not connect to the target database")
+        if self.source_connector.connect() is False:
+            raise ConnectionError("Could not connect to the source database")
+        self.stats: Dict[str, StageStats] = {}
+        self.load_strategy: Optional[str] = None
+        self.elapsed = 0.0
+        self.resumed_rows = 0
+        self.collection_schema: Dict[str, Any] = {}
+        self.deleted_rows = 0
+        # 0 profiles every document instead of a sample
+        self.schema_sample_size = SCHEMA_SAMPLE_SIZE
+        # batches buffered between stages running on their own threads; 0 runs them in turn
+        self.queue_depth = DEFAULT_QUEUE_DEPTH
+        self.queue_stats: Dict[str, QueueStats] = {}
+        # cursor batch size, hint and raw BSON for every scan; the projection comes from the column plan
+        self.cursor_options = CursorOptions()
+        self.push_projection = True
+        # natural, keyset or hint; auto picks keyset when checkpointing and natural order otherwise
+        self.scan_mode = 'auto'
+        self.scan_warnings: List[str] = []
+        # load into an unindexed staging table and build keys and indexes once at the end
+        self.staging = False
+        self.promote_seconds = 0.0
+        # rows or seconds between commits of the load session; both 0 commits every batch
+        self.commit_rows = 0
+        self.commit_seconds = 0.0
+        self.commit_stats = CommitStats()
+        # JSONL file for rows the target refuses; None fails the run on the first bad batch
+        self.dead_letter: Optional[str] = None
+        # resizes batches between its bounds after every load; None keeps batch_size for the whole run
+        self.batch_sizer: Optional[BatchSizer] = None
+        # write arrays to child tables keyed back to their parent row instead of JSON columns
+        self.normalize = False
+        self.child_rows: Dict[str, int] = {}
+        # semaphores shared by the jobs of a scheduler to cap concurrent batch reads and writes
+        self.read_slots: Optional[threading.Semaphore] = None
+        self.write_slots: Optional[threading.Semaphore] = None
+
+    def _reset_stats(self):
+        self.stats = {name: StageStats(name) for name in ('extract', 'transform', 'load')}
+        self.queue_stats = {name: QueueStats(name, self.queue_depth) for name in ('extract', 'transform')}
+        self.commit_stats = CommitStats()
+        self.child_rows = {}
+
+    # attributes copied to the Migrator of every worker process
+    WORKER_SETTINGS = ('queue_depth', 'cursor_options', 'push_projection', 'scan_mode', 'staging',
+                       'commit_rows', 'commit_seconds', 'dead_letter', 'batch_sizer',
+                       'normalize')
+
+    def worker_settings(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.WORKER_SETTINGS}
+
+    def read_options(self, plan: ColumnPlan, key: Optional[str] = None) -> CursorOptions:
+        """Cursor options for a scan, projecting only the fields the plan and the key need."""
+        if not self.push_projection:
+            return self.cursor_options
+        return self.cursor_options.with_projection(plan.projection([key] if key else ()))
+
+    def pipeline(self, source_table: str, plan: ColumnPlan, batch_size: int,
+                 query: Optional[Dict[str, Any]] = None, sort: Optional[List[Tuple[str, int]]] = None,
+                 key: Optional[str] = None,
+                 scan: Optional[ScanPlan] = None) -> Iterator[Chunk]:
+        """Chain extract and transform, each on its own thread behind a bounded queue when queue_depth > 0.
+
+        Loading then overlaps with fetching and converting the next batches,
+        so a run takes about as long as its slowest stage instead of the sum.
+        """
+        next_size = None
+        if self.batch_sizer is not None:
+            self.batch_sizer.reset(batch_size)
+            next_size = lambda: self.batch_sizer.size
+        batches = self.extract(source_table, batch_size, query, sort, self.read_options(plan, key), scan, next_size)
+        if self.queue_depth > 0:
+            batches = prefetch(batches, self.queue_depth, self.queue_stats['extract'])
+        chunks = self.transform(batches, plan, key)
+        if self.queue_depth > 0:
+            chunks = prefetch(chunks, self.queue_depth, self.queue_stats['transform'])
+        return chunks
+
+    def profile_source(self, source_table: str) -> Dict[str, Any]:
+        """Profile the source collection with the configured sample size."""
+        if self.schema_sample_size > 0:
+            return self.source_connector.get_collection_schema(source_table, sample_size=self.schema_sample_size)
+        return self.source_connector.get_collection_schema(source_table, full_scan=True)
+
+    def prepare_target(self, source_table: str, target_table: str, dry_run: bool = False,
+                       collection_schema: Optional[Dict[str, Any]] = None,
+                       load_table: Optional[str] = None) -> ColumnPlan:
+        """Create the target table if needed and return the column plan for its rows.
+
+        A collection_schema profiled earlier is used as-is instead of profiling
+        again. A load_table other than target_table is created as a staging
+        table without keys; the plan keeps the final table's name.
+        """
+        if collection_schema is None:
+            collection_schema = self.profile_source(source_table)
+        self.collection_schema = collection_schema
+        plan = compile_plan(collection_schema, name=target_table, arrays='child' if self.normalize else 'json',
+                            dialect=self.target_connector.dialect_name)
+
+        if dry_run and not self.target_connector.table_exists(target_table):
+            return plan
+
+        load_table = load_table or target_table
+        table_schema = plan.table_schema()
+        if not self.target_connector.table_exists(load_table):
+            staging = load_table != target_table
+            self.target_connector.create_table(load_table, table_schema, staging=staging)
+            if not staging:
+                self.target_connector.create_indexes(load_table, plan.index_plan())
+
+        if not self.target_connector.is_table_compatible(load_table, table_schema):
+            raise ValueError(f"Table {load_table} is not compatible with collection schema")
+        self.prepare_children(plan, load_table != target_table)
+
+        # only load columns the table actually has
+        return plan.select(self.target_connector.get_table_schema(load_table))
+
+    def prepare_children(self, plan: ColumnPlan, staging: bool = False):
+        """Create the child tables of a normalized plan, parents first so foreign keys can reference them."""
+        for child in plan.child_tables():
+            load_table = self.target_connector.staging_name(child.table_name) if staging else child.table_name
+            table_schema = child.table_schema()
+            if not self.target_connector.table_exists(load_table):
+                self.target_connector.create_table(load_table, table_schema, staging=staging)
+                if not staging:
+                    self.target_connector.create_indexes(load_table, child.index_plan())
+            elif not self.target_connector.is_table_compatible(load_table, table_schema):
+                raise ValueError(f"Table {load_table} is not compatible with the array {child.path}")
+
+    def load_table_name(self, table: str, dry_run: bool = False) -> str:
+        """Table rows for table are written to: its staging table when loading through one."""
+        return self.target_connector.staging_name(table) if self.staging and not dry_run else table
+
+    def child_loads(self, plan: ColumnPlan, dry_run: bool = False) -> Dict[str, Tuple[str, List[str]]]:
+        """Load table and columns of every child table of a plan, parents first."""
+        return {child.table_name: (self.load_table_name(child.table_name, dry_run), list(child.columns))
+                for child in plan.child_tables()}
+
+    def extract(self, source_table: str, batch_size: int, query: Optional[Dict[str, Any]] = None,
+                sort: Optional[List[Tuple[str, int]]] = None, options: Optional[CursorOptions] = None,
+                scan: Optional[ScanPlan] = None,
+                next_size: Optional[Callable[[], int]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the matching documents in cursor-sized batches, following a scan plan if given.
+
+        next_size, if given, is asked for the size of each batch instead of batch_size.
+        """
+        stats = self.stats['extract']
+        if scan is not None:
+            batches = self.source_connector.scan_batches(source_table, batch_size, query, scan, options,
+                                                         next_size)
+        else:
+            batches = self.source_connector.iter_batches(source_table, batch_size=batch_size, query=query,
+                                                         sort=sort, options=options, next_size=next_size)
+        read_slots = self.read_slots or nullcontext()
+        while True:
+            with read_slots:
+                start = time.perf_counter()
+                batch = next(batches, None)
+            if batch is None:
+                return
+            elapsed = time.perf_counter() - start
+            stats.add(len(batch), sum(estimate_size(doc) for doc in batch), elapsed)
+            yield batch
+
+    def transform(self, batches: Iterator[List[Dict[str, Any]]], plan: ColumnPlan,
+                  key: Optional[str] = None) -> Iterator[Chunk]:
+        """Turn each document batch into row tuples with the compiled column plan.
+
+        Alongside the rows, yields the raw value of key in the last document
+        so the loader can record it as the batch's high-water mark, and the
+        rows of a normalized plan's child tables, made in the same pass.
+        """
+        stats = self.stats['transform']
+        metrics = get_registry()
+        for batch in batches:
+            start = time.perf_counter()
+            rows = plan.rows(batch)
+            children = plan.child_rows(batch)
+            elapsed = time.perf_counter() - start
+            nbytes = sum(estimate_size(row) for row in rows)
+            nbytes += sum(estimate_size(row) for child_rows in children.values() for row in child_rows)
+            stats.add(len(rows), nbytes, elapsed)
+            metrics.observe('etl_transform_seconds', elapsed)
+            metrics.sample_memory()
+            yield rows, nbytes, batch[-1].get(key) if key else None, children
+
+    def load(self, chunks: Iterator[Chunk], target_table: str, columns: List[str],
+             progress_callback: Optional[Callable[[int], None]] = None,
+             tracker: Optional[CheckpointTracker] = None, upsert_keys: Optional[List[str]] = None,
+             source_table: str = '', children: Optional[Dict[str, Tuple[str, List[str]]]] = None) -> int:
+        """Write each chunk with one executemany and return the total row count.
+
+        All chunks go through one writer session, committed every
+        commit_rows rows or commit_seconds seconds. With upsert_keys, rows
+        are merged into existing ones by key instead of inserted. With a
+        dead_letter file, rows the database refuses are bisected out of
+        their batch and written there while the rest of the batch loads.
+        children maps the child tables of a chunk to their load table and
+        columns; they are written after the parent rows in the same batch.
+        """
+        stats = self.stats['load']
+        dead_letter = DeadLetterFile(self.dead_letter) if self.dead_letter else None
+        isolate = dead_letter is not None
+        sizer = self.batch_sizer
+        if sizer is not None and not upsert_keys:
+            # multi-row VALUES statements hold at most the dialect's bind parameter limit
+            sizer.align(self.target_connector.get_loader().rows_per_statement(self.target_connector.engine,
+                                                                              len(columns)))
+        write_slots = self.write_slots or nullcontext()
+        with self.target_connector.session(self.commit_rows, self.commit_seconds, self.commit_stats) as session:
+            for rows, nbytes, last_key, child_rows in chunks:
+                before_commit = tracker.saver(last_key, len(rows)) if tracker else None
+                with write_slots:
+                    start = time.perf_counter()
+                    if upsert_keys:
+                        result = session.upsert(target_table, columns, rows, upsert_keys, before_commit, isolate)
+                    elif child_rows:
+                        tables = [(target_table, columns, rows)] + [
+                            (*children[name], table_rows) for name, table_rows in child_rows.items()
+                        ]
+                        results = session.insert_tables(tables, before_commit, isolate)
+                        result = results[0]
+                        for name, (table, table_columns, table_rows), table_result in zip(child_rows, tables[1:],
+                                                                                           results[1:]):
+                            self.child_rows[name] = self.child_rows.get(name, 0) + table_result.rows
+                            if table_result.rejected:
+                                dead_letter.append([
+                                    DeadLetterFile.record(source_table, table, table_columns, table_rows[index],
+                                                          error, parent=target_table)
+                                    for index, error in table_result.rejected
+                                ])
+                                logger.warning(f"{len(table_result.rejected)} rows of {table} rejected, "
+                                               f"written to {dead_letter.path}")
+                    else:
+                        result = session.insert(target_table, columns, rows, before_commit, isolate)
+                if result.rejected:
+                    dead_letter.append([DeadLetterFile.record(source_table, target_table, columns, rows[index], error)
+                                        for index, error in result.rejected])
+                    logger.warning(f"{len(result.rejected)} rows of a batch of {len(rows)} rejected, "
+                                   f"written to {dead_letter.path}")
+                elapsed = time.perf_counter() - start
+                # rejected rows went to the dead-letter file, not the table
+                stats.add(len(rows) - len(result.rejected), nbytes, elapsed)
+                if sizer is not None:
+                    sizer.observe(len(rows), nbytes, elapsed)
+                self.load_strategy = result.strategy
+                logger.info(f"Batch of {result.rows} rows via {result.strategy}: "
+                            f"{result.rows_per_sec:,.0f} rows/sec ({stats.rows} total)")
+                if progress_callback:
+                    progress_callback(len(rows))
+        return stats.rows
+
+    def run(self, source_table: str, target_table: str, plan: ColumnPlan, batch_size: int,
+            query: Optional[Dict[str, Any]] = None, dry_run: bool = False,
+            progress_callback: Optional[Callable[[int], None]] = None,
+            key_range: Optional[KeyRange] = None, tracker: Optional[CheckpointTracker] = None) -> Dict[str, Any]:
+        """Run the pipeline over the documents matching query into a prepared table.
+
+        With a tracker, documents are read in ascending key order so the
+        checkpoint after each batch is a valid keyset resume point.
+        """
+        self._reset_stats()
+        self.target_connector.fast_load = self.staging
+        if key_range is not None:
+            query = key_range.to_query(query)
+        key = tracker.key if tracker else None
+        scan = self.plan_scan(key or (key_range.key if key_range else '_id'), resumable=tracker is not None)
+
+        chunks = self.pipeline(source_table, plan, batch_size, query, key=key, scan=scan)
+        if dry_run:
+            # run extract and transform so the throughput numbers are still meaningful
+            for rows, nbytes, _, _ in chunks:
+                if self.batch_sizer is not None:
+                    self.batch_sizer.observe(len(rows), nbytes)
+                if progress_callback:
+                    progress_callback(len(rows))
+        else:
+            self.load(chunks, target_table, list(plan.columns), progress_callback, tracker,
+                      source_table=source_table, children=self.child_loads(plan))
+            if tracker:
+                tracker.finish()
+        return self.report()
+
+    def plan_scan(self, key: str, resumable: bool) -> ScanPlan:
+        """Scan plan for the configured scan mode and index hint."""
+        return self.source_connector.plan_scan(self.scan_mode, key, resumable, self.cursor_options.hint)
+
+    def check_key_types(self, source_table: str, key: str, query: Optional[Dict[str, Any]], workers: int,
+                        resume: bool) -> Optional[str]:
+        """Refuse key ranges over a key of several types, whose range queries would skip documents.
+
+        A single worker in auto scan mode falls back to natural order without
+        checkpoints instead; the returned warning says so.
+        """
+        types = self.source_connector.key_types(source_table, key, query)
+        if len(types) <= 1:
+            return None
+        problem = (f"{key} of {source_table} holds values of several types ({', '.join(types)}), and key range "
+                   f"queries only match one type")
+        if workers > 1 or resume or self.scan_mode not in ('auto', 'natural'):
+            raise ValueError(f"{problem}; migrate with one worker and --scan auto or natural, without --resume")
+        return f"{problem}: reading in natural order without checkpoints"
+
+    def plan_ranges(self, source_table: str, plan: ColumnPlan, workers: int, partitions: Optional[int],
+                    partition_key: str, query: Optional[Dict[str, Any]], store: Optional[CheckpointStore],
+                    job: str, resume: bool) -> List[KeyRange]:
+        """Key ranges still to migrate, taken from the checkpoint store when resuming."""
+        current_hash = schema_hash(plan.columns, plan.table_schema())
+        if resume and store:
+            checkpoints = store.load(job)
+            if checkpoints:
+                if any(cp.schema_hash != current_hash for cp in checkpoints):
+                    raise ValueError(f"Schema changed since the checkpoint of {job} was written; "
+                                     "rerun without --resume")
+                self.resumed_rows = sum(cp.rows_written for cp in checkpoints)
+                logger.info(f"Resuming {job}: {self.resumed_rows} rows already migrated")
+                return [cp.remaining() for cp in checkpoints if not cp.done]
+            logger.warning(f"No checkpoint found for {job}, starting from the beginning")
+
+        if workers > 1:
+            from .parallel import PARTITIONS_PER_WORKER
+            ranges = self.source_connector.get_partitions(
+                source_table, partitions or workers * PARTITIONS_PER_WORKER, key=partition_key, query=query
+            )
+        else:
+            ranges = [KeyRange(partition_key)]
+        if store:
+            store.start(job, ranges, current_hash)
+        return ranges
+
+    def run_ranges(self, source_table: str, target_table: str, plan: ColumnPlan, batch_size: int,
+                   ranges: List[KeyRange], query: Optional[Dict[str, Any]] = None, dry_run: bool = False,
+                   progress_callback: Optional[Callable[[int], None]] = None,
+                   store: Optional[CheckpointStore] = None, job: str = '') -> Dict[str, Any]:
+        """Run key ranges one after another in this process and return their combined report.
+
+        A parallel run resumed with one worker leaves several ranges, each
+        continuing after its own checkpoint.
+        """
+        summaries = []
+        for key_range in ranges:
+            tracker = CheckpointTracker(store, job, key_range) if store else None
+            self.run(source_table, target_table, plan, batch_size, query, dry_run, progress_callback,
+                     key_range=key_range, tracker=tracker)
+            summaries.append((self.report(), self.queue_report(), self.commit_report(), self.child_report()))
+        if len(summaries) > 1:
+            # run() starts every range with fresh stats
+            self._reset_stats()
+            for report, queues, commits, children in summaries:
+                for name, summary in report.items():
+                    self.stats[name].merge(summary)
+                for name, summary in queues.items():
+                    self.queue_stats[name].merge(summary)
+                self.commit_stats.merge(commits)
+                for table, rows in children.items():
+                    self.child_rows[table] = self.child_rows.get(table, 0) + rows
+        return self.report()
+
+    def migrate(self, source_table: str, target_table: str, batch_size: int = 1000,
+                dry_run: bool = False, progress_callback: Optional[Callable[[int], None]] = None,
+                query: Optional[Dict[str, Any]] = None, workers: int = 1,
+                partitions: Optional[int] = None, partition_key: str = '_id',
+                checkpoint: bool = True, resume: bool = False,
+                collection_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Stream the whole source collection into the target table.
+
+        With more than one worker the collection is split into key ranges and
+        each range runs in its own process with its own connections. With
+        checkpointing, every committed batch records its range's high-water
+        mark so ``resume`` continues with an ``_id > last`` range query.
+
+        With staging, rows go to an unindexed staging table that replaces
+        target_table once every range is loaded; the primary key and the
+        indexes from the column plan are only built then.
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be a positive number")
+
+        start = time.perf_counter()
+        self.resumed_rows = 0
+        self.promote_seconds = 0.0
+        load_table = self.load_table_name(target_table, dry_run)
+        if load_table != target_table and not resume:
+            # left over from an interrupted run that is not being resumed
+            self.target_connector.drop_table(load_table)
+            if self.normalize:
+                if collection_schema is None:
+                    collection_schema = self.profile_source(source_table)
+                for child in compile_plan(collection_schema, target_table, 'child').child_tables():
+                    self.target_connector.drop_table(self.load_table_name(child.table_name))
+        plan = self.prepare_target(source_table, target_table, dry_run, collection_schema, load_table)
+
+        job = f"{source_table}:{target_table}"
+        store = CheckpointStore(self.target_connector.engine) if checkpoint and not dry_run else None
+        warnings = []
+        if store is not None or workers > 1:
+            warning = self.check_key_types(source_table, partition_key, query, workers, resume)
+            if warning:
+                warnings.append(warning)
+                store = None
+        if store is not None and self.scan_mode == 'natural':
+            if resume:
+                raise ValueError("A natural order scan has no position to resume from; rerun without --resume")
+            warnings.append("A natural order scan cannot be resumed; running without checkpoints")
+            store = None
+        for warning in warnings:
+            logger.warning(warning)
+        scan = self.plan_scan(partition_key, resumable=store is not None)
+        self.scan_warnings = warnings + self.source_connector.explain_scan(source_table, query, scan.sort, scan.hint)
+        ranges = self.plan_ranges(source_table, plan, workers, partitions, partition_key, query,
+                                  store, job, resume)
+        if self.resumed_rows and progress_callback:
+            progress_callback(self.resumed_rows)
+
+        if workers > 1:
+            from .parallel import migrate_partitions
+            report = migrate_partitions(self, source_table, load_table, plan, batch_size, workers, ranges,
+                                        query=query, dry_run=dry_run, progress_callback=progress_callback,
+                                        job=job if store else None)
+        elif ranges:
+            report = self.run_ranges(source_table, load_table, plan, batch_size, ranges, query, dry_run,
+                                     progress_callback, store, job)
+        else:
+            self._reset_stats()
+            report = self.report()
+        if load_table != target_table and self.target_connector.table_exists(load_table):
+            self.promote(plan, load_table, target_table)
+        self.elapsed = time.perf_counter() - start
+        return report
+
+    def promote(self, plan: ColumnPlan, load_table: str, target_table: str):
+        """Swap the staging tables of a run into place, parents before the child tables referencing them."""
+        children = plan.child_tables()
+        # the replaced child tables reference the replaced parent, so they go first
+        for child in reversed(children):
+            self.target_connector.drop_table(child.table_name)
+        self.promote_seconds = self.target_connector.promote_table(load_table, target_table, plan.index_plan())
+        for child in children:
+            self.promote_seconds += self.target_connector.promote_table(
+                self.load_table_name(child.table_name), child.table_name, child.index_plan())
+        logger.info(f"Promoted {load_table} to {target_table} in {self.promote_seconds:.2f}s")
+
+    def sync(self, source_table: str, target_table: str, watermark_field: str = 'updatedAt',
+             key_columns: Optional[List[str]] = None, batch_size: int = 1000,
+             query: Optional[Dict[str, Any]] = None, follow: bool = False, max_wait_seconds: float = 1.0,
+             progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Upsert documents changed since the last sync, optionally tailing the change stream afterwards."""
+        from .sync import sync_changes, tail_changes
+
+        if batch_size <= 0:
+            raise ValueError("batch_size must be a positive number")
+        if self.normalize:
+            raise ValueError("sync upserts single rows and does not maintain child tables; "
+                             "run it without normalize")
+
+        start = time.perf_counter()
+        key_columns = key_columns or ['_id']
+        plan = self.prepare_target(source_table, target_table)
+        self.target_connector.ensure_unique_key(target_table, key_columns)
+
+        # open the stream before catching up so no change falls between the two
+        stream = self.open_tail(source_table, target_table) if follow else None
+        report = sync_changes(self, source_table, target_table, plan, batch_size, watermark_field,
+                              key_columns, query, progress_callback)
+        if stream is not None:
+            try:
+                report = tail_changes(self, stream, source_table, target_table, plan, batch_size,
+                                      key_columns, max_wait_seconds, progress_callback)
+            finally:
+                stream.close()
+        self.elapsed = time.perf_counter() - start
+        return report
+
+    def spill(self, source_table: str, spill_dir: str, batch_size: int = 1000,
+              query: Optional[Dict[str, Any]] = None, spill_format: str = 'auto',
+              collection_schema: Optional[Dict[str, Any]] = None,
+              progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Extract and transform a collection into chunk files instead of a table.
+
+        The load stage of the report is the time spent writing the files.
+        """
+        from .spill import spill_collection
+
+        if batch_size <= 0:
+            raise ValueError("batch_size must be a positive number")
+        start = time.perf_counter()
+        report = spill_collection(self, source_table, spill_dir, batch_size, query, spill_format,
+                                  collection_schema, progress_callback)
+        self.elapsed = time.perf_counter() - start
+        return report
+
+    def load_spill(self, spill_dir: str, target_table: str, checkpoint: bool = True, resume: bool = False,
+                   progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Load the chunk files written by spill into a table without reading the source again.
+
+        The extract stage of the report is the time spent reading the files.
+        """
+        from .spill import load_spill
+
+        start = time.perf_counter()
+        report = load_spill(self, spill_dir, target_table, checkpoint, resume, progress_callback)
+        self.elapsed = time.perf_counter() - start
+        return report
+
+    def replay(self, dead_letter: str, refetch: bool = True, batch_size: int = 1000,
+               progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+        """Load the records of a dead-letter file again, keeping only those that still fail in it."""
+        start = time.perf_counter()
+        letters = DeadLetterFile(dead_letter)
+        records = letters.read()
+        written, failing = replay_records(self, records, refetch, batch_size, progress_callback)
+        letters.replace(failing)
+        self.elapsed = time.perf_counter() - start
+        return {'records': len(records), 'written': written, 'failing': len(failing)}
+
+    def verify(self, source_table: str, target_table: str, workers: int = 1, partitions: Optional[int] = None,
+               query: Optional[Dict[str, Any]] = None, batch_size: int = 1000, max_diffs: int = 20,
+               progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Check the table against the collection by range counts and checksums, drilling into differing ranges."""
+        from .verify import verify_table
+
+        if batch_size <= 0:
+            raise ValueError("batch_size must be a positive number")
+        start = time.perf_counter()
+        report = verify_table(self, source_table, target_table, workers, partitions, query, batch_size, max_diffs,
+                              progress_callback=progress_callback)
+        self.elapsed = time.perf_counter() - start
+        return report
+
+    def open_tail(self, source_table: str, target_table: str):
+        """Open the change stream of a sync job at its saved resume token."""
+        from .sync import tail_job
+
+        checkpoints = CheckpointStore(self.target_connector.engine).load(tail_job(source_table, target_table))
+        resume_token = checkpoints[0].last_key if checkpoints else None
+        return self.source_connector.open_change_stream(source_table, resume_token=resume_token)
+
+    def report(self) -> Dict[str, Any]:
+        """Per-stage rows/sec and bytes/sec for the last run."""
+        return {name: stage.summary() for name, stage in self.stats.items()}
 
+    def batch_report(self) -> Dict[str, Any]:
+        """How the adaptive batch size moved over the last run; empty with a fixed batch size."""
+        return self.batch_sizer.summary() if self.batch_sizer is not None else {}
 
-    def migrate(self, source_table: str, target_table: str, batch_size: int = 1000):
-        
+    def child_report(self) -> Dict[str, int]:
+        """Rows written to each child table in the last run."""
+        return dict(self.child_rows)
 
-        pass
-    
+    def commit_report(self) -> Dict[str, Any]:
+        """Commits made by the load session of the last run."""
+        return self.commit_stats.summary()
 
-    # it will also have a method to validate the data
-    # it will also have a method to report the data
-    # it will also have a method to log the data
-    # it will also have a method to migrate the data
-    # it will also have a method to validate the data
-    # it will also have a method to report the data
-    # it will also have a method to log the data
\ No newline at end of file
+    def queue_report(self) -> Dict[str, Any]:
+        """Occupancy of the queue after each threaded stage for the last run."""
+        return {name: stats.summary() for name, stats in self.queue_stats.items() if stats.items}
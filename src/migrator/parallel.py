@@ -0,0 +1,91 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from connectors import MongoDBConnector, SQLConnector, KeyRange
+from connectors.pool import get_manager
+from transformers import ColumnPlan
+from utils.metrics import get_registry
+from .checkpoint import CheckpointStore, CheckpointTracker
+
+logger = logging.getLogger(__name__)
+
+# more ranges than workers keeps every process busy when ranges are uneven
+PARTITIONS_PER_WORKER = 4
+
+
+def migrate_partition(mongodb_uri: str, sql_uri: str, load_strategy: str, source_table: str,
+                      target_table: str, plan: ColumnPlan, batch_size: int, key_range: KeyRange,
+                      query: Optional[Dict[str, Any]] = None, dry_run: bool = False,
+                      job: Optional[str] = None,
+                      settings: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], ...]:
+    """Worker entry point: run one key range on the worker process's pooled client and engine.
+
+    Returns the stage report, the queue occupancy, the commits, the batch sizes, the child table
+    rows, the pool statistics and the metrics of this range.
+    """
+    from .migrator import Migrator
+
+    source = MongoDBConnector(mongodb_uri)
+    target = SQLConnector(sql_uri, load_strategy=load_strategy)
+    try:
+        migrator = Migrator(target, source)
+        for name, value in (settings or {}).items():
+            setattr(migrator, name, value)
+        tracker = CheckpointTracker(CheckpointStore(target.engine), job, key_range) if job else None
+        report = migrator.run(source_table, target_table, plan, batch_size, query, dry_run,
+                              key_range=key_range, tracker=tracker)
+    finally:
+        source.disconnect()
+        target.disconnect()
+    return (report, migrator.queue_report(), migrator.commit_report(), migrator.batch_report(),
+            migrator.child_report(), get_manager().take_stats(), get_registry().take())
+
+
+def migrate_partitions(migrator, source_table: str, target_table: str, plan: ColumnPlan, batch_size: int,
+                       workers: int, ranges: List[KeyRange], query: Optional[Dict[str, Any]] = None,
+                       dry_run: bool = False, progress_callback: Optional[Callable[[int], None]] = None,
+                       job: Optional[str] = None) -> Dict[str, Any]:
+    """Run key ranges of a collection on a process pool."""
+    logger.info(f"Migrating {len(ranges)} ranges of {source_table} with {workers} workers")
+
+    migrator._reset_stats()
+    if migrator.batch_sizer is not None:
+        migrator.batch_sizer.reset(batch_size)
+    # spawn so no worker inherits the parent's MongoClient or engine across fork;
+    # each worker keeps one pool per database for all the ranges it runs
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(
+                migrate_partition,
+                migrator.source_connector.uri,
+                migrator.target_connector.uri,
+                migrator.target_connector.load_strategy,
+                source_table, target_table, plan, batch_size, key_range, query, dry_run, job,
+                migrator.worker_settings(),
+            ): key_range
+            for key_range in ranges
+        }
+        for future in as_completed(futures):
+            key_range = futures[future]
+            report, queues, commits, batches, children, pool_stats, metrics = future.result()
+            get_manager().merge_stats(pool_stats)
+            get_registry().merge(metrics)
+            for name, summary in report.items():
+                migrator.stats[name].merge(summary)
+            for name, summary in queues.items():
+                migrator.queue_stats[name].merge(summary)
+            migrator.commit_stats.merge(commits)
+            if migrator.batch_sizer is not None:
+                migrator.batch_sizer.merge(batches)
+            for table, rows in children.items():
+                migrator.child_rows[table] = migrator.child_rows.get(table, 0) + rows
+            logger.info(f"Range {key_range.index} done: {report['transform']['rows']} rows")
+            if progress_callback:
+                progress_callback(report['transform']['rows'])
+
+    if not dry_run:
+        migrator.load_strategy = migrator.target_connector.get_loader().name
+    return migrator.report()
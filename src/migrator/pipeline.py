@@ -0,0 +1,123 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from connectors import MongoDBConnector, SQLConnector
+from transformers import compile_plan
+from .migrator import Migrator
+
+logger = logging.getLogger(__name__)
+
+CHAIN_STEPS = ('validate', 'schema', 'migrate')
+
+
+class PipelineContext:
+    """State shared by the steps of one chain run in a single process.
+
+    Both connections are opened once and reused by every step, the schema
+    profiled by one step is handed to the next, and each step's timing and
+    result counts are collected in metrics.
+    """
+
+    def __init__(self, mongodb_uri: str, sql_uri: str, collection: str, table: str,
+                 batch_size: int = 1000, dry_run: bool = False, load_strategy: str = 'auto',
+                 schema_cache=None, source=None):
+        self.collection = collection
+        self.table = table
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        # any connector with the MongoDBConnector reads, e.g. benchmarks.memory_source.MemorySource
+        self.source = source if source is not None else MongoDBConnector(mongodb_uri, schema_cache=schema_cache)
+        self.target = SQLConnector(sql_uri, load_strategy=load_strategy)
+        start = time.perf_counter()
+        self.migrator = Migrator(self.target, self.source)
+        self.connect_seconds = time.perf_counter() - start
+        self.collection_schema: Optional[Dict[str, Any]] = None
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def schema(self) -> Dict[str, Any]:
+        """The collection schema, profiled on first use."""
+        if self.collection_schema is None:
+            self.collection_schema = self.migrator.profile_source(self.collection)
+        return self.collection_schema
+
+    def close(self):
+        self.source.disconnect()
+        self.target.disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def validate_step(context: PipelineContext, progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Check both connections and, if the table exists, that it fits the collection schema.
+
+    A pre-flight check before migrate: unlike the validate command, it does
+    not compare row counts or checksums of migrated data.
+    """
+    result = {
+        'mongodb': context.source.validate_connection(),
+        'sql': context.target.validate_connection(),
+        'table_exists': context.target.table_exists(context.table),
+    }
+    if not (result['mongodb'] and result['sql']):
+        raise ConnectionError("Connection check failed")
+    if result['table_exists']:
+        table_schema = compile_plan(context.schema(), name=context.table).table_schema()
+        result['compatible'] = context.target.is_table_compatible(context.table, table_schema)
+        if not result['compatible']:
+            raise ValueError(f"Table {context.table} is not compatible with collection schema")
+    return result
+
+
+def schema_step(context: PipelineContext, progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Profile the collection; later steps reuse the result."""
+    return {'fields': len(context.schema()), 'schema': context.schema()}
+
+
+def migrate_step(context: PipelineContext, progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Migrate the collection with the schema already in the context."""
+    report = context.migrator.migrate(
+        context.collection,
+        context.table,
+        batch_size=context.batch_size,
+        dry_run=context.dry_run,
+        progress_callback=progress_callback,
+        collection_schema=context.schema(),
+    )
+    context.collection_schema = context.migrator.collection_schema
+    # rows written, as the scheduler counts them; a dry run writes none
+    rows = report['load']['rows'] + context.migrator.resumed_rows if 'load' in report else 0
+    return {'rows': rows, 'report': report}
+
+
+STEPS = {
+    'validate': validate_step,
+    'schema': schema_step,
+    'migrate': migrate_step,
+}
+
+
+def run_step(context: PipelineContext, name: str,
+             progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Run one named step on the shared context and record its duration."""
+    if name not in STEPS:
+        raise ValueError(f"Unknown command: {name}. Available: {', '.join(CHAIN_STEPS)}")
+    start = time.perf_counter()
+    result = STEPS[name](context, progress_callback)
+    seconds = time.perf_counter() - start
+    context.metrics[name] = {'seconds': round(seconds, 3),
+                             **{k: v for k, v in result.items() if k not in ('schema', 'report')}}
+    logger.info(f"Step {name} finished in {seconds:.2f}s")
+    return result
+
+
+def run_chain(context: PipelineContext, steps: List[str],
+              progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """Run steps in order on one context and return the per-step metrics."""
+    for name in steps:
+        run_step(context, name, progress_callback)
+    return context.metrics
@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, TypeVar
+
+T = TypeVar('T')
+
+# batches buffered between two stages; 0 runs the stages one after another
+DEFAULT_QUEUE_DEPTH = 2
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class QueueStats:
+    """Occupancy of the bounded queue between two pipeline stages.
+
+    A queue that is usually full means the consuming stage is the
+    bottleneck; one that is usually empty means the producing stage is.
+    """
+
+    def __init__(self, name: str, depth: int = 0):
+        self.name = name
+        self.depth = depth
+        self.items = 0
+        self.occupancy = 0
+        self.full_puts = 0
+        self.empty_gets = 0
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+
+    def put(self, wait: float, was_full: bool):
+        self.put_wait += wait
+        self.full_puts += was_full
+
+    def get(self, wait: float, occupancy: int):
+        self.items += 1
+        self.get_wait += wait
+        self.occupancy += occupancy
+        self.empty_gets += occupancy == 0
+
+    def merge(self, summary: Dict[str, Any]):
+        """Fold in the summary of the same queue from another worker."""
+        self.depth = summary['depth']
+        self.items += summary['items']
+        self.occupancy += summary['occupancy']
+        self.full_puts += summary['full_puts']
+        self.empty_gets += summary['empty_gets']
+        self.put_wait += summary['put_wait_seconds']
+        self.get_wait += summary['get_wait_seconds']
+
+    @property
+    def mean_occupancy(self) -> float:
+        return self.occupancy / self.items if self.items else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'queue': self.name,
+            'depth': self.depth,
+            'items': self.items,
+            'occupancy': self.occupancy,
+            'mean_occupancy': round(self.mean_occupancy, 2),
+            'full_puts': self.full_puts,
+            'empty_gets': self.empty_gets,
+            'full_pct': round(100.0 * self.full_puts / self.items, 1) if self.items else 0.0,
+            'empty_pct': round(100.0 * self.empty_gets / self.items, 1) if self.items else 0.0,
+            'put_wait_seconds': round(self.put_wait, 3),
+            'get_wait_seconds': round(self.get_wait, 3),
+        }
+
+
+def prefetch(items: Iterator[T], depth: int, stats: QueueStats) -> Iterator[T]:
+    """Run an iterator on a background thread and hand its items over through a bounded queue.
+
+    The producer blocks once depth items are waiting, so a slow consumer
+    holds back the stages before it instead of letting batches pile up in
+    memory. Exceptions from the producer are re-raised in the consumer.
+    """
+    stats.depth = depth
+    handoff: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        start = time.perf_counter()
+        was_full = handoff.full()
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            stats.put(time.perf_counter() - start, was_full)
+            return True
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(items, 'close', None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, name=f"etl-{stats.name}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            occupancy = handoff.qsize()
+            start = time.perf_counter()
+            item = handoff.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            stats.get(time.perf_counter() - start, occupancy)
+            yield item
+    finally:
+        stop.set()
+        thread.join()
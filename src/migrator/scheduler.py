@@ -0,0 +1,243 @@
+import fnmatch
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import json_util
+from sqlalchemy.engine import make_url
+
+from connectors import MongoDBConnector, SQLConnector
+from .checkpoint import CheckpointStore
+from .migrator import Migrator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_JOBS = 4
+# Migrator attributes a manifest may set, for all jobs under defaults or for one job
+JOB_SETTINGS = ('staging', 'normalize', 'commit_rows', 'commit_seconds', 'dead_letter', 'queue_depth',
+                'scan_mode', 'schema_sample_size', 'push_projection')
+JOB_FIELDS = ('collection', 'table', 'filter', 'batch_size') + JOB_SETTINGS
+
+
+class Job:
+    """One collection to migrate into one table, and how its run went."""
+
+    def __init__(self, collection: str, table: Optional[str] = None, query: Optional[Dict[str, Any]] = None,
+                 batch_size: int = 1000, settings: Optional[Dict[str, Any]] = None):
+        if batch_size <= 0:
+            raise ValueError(f"batch_size of {collection} must be a positive number")
+        self.collection = collection
+        self.table = table or collection
+        self.query = query
+        self.batch_size = batch_size
+        self.settings = dict(settings or {})
+        # from collection metadata, for ordering and progress
+        self.estimated_documents = 0
+        self.estimated_bytes: Optional[int] = None
+        # pending, running, done or failed
+        self.status = 'pending'
+        self.rows = 0
+        # rows the database refused, written to the dead-letter file instead
+        self.rejected = 0
+        self.elapsed = 0.0
+        self.error: Optional[str] = None
+        self.report: Dict[str, Any] = {}
+
+    @property
+    def weight(self) -> int:
+        """Size used to order jobs: bytes where collStats gave them, documents otherwise."""
+        return self.estimated_bytes if self.estimated_bytes is not None else self.estimated_documents
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'collection': self.collection,
+            'table': self.table,
+            'status': self.status,
+            'estimated_documents': self.estimated_documents,
+            'estimated_bytes': self.estimated_bytes,
+            'rows': self.rows,
+            'rejected': self.rejected,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows / self.elapsed, 1) if self.elapsed else 0.0,
+            'error': self.error,
+        }
+
+    def __repr__(self) -> str:
+        return f"Job({self.collection!r} -> {self.table!r}, {self.status})"
+
+
+def _job_from_spec(spec: Dict[str, Any], defaults: Dict[str, Any]) -> Job:
+    values = {**defaults, **spec}
+    unknown = sorted(set(values) - set(JOB_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown manifest fields: {', '.join(unknown)}. Allowed: {', '.join(JOB_FIELDS)}")
+    if not values.get('collection'):
+        raise ValueError(f"Manifest job without a collection: {spec}")
+    query = values.get('filter')
+    if query is not None:
+        # decode extended JSON such as {"$oid": ...} or {"$date": ...} the same way --filter does
+        query = json_util.loads(json.dumps(query))
+    return Job(values['collection'], values.get('table'), query, values.get('batch_size', 1000),
+               {name: values[name] for name in JOB_SETTINGS if name in values})
+
+
+def load_manifest(path: str) -> List[Job]:
+    """Jobs of a JSON or YAML manifest.
+
+    The manifest is a list of jobs, or a mapping with a jobs list and
+    defaults applied to every job. A job names its collection and may set
+    table, filter, batch_size and the settings in JOB_SETTINGS.
+    """
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML manifests need PyYAML installed; use a JSON manifest instead")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('jobs'), list):
+        raise ValueError(f"Manifest {path} needs a list of jobs")
+    defaults = manifest.get('defaults') or {}
+    return [_job_from_spec({'collection': spec} if isinstance(spec, str) else spec, defaults)
+            for spec in manifest['jobs']]
+
+
+def match_collections(source: MongoDBConnector, pattern: str, table_prefix: str = '',
+                      batch_size: int = 1000) -> List[Job]:
+    """A job for every collection whose name matches a glob pattern, into a table of the same name."""
+    names = [name for name in source.list_collections() if fnmatch.fnmatchcase(name, pattern)]
+    if not names:
+        raise ValueError(f"No collection matches {pattern}")
+    return [Job(name, f"{table_prefix}{name}", batch_size=batch_size) for name in names]
+
+
+class Scheduler:
+    """Runs migration jobs on a thread pool, largest first, under global caps on readers and writers.
+
+    Every job gets its own Migrator, but all of them share the process's
+    pooled MongoClient and engine. At most max_readers batches are fetched
+    from MongoDB and max_writers batches written to SQL at any moment,
+    whichever jobs they belong to, so max_jobs can stay high enough to keep
+    both sides busy without overloading either. Starting with the largest
+    collection keeps one big job from running alone at the end.
+    """
+
+    def __init__(self, mongodb_uri: str, sql_uri: str, max_jobs: int = DEFAULT_MAX_JOBS,
+                 max_readers: Optional[int] = None, max_writers: Optional[int] = None,
+                 load_strategy: str = 'auto', checkpoint: bool = True, resume: bool = False,
+                 configure: Optional[Callable[[Migrator], None]] = None):
+        if max_jobs <= 0:
+            raise ValueError("max_jobs must be a positive number")
+        self.mongodb_uri = mongodb_uri
+        self.sql_uri = sql_uri
+        self.max_jobs = max_jobs
+        self.max_readers = max_readers or max_jobs
+        self.max_writers = max_writers or max_jobs
+        if make_url(sql_uri).get_backend_name() == 'sqlite' and self.max_writers > 1:
+            # SQLite takes one writer at a time; more would only wait on its lock
+            logger.info("SQLite allows one writer, running with max_writers=1")
+            self.max_writers = 1
+        self.read_slots = threading.Semaphore(self.max_readers)
+        self.write_slots = threading.Semaphore(self.max_writers)
+        self.load_strategy = load_strategy
+        self.checkpoint = checkpoint
+        self.resume = resume
+        # applies command line settings to every job's Migrator before the manifest's own
+        self.configure = configure
+        self.elapsed = 0.0
+
+    def estimate(self, jobs: List[Job]) -> List[Job]:
+        """Fill in size estimates from collection metadata and return the jobs largest first."""
+        source = MongoDBConnector(self.mongodb_uri)
+        if not source.connect():
+            raise ConnectionError("Could not connect to MongoDB")
+        try:
+            for job in jobs:
+                stats = source.get_statistics(job.collection)
+                job.estimated_bytes = stats['size_bytes']
+                job.estimated_documents = (source.estimate_document_count(job.collection, job.query)
+                                           if job.query else stats['count'])
+        finally:
+            source.disconnect()
+        return sorted(jobs, key=lambda job: job.weight, reverse=True)
+
+    def create_checkpoint_table(self):
+        """Create the checkpoint table once, before jobs starting together race to create it."""
+        target = SQLConnector(self.sql_uri)
+        if not target.connect():
+            raise ConnectionError("Could not connect to the SQL database")
+        try:
+            CheckpointStore(target.engine)
+        finally:
+            target.disconnect()
+
+    def run_job(self, job: Job, progress_callback: Optional[Callable[[int], None]] = None) -> Job:
+        """Migrate one job's collection; a failure is recorded on the job instead of raised."""
+        job.status = 'running'
+        start = time.perf_counter()
+        try:
+            migrator = Migrator(SQLConnector(self.sql_uri, load_strategy=self.load_strategy),
+                                MongoDBConnector(self.mongodb_uri))
+            if self.configure:
+                self.configure(migrator)
+            for name, value in job.settings.items():
+                setattr(migrator, name, value)
+            migrator.read_slots = self.read_slots
+            migrator.write_slots = self.write_slots
+            job.report = migrator.migrate(job.collection, job.table, batch_size=job.batch_size,
+                                          progress_callback=progress_callback, query=job.query,
+                                          checkpoint=self.checkpoint, resume=self.resume)
+            job.rows = job.report['load']['rows'] + migrator.resumed_rows
+            job.rejected = migrator.commit_report()['rejected']
+            job.status = 'done'
+        except Exception as e:
+            logger.exception(f"Migrating {job.collection} to {job.table} failed")
+            job.error = str(e)
+            job.status = 'failed'
+        job.elapsed = time.perf_counter() - start
+        return job
+
+    def run(self, jobs: List[Job], progress_callback: Optional[Callable[[int], None]] = None,
+            job_callback: Optional[Callable[[Job], None]] = None) -> Dict[str, Any]:
+        """Run the jobs in the given order and return the summary; job_callback sees each finished job."""
+        tables = [job.table for job in jobs]
+        duplicates = sorted({table for table in tables if tables.count(table) > 1})
+        if duplicates:
+            raise ValueError(f"More than one job writes to {', '.join(duplicates)}")
+        logger.info(f"Running {len(jobs)} jobs, {self.max_jobs} at a time, with at most "
+                    f"{self.max_readers} readers and {self.max_writers} writers")
+        start = time.perf_counter()
+        if self.checkpoint:
+            self.create_checkpoint_table()
+        with ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix='etl-job') as pool:
+            futures = [pool.submit(self.run_job, job, progress_callback) for job in jobs]
+            for future in as_completed(futures):
+                job = future.result()
+                logger.info(f"{job.collection} {job.status}: {job.rows} rows in {job.elapsed:.2f}s")
+                if job_callback:
+                    job_callback(job)
+        self.elapsed = time.perf_counter() - start
+        return self.summary(jobs)
+
+    def summary(self, jobs: List[Job]) -> Dict[str, Any]:
+        rows = sum(job.rows for job in jobs)
+        return {
+            'jobs': [job.summary() for job in jobs],
+            'done': sum(job.status == 'done' for job in jobs),
+            'failed': sum(job.status == 'failed' for job in jobs),
+            'rows': rows,
+            'rejected': sum(job.rejected for job in jobs),
+            'seconds': round(self.elapsed, 3),
+            'rows_per_sec': round(rows / self.elapsed, 1) if self.elapsed else 0.0,
+            'max_jobs': self.max_jobs,
+            'max_readers': self.max_readers,
+            'max_writers': self.max_writers,
+        }
@@ -0,0 +1,414 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import json_util
+
+from connectors import KeyRange
+from connectors.connector import Connector
+from transformers import ColumnPlan, compile_plan
+from .checkpoint import CheckpointStore, CheckpointTracker, schema_hash
+from .prefetch import prefetch
+
+logger = logging.getLogger(__name__)
+
+SPILL_FORMATS = ('auto', 'arrow', 'etlc')
+MANIFEST = 'manifest.json'
+# chunk index of the last loaded chunk is the checkpoint key of a spill load
+CHUNK_KEY = '$chunk'
+
+_MAGIC = b'ETLC1\n'
+_HEADER = struct.Struct('<Q')
+_ALIGN = 8
+
+
+def arrow_available() -> bool:
+    return find_spec('pyarrow') is not None
+
+
+def resolve_format(spill_format: str) -> str:
+    """Chunk file format to write: Arrow IPC when pyarrow is installed, the built-in layout otherwise."""
+    if spill_format not in SPILL_FORMATS:
+        raise ValueError(f"Unknown spill format: {spill_format}. Available: {', '.join(SPILL_FORMATS)}")
+    if spill_format == 'auto':
+        return 'arrow' if arrow_available() else 'etlc'
+    if spill_format == 'arrow' and not arrow_available():
+        raise ValueError("The arrow spill format needs pyarrow installed")
+    return spill_format
+
+
+def _encoding(values: List[Any]) -> str:
+    """Narrowest fixed layout that holds every non-null value exactly; 'any' stores extended JSON."""
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return 'null'
+    if kinds == {bool}:
+        return 'bool'
+    if kinds == {int}:
+        return 'int64' if all(-2 ** 63 <= v < 2 ** 63 for v in values if v is not None) else 'any'
+    if kinds == {float}:
+        return 'float64'
+    if kinds == {datetime}:
+        # naive datetimes are UTC as pymongo returns them; aware ones keep their offset in JSON
+        return 'datetime' if all(v.tzinfo is None for v in values if v is not None) else 'any'
+    if kinds == {str}:
+        return 'str'
+    if kinds == {bytes}:
+        return 'bytes'
+    return 'any'
+
+
+def _fixed(values: List[Any], encoding: str) -> bytes:
+    if encoding == 'bool':
+        return np.array([bool(v) for v in values], dtype='u1').tobytes()
+    if encoding == 'int64':
+        return np.array([0 if v is None else v for v in values], dtype='<i8').tobytes()
+    if encoding == 'float64':
+        return np.array([0.0 if v is None else v for v in values], dtype='<f8').tobytes()
+    # datetime
+    return np.array([v if v is not None else np.datetime64('NaT') for v in values],
+                    dtype='datetime64[us]').astype('<i8').tobytes()
+
+
+def _variable(values: List[Any], encoding: str) -> Tuple[bytes, bytes]:
+    if encoding == 'str':
+        parts = [b'' if v is None else v.encode('utf-8') for v in values]
+    elif encoding == 'bytes':
+        parts = [b'' if v is None else v for v in values]
+    else:
+        parts = [b'' if v is None else json_util.dumps(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(parts) + 1, dtype='<i8')
+    np.cumsum([len(p) for p in parts], out=offsets[1:])
+    return offsets.tobytes(), b''.join(parts)
+
+
+def write_etlc(path: str, columns: Sequence[str], rows: List[Tuple[Any, ...]]):
+    """Write rows as one column block per column, each buffer 8-byte aligned for mmap reads."""
+    count = len(rows)
+    buffers: List[bytes] = []
+    position = 0
+    meta = []
+
+    def add(data: bytes) -> List[int]:
+        nonlocal position
+        start = position
+        buffers.append(data)
+        position += len(data)
+        padding = -position % _ALIGN
+        if padding:
+            buffers.append(b'\0' * padding)
+            position += padding
+        return [start, len(data)]
+
+    for name, values in zip(columns, zip(*rows) if rows else [()] * len(columns)):
+        values = list(values)
+        encoding = _encoding(values)
+        column: Dict[str, Any] = {'name': name, 'encoding': encoding}
+        if encoding != 'null' and any(v is None for v in values):
+            column['validity'] = add(np.array([v is not None for v in values], dtype='u1').tobytes())
+        if encoding in ('bool', 'int64', 'float64', 'datetime'):
+            column['data'] = add(_fixed(values, encoding))
+        elif encoding != 'null':
+            offsets, data = _variable(values, encoding)
+            column['offsets'] = add(offsets)
+            column['data'] = add(data)
+        meta.append(column)
+
+    header = json.dumps({'rows': count, 'columns': meta}).encode('utf-8')
+    header += b' ' * (-(len(_MAGIC) + _HEADER.size + len(header)) % _ALIGN)
+    with open(path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(_HEADER.pack(len(header)))
+        f.write(header)
+        for data in buffers:
+            f.write(data)
+
+
+def read_etlc(path: str) -> Tuple[List[str], List[List[Any]]]:
+    """Column names and column values of a chunk file, read through mmap.
+
+    Fixed-width columns are viewed in place with numpy and only become
+    Python objects in the final tolist().
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if mapped[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{path} is not a chunk file")
+        header_length, = _HEADER.unpack_from(mapped, len(_MAGIC))
+        base = len(_MAGIC) + _HEADER.size
+        header = json.loads(mapped[base:base + header_length])
+        base += header_length
+        count = header['rows']
+        view = memoryview(mapped)
+        names, columns = [], []
+        for column in header['columns']:
+            names.append(column['name'])
+            columns.append(_read_column(view, base, count, column))
+        del view
+        return names, columns
+    finally:
+        mapped.close()
+
+
+def _read_column(view: memoryview, base: int, count: int, column: Dict[str, Any]) -> List[Any]:
+    encoding = column['encoding']
+    if encoding == 'null':
+        return [None] * count
+
+    def array(span: List[int], dtype: str) -> np.ndarray:
+        return np.frombuffer(view, dtype=dtype, count=span[1] // np.dtype(dtype).itemsize, offset=base + span[0])
+
+    if encoding in ('bool', 'int64', 'float64', 'datetime'):
+        dtype = {'bool': 'u1', 'int64': '<i8', 'float64': '<f8', 'datetime': '<i8'}[encoding]
+        data = array(column['data'], dtype)
+        if encoding == 'bool':
+            data = data.astype(bool)
+        elif encoding == 'datetime':
+            data = data.astype('datetime64[us]')
+        values = data.tolist()
+    else:
+        offsets = array(column['offsets'], '<i8').tolist()
+        start = base + column['data'][0]
+        if encoding == 'str':
+            values = [str(view[start + a:start + b], 'utf-8') for a, b in zip(offsets, offsets[1:])]
+        elif encoding == 'bytes':
+            values = [bytes(view[start + a:start + b]) for a, b in zip(offsets, offsets[1:])]
+        else:
+            values = [json_util.loads(str(view[start + a:start + b], 'utf-8')) if b > a else None
+                      for a, b in zip(offsets, offsets[1:])]
+
+    if 'validity' in column:
+        valid = array(column['validity'], 'u1').tolist()
+        values = [v if ok else None for v, ok in zip(values, valid)]
+    return values
+
+
+# field metadata marking an Arrow column stored as extended JSON text
+_ARROW_ENCODING = b'etl.encoding'
+_ARROW_JSON = b'json'
+
+
+def write_arrow(path: str, columns: Sequence[str], rows: List[Tuple[Any, ...]]):
+    import pyarrow as pa
+
+    arrays = []
+    fields = []
+    for name, values in zip(columns, zip(*rows) if rows else [()] * len(columns)):
+        values = list(values)
+        try:
+            array = pa.array(values)
+            metadata = None
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # mixed types: keep them as extended JSON text like the built-in layout does
+            array = pa.array([None if v is None else json_util.dumps(v) for v in values], pa.string())
+            metadata = {_ARROW_ENCODING: _ARROW_JSON}
+        arrays.append(array)
+        fields.append(pa.field(name, array.type, metadata=metadata))
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_arrow(path: str) -> Tuple[List[str], List[List[Any]]]:
+    import pyarrow as pa
+
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        values = column.to_pylist()
+        if (field.metadata or {}).get(_ARROW_ENCODING) == _ARROW_JSON:
+            values = [None if v is None else json_util.loads(v) for v in values]
+        columns.append(values)
+    return table.column_names, columns
+
+
+WRITERS = {'etlc': write_etlc, 'arrow': write_arrow}
+READERS = {'etlc': read_etlc, 'arrow': read_arrow}
+
+
+class SpillDirectory(Connector):
+    """Chunk files of one extracted collection plus a manifest describing them.
+
+    The manifest keeps the profiled schema, the column order and, per
+    chunk, its row count and the last value of the extraction key. It is
+    replaced atomically after every chunk, so an interrupted extract still
+    leaves a readable prefix. As a connector it stands in for the database
+    a Migrator does not touch: the target of an extract, the source of a load.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.path = path
+
+    def connect(self) -> bool:
+        os.makedirs(self.path, exist_ok=True)
+        return True
+
+    def validate_connection(self) -> bool:
+        return os.path.isdir(self.path)
+
+    def get_document_count(self, collection_name: Optional[str] = None) -> int:
+        """Rows in the chunk files written so far."""
+        if not self.exists():
+            return 0
+        return sum(chunk['rows'] for chunk in self.read_manifest()['chunks'])
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self) -> Dict[str, Any]:
+        if not self.exists():
+            raise FileNotFoundError(f"No spill manifest in {self.path}")
+        with open(self.manifest_path) as f:
+            return json_util.loads(f.read())
+
+    def write_manifest(self, manifest: Dict[str, Any]):
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(json_util.dumps(manifest, indent=2))
+        os.replace(tmp_path, self.manifest_path)
+
+    def clear(self):
+        """Remove the manifest and chunk files of an earlier extract."""
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            if name == MANIFEST or name.startswith('chunk-'):
+                os.remove(os.path.join(self.path, name))
+
+    def chunk_path(self, index: int, spill_format: str) -> str:
+        return os.path.join(self.path, f"chunk-{index:06d}.{spill_format}")
+
+    def read_chunk(self, chunk: Dict[str, Any], spill_format: str) -> Tuple[List[str], List[List[Any]]]:
+        return READERS[spill_format](os.path.join(self.path, chunk['file']))
+
+
+def spill_collection(migrator, source_table: str, spill_dir: str, batch_size: int,
+                     query: Optional[Dict[str, Any]] = None, spill_format: str = 'auto',
+                     collection_schema: Optional[Dict[str, Any]] = None,
+                     progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Extract and transform a collection into chunk files, one per batch."""
+    spill_format = resolve_format(spill_format)
+    directory = SpillDirectory(spill_dir)
+    directory.clear()
+    if collection_schema is None:
+        collection_schema = migrator.profile_source(source_table)
+    migrator.collection_schema = collection_schema
+    plan = compile_plan(collection_schema)
+
+    manifest = {
+        'collection': source_table,
+        'format': spill_format,
+        'schema': collection_schema,
+        'columns': list(plan.columns),
+        'query': query,
+        'created': time.time(),
+        'complete': False,
+        'chunks': [],
+    }
+    migrator._reset_stats()
+    scan = migrator.plan_scan('_id', resumable=False)
+    migrator.scan_warnings = migrator.source_connector.explain_scan(source_table, query, scan.sort, scan.hint)
+    stats = migrator.stats['load']
+    write = WRITERS[spill_format]
+    for rows, nbytes, last_key, _ in migrator.pipeline(source_table, plan, batch_size, query, key='_id', scan=scan):
+        start = time.perf_counter()
+        index = len(manifest['chunks'])
+        path = directory.chunk_path(index, spill_format)
+        write(path, plan.columns, rows)
+        manifest['chunks'].append({'file': os.path.basename(path), 'rows': len(rows), 'last_key': last_key})
+        directory.write_manifest(manifest)
+        stats.add(len(rows), os.path.getsize(path), time.perf_counter() - start)
+        if migrator.batch_sizer is not None:
+            migrator.batch_sizer.observe(len(rows), nbytes)
+        if progress_callback:
+            progress_callback(len(rows))
+    manifest['complete'] = True
+    directory.write_manifest(manifest)
+    return migrator.report()
+
+
+def spill_job(spill_dir: str, target_table: str) -> str:
+    return f"spill:{os.path.abspath(spill_dir)}:{target_table}"
+
+
+def extract_hash(manifest: Dict[str, Any], plan: ColumnPlan) -> str:
+    """Fingerprint of the column layout and of the extract itself, which a new extract into the directory changes."""
+    layout = schema_hash(plan.columns, plan.table_schema())
+    return hashlib.sha256(f"{layout}:{manifest['created']!r}".encode()).hexdigest()
+
+
+def read_chunks(directory: SpillDirectory, manifest: Dict[str, Any], plan: ColumnPlan, first: int,
+                stats) -> Iterator[Tuple[List[Tuple[Any, ...]], int, Any, Dict[str, Any]]]:
+    """Row chunks from the files starting at chunk index first, in the plan's column order."""
+    for index in range(first, len(manifest['chunks'])):
+        chunk = manifest['chunks'][index]
+        start = time.perf_counter()
+        names, columns = directory.read_chunk(chunk, manifest['format'])
+        by_name = dict(zip(names, columns))
+        rows = list(zip(*(by_name[col] for col in plan.columns))) if chunk['rows'] else []
+        nbytes = os.path.getsize(os.path.join(directory.path, chunk['file']))
+        stats.add(len(rows), nbytes, time.perf_counter() - start)
+        yield rows, nbytes, index, {}
+
+
+def load_spill(migrator, spill_dir: str, target_table: str, checkpoint: bool = True, resume: bool = False,
+               progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Load the chunk files of an extract into a table, optionally resuming after the last loaded chunk."""
+    migrator.resumed_rows = 0
+    directory = SpillDirectory(spill_dir)
+    manifest = directory.read_manifest()
+    if not manifest['complete']:
+        logger.warning(f"Extract in {spill_dir} did not finish; loading the {len(manifest['chunks'])} chunks written")
+    plan = migrator.prepare_target(manifest['collection'], target_table, collection_schema=manifest['schema'])
+    missing = [col for col in plan.columns if col not in manifest['columns']]
+    if missing:
+        raise ValueError(f"Table {target_table} has columns the extract does not: {', '.join(missing)}")
+
+    migrator._reset_stats()
+    store = CheckpointStore(migrator.target_connector.engine) if checkpoint else None
+    tracker = None
+    first = 0
+    if store:
+        job = spill_job(spill_dir, target_table)
+        current_hash = extract_hash(manifest, plan)
+        checkpoints = store.load(job) if resume else []
+        if checkpoints and checkpoints[0].schema_hash != current_hash:
+            # chunk indexes of another extract or column layout would skip the wrong rows
+            raise ValueError(f"The checkpoint of {job} belongs to an earlier extract or schema; "
+                             "rerun without --resume")
+        if resume and not checkpoints:
+            logger.warning(f"No checkpoint found for {job}, loading from the first chunk")
+        if checkpoints and checkpoints[0].last_key is not None:
+            first = checkpoints[0].last_key + 1
+            migrator.resumed_rows = sum(chunk['rows'] for chunk in manifest['chunks'][:first])
+            logger.info(f"Resuming {job} at chunk {first}")
+        else:
+            store.start(job, [KeyRange(CHUNK_KEY)], current_hash)
+        tracker = CheckpointTracker(store, job, KeyRange(CHUNK_KEY))
+
+    chunks = read_chunks(directory, manifest, plan, first, migrator.stats['extract'])
+    if migrator.queue_depth > 0:
+        # decode the next files while the current one is written
+        chunks = prefetch(chunks, migrator.queue_depth, migrator.queue_stats['extract'])
+    migrator.load(chunks, target_table, list(plan.columns), progress_callback, tracker,
+                  source_table=manifest['collection'])
+    if tracker:
+        tracker.finish()
+    return migrator.report()
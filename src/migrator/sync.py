@@ -0,0 +1,119 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from connectors import KeyRange
+from transformers import ColumnPlan, to_sql_value
+from .checkpoint import CheckpointStore, CheckpointTracker, schema_hash
+
+logger = logging.getLogger(__name__)
+
+# change stream events that end the stream for this collection
+_TERMINAL_EVENTS = ('drop', 'rename', 'dropDatabase', 'invalidate')
+
+
+def sync_job(source_table: str, target_table: str) -> str:
+    return f"sync:{source_table}:{target_table}"
+
+
+def tail_job(source_table: str, target_table: str) -> str:
+    return f"tail:{source_table}:{target_table}"
+
+
+def _start_or_load(store: CheckpointStore, job: str, key: str, plan: ColumnPlan) -> Any:
+    """Last saved mark of a single-range job, creating the job on first use."""
+    checkpoints = store.load(job)
+    if checkpoints:
+        return checkpoints[0].last_key
+    store.start(job, [KeyRange(key)], schema_hash(plan.columns, plan.table_schema()))
+    return None
+
+
+def sync_changes(migrator, source_table: str, target_table: str, plan: ColumnPlan, batch_size: int,
+                 watermark_field: str, key_columns: List[str], query: Optional[Dict[str, Any]] = None,
+                 progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Upsert the documents whose watermark moved since the last run.
+
+    The first run has no watermark and copies everything. Later runs read
+    ``watermark_field >= last`` in ascending order; ties on a timestamp are
+    re-applied, which the upsert makes harmless. Deletes are not visible to
+    a watermark scan, use the change stream tail for those.
+    """
+    store = CheckpointStore(migrator.target_connector.engine)
+    job = sync_job(source_table, target_table)
+    watermark = _start_or_load(store, job, watermark_field, plan)
+
+    changed = None
+    if watermark is not None:
+        op = '$gt' if watermark_field == '_id' else '$gte'
+        changed = {watermark_field: {op: watermark}}
+        logger.info(f"Syncing {source_table} changes with {watermark_field} {op} {watermark!r}")
+    if query and changed:
+        query = {'$and': [query, changed]}
+    else:
+        query = query or changed
+
+    migrator._reset_stats()
+    migrator.scan_warnings = migrator.source_connector.explain_scan(
+        source_table, query, [(watermark_field, 1)], migrator.cursor_options.hint
+    )
+    tracker = CheckpointTracker(store, job, KeyRange(watermark_field))
+    chunks = migrator.pipeline(source_table, plan, batch_size, query, sort=[(watermark_field, 1)], key=watermark_field)
+    migrator.load(chunks, target_table, list(plan.columns), progress_callback, tracker, upsert_keys=key_columns,
+                  source_table=source_table)
+    return migrator.report()
+
+
+def tail_changes(migrator, stream, source_table: str, target_table: str, plan: ColumnPlan, batch_size: int,
+                 key_columns: List[str], max_wait_seconds: float = 1.0,
+                 progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Apply change stream events in batches until interrupted.
+
+    Events of a batch are collapsed to the last one per document, so the
+    deletes and upserts of a batch touch disjoint keys and their order does
+    not matter. The resume token commits with the batch's upserts.
+    """
+    store = CheckpointStore(migrator.target_connector.engine)
+    job = tail_job(source_table, target_table)
+    _start_or_load(store, job, '$resumeToken', plan)
+    tracker = CheckpointTracker(store, job, KeyRange('$resumeToken'))
+    load_stats = migrator.stats['load']
+
+    try:
+        for events, resume_token in migrator.source_connector.iter_change_batches(stream, batch_size, max_wait_seconds):
+            latest: Dict[Any, Optional[Dict[str, Any]]] = {}
+            ended = False
+            for event in events:
+                operation = event['operationType']
+                if operation in _TERMINAL_EVENTS:
+                    logger.warning(f"Change stream on {source_table} ended with a {operation} event")
+                    ended = True
+                    break
+                document_key = event.get('documentKey', {})
+                key = tuple(to_sql_value(document_key.get(c)) for c in key_columns)
+                if None in key:
+                    logger.warning(f"Skipping {operation} event without {', '.join(key_columns)} in its documentKey")
+                    continue
+                if operation == 'delete':
+                    latest[key] = None
+                elif event.get('fullDocument') is not None:
+                    # updateLookup returns no document when it was deleted since; its delete event follows
+                    latest[key] = event['fullDocument']
+
+            deletes = [key for key, doc in latest.items() if doc is None]
+            upserts = [doc for doc in latest.values() if doc is not None]
+            if deletes:
+                migrator.deleted_rows += migrator.target_connector.delete_rows(target_table, key_columns, deletes)
+            chunks = migrator.transform(iter([upserts]), plan) if upserts else iter([([], 0, None, {})])
+            migrator.load(
+                ((rows, nbytes, resume_token, children) for rows, nbytes, _, children in chunks),
+                target_table, list(plan.columns), progress_callback, tracker, upsert_keys=key_columns,
+                source_table=source_table,
+            )
+            logger.info(f"Applied {len(upserts)} upserts and {len(deletes)} deletes "
+                        f"({load_stats.rows} rows upserted so far)")
+            if ended:
+                break
+    except KeyboardInterrupt:
+        logger.info(f"Stopped tailing {source_table}")
+
+    return migrator.report()
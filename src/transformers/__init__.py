@@ -1,3 +1,13 @@
 """
 Data transformation package
-""" 
\ No newline at end of file
+"""
+
+from .conversions import OBJECT_ID_BINARY, REGISTRY, Conversion, TypeRegistry, to_sql_value
+from .flatten import ColumnPlan, ChildPlan, compile_plan, infer_schema
+from .profiler import HyperLogLog, SchemaProfile, profile_documents
+
+__all__ = [
+    'ColumnPlan', 'ChildPlan', 'compile_plan', 'infer_schema', 'to_sql_value',
+    'Conversion', 'TypeRegistry', 'REGISTRY', 'OBJECT_ID_BINARY',
+    'HyperLogLog', 'SchemaProfile', 'profile_documents',
+]
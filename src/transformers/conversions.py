@@ -0,0 +1,286 @@
+import json
+import uuid
+from collections.abc import Mapping
+from datetime import timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from bson import Binary, Decimal128, Int64, ObjectId, Timestamp
+from sqlalchemy.types import (
+    BINARY, BigInteger, Boolean, DateTime, Float, Integer, LargeBinary, Numeric, String, Text, TypeEngine, Uuid,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# How values of each BSON type reach SQL and come back. A Conversion gives
+# the column type for a profiled field, the converter applied to its values
+# on the way in (None when the driver binds them as they are) and the
+# decoder turning stored values back into BSON values. Conversions are
+# registered per type name, optionally for one dialect; a plan resolves one
+# per column when it is compiled, so values are never dispatched one by one
+# unless a column holds several types.
+
+Converter = Optional[Callable[[Any], Any]]
+SqlType = Callable[[Dict[str, Any]], TypeEngine]
+
+# VARCHAR sizing for string columns profiled over every document; longer values go to TEXT
+MIN_VARCHAR_LENGTH = 16
+MAX_VARCHAR_LENGTH = 4000
+# InnoDB index keys hold at most 3072 bytes: 768 characters of utf8mb4
+MYSQL_INDEXED_VARCHAR_LENGTH = 768
+
+# subdocument and array type names, stored as JSON text
+JSON_TYPE_NAMES = {'dict', 'list', 'SON', 'RawBSONDocument'}
+
+
+def _json_default(value: Any) -> Any:
+    # RawBSONDocument and other read-only mappings decode on access
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def _std_json_dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, separators=(',', ':'), ensure_ascii=False)
+
+
+if orjson is not None:
+    # datetimes go through _json_default as with json, so both encoders write the same text
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def json_dumps(value: Any) -> str:
+        """Compact JSON text of a subdocument or array, with orjson."""
+        try:
+            return orjson.dumps(value, default=_json_default, option=_ORJSON_OPTIONS).decode()
+        except TypeError:
+            # integers beyond 64 bits or keys that are not strings
+            return _std_json_dumps(value)
+
+    json_loads = orjson.loads
+else:
+    json_dumps = _std_json_dumps
+    json_loads = json.loads
+
+
+def _string_type(info: Dict[str, Any]) -> TypeEngine:
+    # a sample can miss the longest values, which a VARCHAR sized from it would then refuse
+    max_length = info.get('max_length', 0)
+    if not info.get('complete') or not max_length or max_length > MAX_VARCHAR_LENGTH:
+        return Text()
+    # headroom for values longer than the profiled ones
+    length = max(MIN_VARCHAR_LENGTH, 1 << (max_length * 2 - 1).bit_length())
+    return String(length) if length <= MAX_VARCHAR_LENGTH else Text()
+
+
+def _mysql_string_type(info: Dict[str, Any]) -> TypeEngine:
+    sql_type = _string_type(info)
+    # MySQL cannot index TEXT without a prefix length
+    if isinstance(sql_type, Text) and info.get('indexed'):
+        return String(MYSQL_INDEXED_VARCHAR_LENGTH)
+    return sql_type
+
+
+def _int_type(info: Dict[str, Any]) -> TypeEngine:
+    if not info.get('complete'):
+        return BigInteger()
+    low, high = info.get('min', 0), info.get('max', 0)
+    return Integer() if -2 ** 31 <= low and high < 2 ** 31 else BigInteger()
+
+
+def _fixed(sql_type: TypeEngine) -> SqlType:
+    return lambda info: sql_type
+
+
+def _to_json(value: Any) -> Any:
+    return None if value is None else json_dumps(value)
+
+
+def _from_json(value: Any) -> Any:
+    return None if value is None else json_loads(value)
+
+
+def _to_str(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+def _naive_utc(value: Any) -> Any:
+    # PyMongo reads naive UTC unless the client is tz_aware; TIMESTAMP columns hold naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _decimal_to_str(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+def _decimal_to_decimal(value: Any) -> Any:
+    return None if value is None else value.to_decimal()
+
+
+def _to_decimal128(value: Any) -> Any:
+    return None if value is None else Decimal128(value if isinstance(value, Decimal) else str(value))
+
+
+def _to_int(value: Any) -> Any:
+    return None if value is None else int(value)
+
+
+def _to_int64(value: Any) -> Any:
+    return None if value is None else Int64(value)
+
+
+def _to_bytes(value: Any) -> Any:
+    return None if value is None else bytes(value)
+
+
+def _timestamp_to_int(value: Any) -> Any:
+    # seconds in the high 32 bits and the increment in the low ones, so the integers sort like the timestamps
+    return None if value is None else (value.time << 32) | value.inc
+
+
+def _int_to_timestamp(value: Any) -> Any:
+    return None if value is None else Timestamp(value >> 32, value & 0xFFFFFFFF)
+
+
+def _object_id_to_binary(value: Any) -> Any:
+    return None if value is None else value.binary
+
+
+def _to_object_id(value: Any) -> Any:
+    return None if value is None else ObjectId(value)
+
+
+def _to_uuid(value: Any) -> Any:
+    return None if value is None or isinstance(value, uuid.UUID) else uuid.UUID(value)
+
+
+class Conversion:
+    """Column type, inbound converter and decoder of one BSON type."""
+
+    def __init__(self, sql_type: SqlType, to_sql: Converter = None, from_sql: Converter = None):
+        self.sql_type = sql_type
+        self.to_sql = to_sql
+        self.from_sql = from_sql
+
+
+class TypeRegistry:
+    """Conversions by BSON type name, with per-dialect overrides of the generic ones.
+
+    The generic conversions (dialect '') only produce values every driver
+    binds; a dialect's own conversions can rely on its types, such as
+    Decimal for NUMERIC or a native UUID column.
+    """
+
+    def __init__(self):
+        self.conversions: Dict[Tuple[str, str], Conversion] = {}
+        # dialect: per-value converters by class for columns of several types, filled as classes are seen
+        self._dispatch: Dict[str, Dict[type, Callable[[Any], Any]]] = {}
+
+    def register(self, type_name: str, conversion: Conversion, dialect: str = ''):
+        """Use conversion for type_name, on one dialect or, without one, wherever no dialect overrides it."""
+        self.conversions[(dialect, type_name)] = conversion
+        # compiled plans hold the dispatch tables, so they are emptied rather than replaced
+        for dispatch in self._dispatch.values():
+            dispatch.clear()
+
+    def lookup(self, type_name: str, dialect: str = '') -> Optional[Conversion]:
+        return self.conversions.get((dialect, type_name)) or self.conversions.get(('', type_name))
+
+    def sql_type(self, info: Dict[str, Any], dialect: str = '') -> Optional[TypeEngine]:
+        """SQL type of a profiled column, or None for a type name the registry does not know."""
+        conversion = self.lookup(info['type'], dialect)
+        return conversion.sql_type(info) if conversion else None
+
+    def converter(self, info: Dict[str, Any], dialect: str = '') -> Converter:
+        """Pick the value converter for a column once, from its profiled types.
+
+        None means values go to the driver untouched. A column that saw
+        several types converts each value by its class.
+        """
+        type_name = info.get('type')
+        if type_name in JSON_TYPE_NAMES:
+            return _to_json
+        seen = set(info.get('types', [type_name])) - {'NoneType'}
+        conversion = self.lookup(type_name, dialect)
+        if len(seen) <= 1 and conversion is not None:
+            return conversion.to_sql
+        return self.value_converter(dialect)
+
+    def decoder(self, info: Dict[str, Any], dialect: str = '') -> Converter:
+        """Converter from a column's stored values back to BSON values; None when they need none."""
+        conversion = self.lookup(info.get('type'), dialect)
+        return conversion.from_sql if conversion else None
+
+    def value_converter(self, dialect: str = '') -> Callable[[Any], Any]:
+        """Per-value converter for mixed columns: one dict lookup on the value's class, then its converter."""
+        dispatch = self._dispatch.setdefault(dialect, {})
+
+        def convert(value: Any) -> Any:
+            cls = value.__class__
+            try:
+                to_sql = dispatch[cls]
+            except KeyError:
+                to_sql = dispatch[cls] = self._class_converter(cls, dialect)
+            return to_sql(value)
+        return convert
+
+    def to_sql_value(self, value: Any, dialect: str = '') -> Any:
+        """Convert one value of any type into something the driver can bind."""
+        return self.value_converter(dialect)(value)
+
+    def _class_converter(self, cls: type, dialect: str) -> Callable[[Any], Any]:
+        if issubclass(cls, (Mapping, list)):
+            return _to_json
+        for base in cls.__mro__:
+            conversion = self.lookup(base.__name__, dialect)
+            if conversion is not None:
+                return conversion.to_sql or _identity
+        return str
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+REGISTRY = TypeRegistry()
+
+_JSON = Conversion(_fixed(Text()), _to_json, _from_json)
+for _name in JSON_TYPE_NAMES:
+    REGISTRY.register(_name, _JSON)
+REGISTRY.register('str', Conversion(_string_type))
+REGISTRY.register('int', Conversion(_int_type))
+REGISTRY.register('float', Conversion(_fixed(Float())))
+REGISTRY.register('bool', Conversion(_fixed(Boolean())))
+REGISTRY.register('bytes', Conversion(_fixed(LargeBinary())))
+REGISTRY.register('datetime', Conversion(_fixed(DateTime()), _naive_utc))
+REGISTRY.register('NoneType', Conversion(_fixed(Text())))
+REGISTRY.register('ObjectId', Conversion(_fixed(String(24)), _to_str, _to_object_id))
+REGISTRY.register('UUID', Conversion(_fixed(String(36)), _to_str, _to_uuid))
+REGISTRY.register('Int64', Conversion(_fixed(BigInteger()), _to_int, _to_int64))
+REGISTRY.register('Binary', Conversion(_fixed(LargeBinary()), _to_bytes, Binary))
+REGISTRY.register('Timestamp', Conversion(_fixed(BigInteger()), _timestamp_to_int, _int_to_timestamp))
+# SQLite cannot bind Decimal, so the generic conversion writes the decimal's text
+REGISTRY.register('Decimal128', Conversion(_fixed(Numeric()), _decimal_to_str, _to_decimal128))
+for _name in ('Regex', 'Code', 'DBRef', 'MinKey', 'MaxKey'):
+    REGISTRY.register(_name, Conversion(_fixed(Text()), _to_str))
+
+REGISTRY.register('str', Conversion(_mysql_string_type), 'mysql')
+REGISTRY.register('Decimal128', Conversion(_fixed(Numeric()), _decimal_to_decimal, _to_decimal128), 'postgresql')
+# MySQL's plain DECIMAL has no fractional digits
+REGISTRY.register('Decimal128', Conversion(_fixed(Numeric(65, 30)), _decimal_to_decimal, _to_decimal128), 'mysql')
+for _dialect in ('postgresql', 'mssql'):
+    REGISTRY.register('UUID', Conversion(_fixed(Uuid(as_uuid=False)), _to_str, _to_uuid), _dialect)
+
+# ObjectIds as their 12 bytes instead of 24 hex digits, for tables that are only read by key:
+#   REGISTRY.register('ObjectId', OBJECT_ID_BINARY)
+OBJECT_ID_BINARY = Conversion(_fixed(BINARY(12).with_variant(LargeBinary(), 'postgresql')),
+                              _object_id_to_binary, _to_object_id)
+
+
+def to_sql_value(value: Any) -> Any:
+    """Convert a BSON value into something every SQL driver can bind."""
+    return REGISTRY.to_sql_value(value)
@@ -0,0 +1,432 @@
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .conversions import REGISTRY, Converter
+
+# Schema paths use "." between nested keys and a "[]" suffix for array elements,
+# e.g. "address.city", "items[]" and "items[].sku".
+PATH_SEP = '.'
+ARRAY_MARK = '[]'
+COLUMN_SEP = '_'
+
+# columns of a child table ahead of the element's own: its key, the parent's key and the array position
+CHILD_KEY = '_id'
+PARENT_KEY = '_parent_id'
+POSITION = '_idx'
+KEY_SEP = ':'
+
+DEFAULT_MAX_DEPTH = 3
+
+# plain Python scalars; such a column named like a reference gets an index
+_SCALAR_TYPE_NAMES = {'str', 'int', 'float', 'bool', 'bytes', 'datetime'}
+# value types whose columns get a secondary index on the target
+INDEXED_TYPES = {'ObjectId', 'UUID', 'datetime'}
+
+
+def infer_schema(documents: Iterable[Dict[str, Any]], max_depth: int = DEFAULT_MAX_DEPTH) -> Dict[str, Dict[str, Any]]:
+    """Infer a nested path schema from sample documents.
+
+    Every path gets its most common non-null type name and the list of all
+    type names seen, which decides whether values can skip conversion.
+    """
+    type_counts: Dict[str, Counter] = defaultdict(Counter)
+
+    def walk(document: Dict[str, Any], prefix: str, depth: int):
+        for key, value in document.items():
+            path = f"{prefix}{PATH_SEP}{key}" if prefix else key
+            type_counts[path][type(value).__name__] += 1
+            if depth >= max_depth:
+                continue
+            if isinstance(value, dict):
+                walk(value, path, depth + 1)
+            elif isinstance(value, list):
+                element_path = path + ARRAY_MARK
+                for item in value:
+                    type_counts[element_path][type(item).__name__] += 1
+                    if isinstance(item, dict):
+                        walk(item, element_path, depth + 1)
+
+    for document in documents:
+        walk(document, '', 1)
+
+    schema = {}
+    for path, counts in type_counts.items():
+        non_null = [(name, n) for name, n in counts.most_common() if name != 'NoneType']
+        schema[path] = {
+            'type': non_null[0][0] if non_null else 'NoneType',
+            'types': sorted(counts),
+            'nullable': 'NoneType' in counts,
+        }
+    return schema
+
+
+def column_name(path: str) -> str:
+    """SQL column name for a schema path."""
+    return path.replace(ARRAY_MARK, '').replace(PATH_SEP, COLUMN_SEP)
+
+
+def converter_for(info: Dict[str, Any], dialect: str = '') -> Converter:
+    """Pick the value converter for a column once, from its inferred types and the target dialect.
+
+    None means values go to the driver untouched.
+    """
+    return REGISTRY.converter(info, dialect)
+
+
+def make_getter(path: str) -> Callable[[Dict[str, Any]], Any]:
+    """Compile a dotted path into a fast value getter."""
+    keys = path.split(PATH_SEP)
+    if len(keys) == 1:
+        key = keys[0]
+
+        def get1(document):
+            try:
+                return document.get(key)
+            except AttributeError:
+                return None
+        return get1
+    if len(keys) == 2:
+        outer, inner = keys
+
+        def get2(document):
+            value = document.get(outer)
+            try:
+                return value.get(inner)
+            except AttributeError:
+                return None
+        return get2
+
+    def get_n(document):
+        value = document
+        for key in keys:
+            try:
+                value = value.get(key)
+            except AttributeError:
+                return None
+        return value
+    return get_n
+
+
+def _has_children(schema: Dict[str, Any], path: str) -> bool:
+    prefix = path + PATH_SEP
+    return any(p.startswith(prefix) for p in schema)
+
+
+def _leaf_paths(schema: Dict[str, Any], prefix: str = '') -> List[str]:
+    """Paths that become columns below prefix: scalars, plus subdocuments and arrays kept whole."""
+    paths = []
+    for path, info in schema.items():
+        if prefix:
+            if not path.startswith(prefix + PATH_SEP):
+                continue
+            relative = path[len(prefix) + 1:]
+        else:
+            relative = path
+        if ARRAY_MARK in relative:
+            continue
+        if info['type'] == 'dict' and _has_children(schema, path):
+            continue
+        paths.append(path)
+    return paths
+
+
+def _key_length(info: Dict[str, Any]) -> int:
+    """Longest text form of a key column's values."""
+    if info.get('type') == 'str':
+        return info.get('max_length', 64)
+    return {'ObjectId': 24, 'UUID': 36}.get(info.get('type'), 20)
+
+
+def _column_schema(col: str, info: Dict[str, Any], nullable: bool = True) -> Dict[str, Any]:
+    column = {'type': info['type'], 'nullable': nullable}
+    # profiler statistics let the SQL side pick widths, when they cover every document
+    for stat in ('max_length', 'min', 'max', 'complete'):
+        if stat in info:
+            column[stat] = info[stat]
+    return column
+
+
+def _mark_indexed(table_schema: Dict[str, Dict[str, Any]], indexes: List[Dict[str, Any]]):
+    # some databases need a bounded type for an indexed column
+    for index in indexes:
+        for col in index['columns']:
+            table_schema[col]['indexed'] = True
+
+
+def _secondary_indexes(columns: Sequence[str], infos: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Indexes for reference and datetime columns, skipping columns with a single distinct value."""
+    indexes = []
+    for col, info in zip(columns, infos):
+        reference = col.endswith(('_id', 'Id')) and info['type'] in _SCALAR_TYPE_NAMES
+        if not (info['type'] in INDEXED_TYPES or reference):
+            continue
+        if info.get('cardinality', 2) <= 1:
+            continue
+        indexes.append({'columns': [col]})
+    return indexes
+
+
+class ChildPlan:
+    """Rows of one array field as a child table: (key, parent key, position, element columns...).
+
+    A row's key is its parent's key and its position joined by KEY_SEP, so
+    the keys of a whole batch are made without asking the database and
+    loading the same documents again gives the same keys. Arrays inside
+    the elements become child tables of this one.
+    """
+
+    def __init__(self, table_name: str, path: str, parent_table: str, parent_key: Dict[str, Any],
+                 schema: Dict[str, Dict[str, Any]], element_path: str, dialect: str = ''):
+        self.table_name = table_name
+        self.path = path
+        self.parent_table = parent_table
+        self.array_getter = make_getter(path.rsplit(ARRAY_MARK + PATH_SEP, 1)[-1])
+        element_paths = [p for p in _leaf_paths(schema, element_path) if schema[p]['type'] != 'list']
+        # an array of scalars has one value column; one of subdocuments a column per element field
+        self.scalar = not element_paths
+        if self.scalar:
+            element_paths = [element_path]
+            names = ['value']
+            self.getters: Tuple[Callable, ...] = (lambda item: item,)
+        else:
+            relative = [p[len(element_path) + 1:] for p in element_paths]
+            names = [column_name(r) for r in relative]
+            self.getters = tuple(make_getter(r) for r in relative)
+        self.infos = tuple(schema.get(p, {'type': 'NoneType'}) for p in element_paths)
+        self.converters = tuple(converter_for(info, dialect) for info in self.infos)
+        self.element_columns = tuple(names)
+        self.columns = (CHILD_KEY, PARENT_KEY, POSITION) + self.element_columns
+        self.parent_key = parent_key
+        # the key is bounded when the parent's is: a fixed width type or a string profiled in full
+        self.key = {'type': 'str', 'max_length': _key_length(parent_key) + 11, 'nullable': False,
+                    'complete': parent_key.get('type') != 'str' or bool(parent_key.get('complete'))}
+        self.children = _compile_children(schema, element_path, table_name, self.key, dialect)
+
+    def table_schema(self) -> Dict[str, Dict[str, Any]]:
+        """Column definitions for creating the child table, with the foreign key to its parent."""
+        table_schema = {
+            CHILD_KEY: dict(self.key),
+            PARENT_KEY: {**self.parent_key, 'nullable': False,
+                         'references': {'table': self.parent_table, 'column': CHILD_KEY}},
+            POSITION: {'type': 'int', 'nullable': False, 'complete': True},
+        }
+        for col, info in zip(self.element_columns, self.infos):
+            table_schema[col] = _column_schema(col, info)
+        _mark_indexed(table_schema, self.index_plan())
+        return table_schema
+
+    def index_plan(self) -> List[Dict[str, Any]]:
+        """The key as primary key, an indexed foreign key to the parent, and the usual secondary indexes."""
+        return ([{'columns': [CHILD_KEY], 'primary_key': True},
+                 {'columns': [PARENT_KEY], 'references': {'table': self.parent_table, 'column': CHILD_KEY}}]
+                + _secondary_indexes(self.element_columns, self.infos))
+
+    def tables(self) -> List['ChildPlan']:
+        """This table and its descendants, parents before children."""
+        return [self] + [table for child in self.children for table in child.tables()]
+
+    def collect(self, documents: Sequence[Any], parent_keys: Sequence[Any],
+                out: Dict[str, List[Tuple[Any, ...]]]):
+        """Add the rows of this table and its descendants for a batch to out, in one pass over the elements."""
+        rows = out.setdefault(self.table_name, [])
+        append = rows.append
+        pairs = tuple(zip(self.getters, self.converters))
+        empty = (None,) * len(pairs)
+        elements: List[Any] = []
+        keys: List[str] = []
+        for parent_key, document in zip(parent_keys, documents):
+            items = self.array_getter(document) if isinstance(document, Mapping) else None
+            if not isinstance(items, list):
+                continue
+            for idx, item in enumerate(items):
+                key = f"{parent_key}{KEY_SEP}{idx}"
+                if self.scalar or isinstance(item, Mapping):
+                    values = []
+                    for get, convert in pairs:
+                        value = get(item)
+                        values.append(convert(value) if convert else value)
+                    append((key, parent_key, idx, *values))
+                else:
+                    append((key, parent_key, idx, *empty))
+                if self.children:
+                    elements.append(item)
+                    keys.append(key)
+        for child in self.children:
+            child.collect(elements, keys, out)
+
+    def rows(self, documents: Sequence[Dict[str, Any]], parent_keys: Sequence[Any]) -> List[Tuple[Any, ...]]:
+        """Rows of this table for a batch."""
+        out: Dict[str, List[Tuple[Any, ...]]] = {}
+        self.collect(documents, parent_keys, out)
+        return out[self.table_name]
+
+
+def _compile_children(schema: Dict[str, Dict[str, Any]], prefix: str, parent_table: str,
+                      parent_key: Dict[str, Any], dialect: str = '') -> Tuple[ChildPlan, ...]:
+    """Child tables for the arrays below prefix that are not inside another array below it."""
+    children = []
+    for path, info in schema.items():
+        if info['type'] != 'list':
+            continue
+        if prefix:
+            if not path.startswith(prefix + PATH_SEP):
+                continue
+            relative = path[len(prefix) + 1:]
+        else:
+            relative = path
+        if ARRAY_MARK in relative:
+            continue
+        table_name = f"{parent_table}{COLUMN_SEP}{column_name(relative)}" if parent_table else column_name(relative)
+        children.append(ChildPlan(table_name, path, parent_table, parent_key, schema, path + ARRAY_MARK, dialect))
+    return tuple(children)
+
+
+class ColumnPlan:
+    """Compiled mapping from documents to row tuples for one collection.
+
+    Built once per schema: a tuple of key paths with their getters and
+    converters. A batch is converted column by column with map(), resolving
+    each subdocument prefix once, so there is no per-document dict
+    rebuilding or type dispatch. Converters come from the conversion
+    registry for the target's dialect, '' for values any database binds.
+    """
+
+    def __init__(self, schema: Dict[str, Dict[str, Any]], name: str = '', arrays: str = 'json',
+                 columns: Optional[Sequence[str]] = None, dialect: str = ''):
+        if arrays not in ('json', 'child'):
+            raise ValueError(f"Unknown array handling: {arrays}")
+        self.schema = schema
+        self.name = name
+        self.arrays = arrays
+        self.dialect = dialect
+
+        paths = _leaf_paths(schema)
+        if arrays == 'child':
+            paths = [p for p in paths if schema[p]['type'] != 'list']
+        paths.sort(key=lambda p: p != '_id')
+
+        names = {}
+        for path in paths:
+            col = column_name(path)
+            while col in names:
+                col += COLUMN_SEP
+            names[col] = path
+        if columns is not None:
+            names = {col: names[col] for col in columns if col in names}
+
+        self.columns: Tuple[str, ...] = tuple(names)
+        self.paths: Tuple[str, ...] = tuple(names.values())
+        self.converters = tuple(converter_for(schema[p], dialect) for p in self.paths)
+        self._steps = self._compile_steps()
+        self.children: Tuple[ChildPlan, ...] = self._compile_children() if arrays == 'child' else ()
+
+    def _compile_steps(self) -> Tuple[Tuple[str, str, Callable], ...]:
+        """One (path, parent path, getter) step per distinct path prefix, parents first.
+
+        Columns sharing a subdocument reuse the parent's values instead of
+        walking the document from the root again.
+        """
+        steps = {}
+        for path in self.paths:
+            keys = path.split(PATH_SEP)
+            for depth in range(1, len(keys) + 1):
+                prefix = PATH_SEP.join(keys[:depth])
+                if prefix not in steps:
+                    steps[prefix] = (prefix, PATH_SEP.join(keys[:depth - 1]), make_getter(keys[depth - 1]))
+        return tuple(steps.values())
+
+    def _compile_children(self) -> Tuple[ChildPlan, ...]:
+        # _parent_id has the type of the _id it references
+        parent_key = _column_schema('_id', self.schema.get('_id', {'type': 'ObjectId'}))
+        return _compile_children(self.schema, '', self.name, parent_key, self.dialect)
+
+    def __reduce__(self):
+        # closures don't pickle; rebuild from the schema in worker processes
+        return (ColumnPlan, (self.schema, self.name, self.arrays, self.columns, self.dialect))
+
+    def projection(self, extra: Sequence[str] = ()) -> Dict[str, int]:
+        """find() projection of the fields this plan reads, plus extra fields such as a sort key.
+
+        Paths below another projected path are dropped, since MongoDB rejects
+        overlapping projections and the parent already brings them along.
+        """
+        paths = set(self.paths) | set(extra) | {'_id'}
+        paths.update(child.path for child in self.children)
+        fields = {}
+        for path in sorted(paths, key=lambda p: p.count(PATH_SEP)):
+            keys = path.split(PATH_SEP)
+            if any(PATH_SEP.join(keys[:depth]) in fields for depth in range(1, len(keys))):
+                continue
+            fields[path] = 1
+        return fields
+
+    def select(self, columns: Sequence[str]) -> 'ColumnPlan':
+        """Plan restricted to the given columns, in plan order."""
+        wanted = set(columns)
+        return ColumnPlan(self.schema, self.name, self.arrays, [c for c in self.columns if c in wanted], self.dialect)
+
+    def table_schema(self) -> Dict[str, Dict[str, Any]]:
+        """Column definitions for creating the target table."""
+        table_schema = {col: _column_schema(col, self.schema[path], nullable=col != '_id')
+                        for col, path in zip(self.columns, self.paths)}
+        _mark_indexed(table_schema, self.index_plan())
+        return table_schema
+
+    def index_plan(self) -> List[Dict[str, Any]]:
+        """Indexes to build on the target table, chosen from the inferred types.
+
+        _id becomes the primary key. Columns holding references (ObjectId or
+        UUID values, scalar columns named ..._id) and datetime columns get a
+        secondary index, unless the profiler saw a single distinct value.
+        """
+        infos = [self.schema[path] for path in self.paths]
+        indexes = _secondary_indexes([c for c in self.columns if c != '_id'],
+                                     [info for col, info in zip(self.columns, infos) if col != '_id'])
+        if '_id' in self.columns:
+            indexes.insert(0, {'columns': ['_id'], 'primary_key': True})
+        return indexes
+
+    def child_tables(self) -> List[ChildPlan]:
+        """Every child table of the plan, parents before children, the order they are created and loaded in."""
+        return [table for child in self.children for table in child.tables()]
+
+    def columnar(self, documents: Sequence[Dict[str, Any]]) -> List[List[Any]]:
+        """Convert a batch into one list per column."""
+        values = {'': documents}
+        for path, parent, get in self._steps:
+            values[path] = list(map(get, values[parent]))
+        return [
+            list(map(convert, values[path])) if convert else values[path]
+            for path, convert in zip(self.paths, self.converters)
+        ]
+
+    def rows(self, documents: Sequence[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+        """Convert a batch into row tuples in column order."""
+        return list(zip(*self.columnar(documents))) if documents else []
+
+    def child_rows(self, documents: Sequence[Dict[str, Any]],
+                   parent_keys: Optional[Sequence[Any]] = None) -> Dict[str, List[Tuple[Any, ...]]]:
+        """Rows of every child table for a batch, keyed by child table name, parents before children."""
+        if not self.children:
+            return {}
+        if parent_keys is None:
+            get_id = make_getter('_id')
+            convert = converter_for(self.schema.get('_id', {'type': 'ObjectId'}), self.dialect)
+            parent_keys = [convert(get_id(d)) if convert else get_id(d) for d in documents]
+        out: Dict[str, List[Tuple[Any, ...]]] = {table.table_name: [] for table in self.child_tables()}
+        for child in self.children:
+            child.collect(documents, parent_keys, out)
+        return out
+
+    def to_frame(self, documents: Sequence[Dict[str, Any]]):
+        """Convert a batch into a pandas DataFrame."""
+        import pandas as pd
+
+        return pd.DataFrame(dict(zip(self.columns, self.columnar(documents))), columns=list(self.columns))
+
+
+def compile_plan(schema: Dict[str, Dict[str, Any]], name: str = '', arrays: str = 'json',
+                 dialect: str = '') -> ColumnPlan:
+    """Compile a path schema into a column plan converting values for the given SQL dialect."""
+    return ColumnPlan(schema, name, arrays, dialect=dialect)
@@ -0,0 +1,206 @@
+import math
+import struct
+from collections import Counter
+from datetime import datetime
+from hashlib import blake2b
+from typing import Any, Dict, Iterable, Optional
+
+from .flatten import ARRAY_MARK, DEFAULT_MAX_DEPTH, PATH_SEP
+
+# 2**10 one-byte registers per field: ~3% cardinality error in 1 KiB
+DEFAULT_HLL_PRECISION = 10
+
+
+def _stable_hash(value: Any) -> int:
+    """64-bit hash that is the same in every process, so sketches can be merged."""
+    if isinstance(value, bytes):
+        data = value
+    elif isinstance(value, str):
+        data = value.encode('utf-8', 'surrogatepass')
+    elif isinstance(value, bool):
+        data = b'\x01' if value else b'\x00'
+    elif isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+        data = struct.pack('<q', value)
+    elif isinstance(value, float):
+        data = struct.pack('<d', value)
+    else:
+        data = repr(value).encode('utf-8', 'surrogatepass')
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """Fixed-memory distinct count estimator."""
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value: Any):
+        hashed = _stable_hash(value)
+        index = hashed & (self.size - 1)
+        rest = hashed >> self.precision
+        bits = 64 - self.precision
+        rank = bits - rest.bit_length() + 1 if rest else bits + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class FieldProfile:
+    """Sketches for one schema path; memory does not grow with the data."""
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        self.count = 0
+        self.nulls = 0
+        self.types: Counter = Counter()
+        self.distinct = HyperLogLog(precision)
+        self.max_length = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: Any):
+        self.count += 1
+        type_name = type(value).__name__
+        self.types[type_name] += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, (str, bytes)):
+            if len(value) > self.max_length:
+                self.max_length = len(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+        if isinstance(value, (dict, list)):
+            # containers are profiled through their child paths
+            return
+        self.distinct.add(value)
+
+    def merge(self, other: 'FieldProfile'):
+        self.count += other.count
+        self.nulls += other.nulls
+        self.types.update(other.types)
+        self.distinct.merge(other.distinct)
+        self.max_length = max(self.max_length, other.max_length)
+        for bound, pick in (('min', min), ('max', max)):
+            values = [v for v in (getattr(self, bound), getattr(other, bound)) if v is not None]
+            setattr(self, bound, pick(values) if values else None)
+
+
+class SchemaProfile:
+    """Streaming profile of a collection: one FieldProfile per nested path."""
+
+    def __init__(self, max_depth: int = DEFAULT_MAX_DEPTH, precision: int = DEFAULT_HLL_PRECISION):
+        self.max_depth = max_depth
+        self.precision = precision
+        self.documents = 0
+        self.fields: Dict[str, FieldProfile] = {}
+
+    def _field(self, path: str) -> FieldProfile:
+        field = self.fields.get(path)
+        if field is None:
+            field = self.fields[path] = FieldProfile(self.precision)
+        return field
+
+    def _walk(self, document: Dict[str, Any], prefix: str, depth: int):
+        for key, value in document.items():
+            path = f"{prefix}{PATH_SEP}{key}" if prefix else key
+            self._field(path).add(value)
+            if depth >= self.max_depth:
+                continue
+            if isinstance(value, dict):
+                self._walk(value, path, depth + 1)
+            elif isinstance(value, list):
+                element_path = path + ARRAY_MARK
+                element_field = self._field(element_path)
+                for item in value:
+                    element_field.add(item)
+                    if isinstance(item, dict):
+                        self._walk(item, element_path, depth + 1)
+
+    def add(self, document: Dict[str, Any]):
+        self.documents += 1
+        self._walk(document, '', 1)
+
+    def add_many(self, documents: Iterable[Dict[str, Any]]) -> 'SchemaProfile':
+        for document in documents:
+            self.add(document)
+        return self
+
+    def merge(self, other: 'SchemaProfile') -> 'SchemaProfile':
+        self.documents += other.documents
+        for path, field in other.fields.items():
+            self._field(path).merge(field)
+        return self
+
+    def to_schema(self, complete: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Path schema for the flattener and table creation, with the sketch results.
+
+        complete marks a profile of every document: only then do max_length
+        and min/max bound the data, so column types may be narrowed to them.
+        """
+        schema = {}
+        paths = sorted(self.fields, key=lambda p: p != '_id')
+        for path in paths:
+            field = self.fields[path]
+            non_null = [(name, n) for name, n in field.types.most_common() if name != 'NoneType']
+            # array elements are counted per element, so "missing" only applies to document paths
+            missing = 0 if ARRAY_MARK in path else max(0, self.documents - field.count)
+            info = {
+                'type': non_null[0][0] if non_null else 'NoneType',
+                'types': sorted(field.types),
+                'type_counts': dict(field.types),
+                'count': field.count,
+                'nulls': field.nulls,
+                'missing': missing,
+                'nullable': bool(field.nulls or missing),
+                'required': not (field.nulls or missing),
+                'cardinality': field.distinct.count(),
+            }
+            if field.max_length:
+                info['max_length'] = field.max_length
+            if field.min is not None:
+                info['min'] = field.min
+                info['max'] = field.max
+            if complete:
+                info['complete'] = True
+            schema[path] = info
+        return schema
+
+
+def profile_documents(documents: Iterable[Dict[str, Any]], max_depth: int = DEFAULT_MAX_DEPTH,
+                      precision: int = DEFAULT_HLL_PRECISION) -> SchemaProfile:
+    """Profile an iterable of documents in one streaming pass."""
+    return SchemaProfile(max_depth, precision).add_many(documents)
+
+
+def json_safe(schema: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Copy of a schema whose values can be written with json.dump."""
+    def clean(value):
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            return value
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        return str(value)
+    return clean(schema)
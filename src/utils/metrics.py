@@ -0,0 +1,224 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+# seconds; covers a sub-millisecond insert up to a slow getMore or commit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# rows or documents per batch
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+# name: (kind, help, buckets); every metric the pipeline records is declared here
+METRICS: Dict[str, Tuple[str, str, Optional[Sequence[float]]]] = {
+    'etl_extract_fetch_seconds': ('histogram', "Time blocked on the MongoDB cursor per batch, round trip and BSON decode", LATENCY_BUCKETS),
+    'etl_mongo_command_seconds': ('histogram', "Server round trip of find, getMore and aggregate commands", LATENCY_BUCKETS),
+    'etl_extract_batch_documents': ('histogram', "Documents per extracted batch", SIZE_BUCKETS),
+    'etl_extract_documents_total': ('counter', "Documents read from MongoDB", None),
+    'etl_transform_seconds': ('histogram', "Time converting one batch of documents to rows", LATENCY_BUCKETS),
+    'etl_load_insert_seconds': ('histogram', "Time writing one batch, before its commit", LATENCY_BUCKETS),
+    'etl_load_commit_seconds': ('histogram', "Time of one SQL commit", LATENCY_BUCKETS),
+    'etl_load_batch_rows': ('histogram', "Rows per loaded batch", SIZE_BUCKETS),
+    'etl_load_rows_total': ('counter', "Rows written to SQL", None),
+    'etl_load_rejected_rows_total': ('counter', "Rows refused by the database and dead-lettered", None),
+    'etl_load_retries_total': ('counter', "Extra statements spent bisecting failed batches", None),
+    'etl_load_rollbacks_total': ('counter', "Batches rolled back", None),
+    'etl_process_rss_bytes': ('gauge', "Resident memory of the process", None),
+    'etl_process_peak_rss_bytes': ('gauge', "Peak resident memory of the process", None),
+}
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where the current value is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Histogram:
+    """Cumulative bucket counts with sum, count and max, as Prometheus histograms keep them."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def merge(self, summary: Dict[str, Any]):
+        self.counts = [a + b for a, b in zip(self.counts, summary['counts'])]
+        self.count += summary['count']
+        self.sum += summary['sum']
+        self.max = max(self.max, summary['max'])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'buckets': list(self.buckets),
+            'counts': list(self.counts),
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'max': round(self.max, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.quantile(0.5), 6),
+            'p95': round(self.quantile(0.95), 6),
+        }
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of one process, shared by the connectors and the pipeline.
+
+    Recording is a dict lookup and an addition under a lock, cheap enough
+    for once per batch. Worker processes hand their snapshot to the parent,
+    which merges it like the pool and stage statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def _declared(self, name: str, kind: str) -> Tuple[str, str, Optional[Sequence[float]]]:
+        spec = METRICS.get(name)
+        if spec is None or spec[0] != kind:
+            raise KeyError(f"{name} is not a declared {kind}")
+        return spec
+
+    def inc(self, name: str, value: float = 1):
+        self._declared(name, 'counter')
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float):
+        self._declared(name, 'gauge')
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        _, _, buckets = self._declared(name, 'histogram')
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def sample_memory(self):
+        current = rss_bytes()
+        self.set('etl_process_rss_bytes', current)
+        # ru_maxrss is only updated as pages are touched, so it can trail the current value
+        self.set('etl_process_peak_rss_bytes', max(current, peak_rss_bytes()))
+
+    def snapshot(self) -> Dict[str, Any]:
+        self.sample_memory()
+        with self._lock:
+            return {
+                'started': self.started,
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {name: h.summary() for name, h in self.histograms.items()},
+            }
+
+    def take(self) -> Dict[str, Any]:
+        """Snapshot for a parent process, resetting counters and histograms."""
+        snapshot = self.snapshot()
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, Any]):
+        """Fold in a worker's snapshot; memory gauges keep the largest process."""
+        with self._lock:
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, value in snapshot['gauges'].items():
+                self.gauges[name] = max(self.gauges.get(name, 0), value)
+            for name, summary in snapshot['histograms'].items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram(summary['buckets'])
+                histogram.merge(summary)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, (kind, help_text, _) in METRICS.items():
+            if kind == 'counter' and name in snapshot['counters']:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter",
+                          f"{name} {snapshot['counters'][name]}"]
+            elif kind == 'gauge' and name in snapshot['gauges']:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge",
+                          f"{name} {snapshot['gauges'][name]}"]
+            elif kind == 'histogram' and name in snapshot['histograms']:
+                summary = snapshot['histograms'][name]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                cumulative = 0
+                for bound, count in zip(summary['buckets'], summary['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {summary["count"]}')
+                lines += [f"{name}_sum {summary['sum']}", f"{name}_count {summary['count']}"]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Write JSON for a .json path, Prometheus text otherwise."""
+        if path.endswith('.json'):
+            data = json.dumps(self.snapshot(), indent=2)
+        else:
+            data = self.to_prometheus()
+        with open(path, 'w') as f:
+            f.write(data)
+
+
+_registry: Optional[MetricsRegistry] = None
+
+
+def get_registry() -> MetricsRegistry:
+    """The process-wide metrics registry."""
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
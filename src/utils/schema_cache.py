@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "etl", "schemas")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 256
+
+
+def strip_credentials(uri: str) -> str:
+    """Remove user:password@ from a connection URI."""
+    return re.sub(r"//[^@/]*@", "//", uri)
+
+
+class SchemaCache:
+    """Profiled collection schemas on disk, valid while the collection fingerprint is unchanged.
+
+    One JSON file per entry. Entries expire after ttl_seconds and the least
+    recently used ones are evicted beyond max_entries; reading an entry
+    refreshes its modification time.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv("ETL_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None
+                                 else os.getenv("ETL_SCHEMA_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.getenv("ETL_SCHEMA_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, uri: str, collection_name: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key of a collection and the profiling options used."""
+        raw = json.dumps([strip_credentials(uri), collection_name, options or {}], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Cached schema if present, fresh and profiled from the same fingerprint."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl_seconds:
+            logger.info(f"Schema cache entry {key[:12]} expired")
+            self._remove(path)
+            return None
+        if entry.get("fingerprint") != json.loads(json.dumps(fingerprint, default=str)):
+            logger.info(f"Schema cache entry {key[:12]} is stale, collection changed")
+            return None
+
+        os.utime(path)
+        return entry["schema"]
+
+    def put(self, key: str, fingerprint: Dict[str, Any], schema: Dict[str, Any], collection_name: str = ""):
+        """Store a schema atomically and evict old entries."""
+        entry = {
+            "collection": collection_name,
+            "created": time.time(),
+            "fingerprint": fingerprint,
+            "schema": schema,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used beyond max_entries."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if now - mtime > self.ttl_seconds:
+                self._remove(path)
+            else:
+                entries.append((mtime, path))
+
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            self._remove(path)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# the packages are run from src, as the CLI does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from connectors import get_manager  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_uri(tmp_path):
+    """A fresh SQLite file per test; its pooled engine is disposed afterwards."""
+    yield f"sqlite:///{tmp_path / 'target.db'}"
+    get_manager().close()
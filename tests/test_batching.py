@@ -0,0 +1,62 @@
+import pytest
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from migrator import BatchSizer, Migrator
+
+
+def test_small_rows_grow_the_batch_by_at_most_two_times():
+    sizer = BatchSizer(min_size=10, max_size=10000, target_bytes=100000, target_seconds=0)
+    sizer.reset(100)
+
+    sizes = []
+    for _ in range(5):
+        sizer.observe(sizer.size, sizer.size * 100)
+        sizes.append(sizer.size)
+
+    assert sizes == [200, 400, 800, 1000, 1000]
+    assert sizer.summary()['largest'] == 1000 and len(sizer.changes) == 4
+
+
+def test_slow_inserts_shrink_the_batch():
+    sizer = BatchSizer(min_size=10, max_size=10000, target_bytes=0, target_seconds=0.5)
+    sizer.reset(1000)
+
+    sizer.observe(1000, 10 ** 6, seconds=2.0)
+    sizer.observe(sizer.size, 10 ** 6, seconds=sizer.size * 0.002)
+
+    assert sizer.size == 250
+    assert sizer.summary()['smallest'] == 250
+
+
+def test_sizes_stay_within_bounds_and_whole_statements():
+    sizer = BatchSizer(min_size=100, max_size=1000, target_bytes=10 ** 9, target_seconds=0)
+    sizer.reset(5000)
+    assert sizer.size == 1000
+
+    sizer.align(300)
+    assert sizer.size == 900
+
+    sizer.observe(900, 900, seconds=None)
+    assert sizer.size == 900
+
+
+def test_invalid_bounds_are_rejected():
+    with pytest.raises(ValueError):
+        BatchSizer(min_size=100, max_size=10)
+    with pytest.raises(ValueError):
+        BatchSizer(target_bytes=0, target_seconds=0)
+
+
+def test_migrate_follows_the_sizer(sqlite_uri):
+    documents = [{'_id': f"{i:024d}", 'name': 'x' * 200} for i in range(3000)]
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'items': documents}))
+    migrator.batch_sizer = BatchSizer(min_size=10, max_size=10000, target_bytes=50000, target_seconds=0)
+    migrator.queue_depth = 0
+
+    report = migrator.migrate('items', 'items', batch_size=1000, checkpoint=False)
+
+    summary = migrator.batch_report()
+    assert report['load']['rows'] == summary['rows'] == 3000
+    assert summary['initial'] == 1000 and summary['final'] < 1000 and summary['changes']
@@ -0,0 +1,113 @@
+import pytest
+from bson import ObjectId
+from sqlalchemy import text
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from connectors.mongodb import KeyRange
+from migrator import Migrator
+from migrator.checkpoint import CheckpointStore
+
+JOB = 'items:items'
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(rows):
+    seen = [0]
+
+    def callback(count):
+        seen[0] += count
+        if seen[0] >= rows:
+            raise Interrupted()
+    return callback
+
+
+def count(connector, table):
+    with connector.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+@pytest.fixture
+def documents():
+    return [{'_id': ObjectId(i.to_bytes(12, 'big')), 'name': f"item{i}", 'qty': i} for i in range(1000)]
+
+
+def test_store_round_trips_progress(sqlite_uri):
+    target = SQLConnector(sqlite_uri)
+    target.connect()
+    store = CheckpointStore(target.engine)
+    last = ObjectId()
+
+    store.start(JOB, [KeyRange('_id', None, last, index=0), KeyRange('_id', last, None, index=1)], 'hash')
+    with target.engine.begin() as conn:
+        store.save(conn, JOB, 0, ObjectId(b'\x00' * 11 + b'\x07'), 8)
+        store.save(conn, JOB, 0, None, 2)
+    store.mark_done(JOB, 1)
+
+    first, second = store.load(JOB)
+    assert (first.last_key, first.rows_written, first.done) == (ObjectId(b'\x00' * 11 + b'\x07'), 10, False)
+    assert first.remaining().to_query() == {'_id': {'$gt': first.last_key, '$lt': last}}
+    assert (second.key_range.lower, second.done, second.schema_hash) == (last, True, 'hash')
+    store.clear(JOB)
+    assert store.load(JOB) == []
+
+
+@pytest.mark.parametrize('staging', [False, True])
+def test_resume_continues_after_the_last_committed_batch(sqlite_uri, documents, staging):
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'items': documents}))
+    migrator.staging = staging
+    migrator.queue_depth = 0
+
+    with pytest.raises(Interrupted):
+        migrator.migrate('items', 'items', batch_size=100, progress_callback=interrupt_after(300))
+    checkpoint, = CheckpointStore(target.engine).load(JOB)
+    assert checkpoint.rows_written == 300 and checkpoint.last_key == documents[299]['_id']
+
+    migrator.migrate('items', 'items', batch_size=100, resume=True)
+
+    assert migrator.resumed_rows == 300
+    assert count(target, 'items') == 1000
+    with target.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(DISTINCT _id) FROM items")).scalar() == 1000
+
+
+def test_without_resume_a_new_run_starts_over(sqlite_uri, documents):
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'items': documents}))
+    migrator.staging = True
+    migrator.queue_depth = 0
+
+    with pytest.raises(Interrupted):
+        migrator.migrate('items', 'items', batch_size=100, progress_callback=interrupt_after(300))
+    migrator.migrate('items', 'items', batch_size=100)
+
+    assert migrator.resumed_rows == 0
+    assert count(target, 'items') == 1000
+
+
+def test_resume_with_one_worker_runs_every_remaining_range(sqlite_uri, documents):
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'items': documents}))
+    migrator.staging = True
+    migrator.queue_depth = 0
+    with pytest.raises(Interrupted):
+        migrator.migrate('items', 'items', batch_size=100, progress_callback=interrupt_after(100))
+
+    # the checkpoints a two-range parallel run leaves, each range part way through
+    store = CheckpointStore(target.engine)
+    checkpoint, = store.load(JOB)
+    middle = documents[500]['_id']
+    store.start(JOB, [KeyRange('_id', None, middle, index=0), KeyRange('_id', middle, None, index=1)],
+                checkpoint.schema_hash)
+    with target.engine.begin() as conn:
+        store.save(conn, JOB, 0, documents[99]['_id'], 100)
+
+    report = migrator.migrate('items', 'items', batch_size=100, resume=True)
+
+    assert report['load']['rows'] == 900
+    assert [cp.done for cp in store.load(JOB)] == [True, True]
+    assert count(target, 'items') == 1000
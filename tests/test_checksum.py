@@ -0,0 +1,66 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128, ObjectId
+from sqlalchemy.types import BigInteger, Boolean, DateTime, Float, LargeBinary, Numeric, String
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from connectors.checksum import NULL_MARK, canonical, column_kind, row_digest
+from migrator import Migrator
+
+
+@pytest.mark.parametrize('sql_type, kind', [
+    (Boolean(), 'bool'),
+    (BigInteger(), 'int'),
+    (Float(), 'float'),
+    (Numeric(20, 10), 'decimal'),
+    (DateTime(), 'datetime'),
+    (LargeBinary(), 'bytes'),
+    (String(24), 'text'),
+])
+def test_column_kind(sql_type, kind):
+    assert column_kind(sql_type) == kind
+
+
+@pytest.mark.parametrize('value', ['1.5', Decimal('1.5000000000'), Decimal128('1.50'), 1.5])
+def test_decimal_forms_share_canonical_text(value):
+    assert canonical(value, 'decimal') == '1.5'
+
+
+@pytest.mark.parametrize('value, text', [
+    (Decimal('100'), '100'),
+    (Decimal('0.000'), '0'),
+    (Decimal('-2.50'), '-2.5'),
+])
+def test_decimal_canonical_is_plain_notation(value, text):
+    assert canonical(value, 'decimal') == text
+
+
+def test_driver_and_document_values_agree():
+    assert canonical(True, 'bool') == canonical(1, 'bool') == '1'
+    assert canonical(1.0000004, 'float') == canonical(1.0, 'float')
+    assert canonical(datetime(2024, 1, 1, 12, 0, 0, 999), 'datetime') == '2024-01-01 12:00:00'
+    assert canonical(b'\x00\xff', 'bytes') == '00ff'
+    assert canonical(None, 'text') == NULL_MARK
+
+
+def test_row_digest_depends_on_values_not_driver_types():
+    kinds = ['text', 'decimal', 'int']
+    assert row_digest(['a', '1.5', 2], kinds) == row_digest(['a', Decimal('1.50'), 2.0], kinds)
+    assert row_digest(['a', '1.5', 2], kinds) != row_digest(['a', '1.5', 3], kinds)
+
+
+def test_validate_after_migrate_with_decimals(sqlite_uri):
+    documents = [{'_id': ObjectId(), 'name': f"item{i}", 'price': Decimal128(f"{i}.{i % 100:02d}")}
+                 for i in range(250)]
+    source = MemorySource({'items': documents})
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, source)
+    migrator.migrate('items', 'items', batch_size=100)
+
+    report = migrator.verify('items', 'items')
+
+    assert report['source_rows'] == report['target_rows'] == 250
+    assert (report['mismatched'], report['missing'], report['extra'], report['different']) == (0, 0, 0, 0)
@@ -0,0 +1,113 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128, Int64, ObjectId, Timestamp
+from sqlalchemy.types import BINARY, BigInteger, Integer, Numeric, String, Text, Uuid
+
+from benchmarks.memory_source import MemorySource
+from transformers import OBJECT_ID_BINARY, REGISTRY, Conversion, TypeRegistry, compile_plan, conversions
+from transformers.conversions import MYSQL_INDEXED_VARCHAR_LENGTH
+
+
+def test_sampled_columns_keep_wide_types():
+    assert isinstance(REGISTRY.sql_type({'type': 'str', 'max_length': 10}), Text)
+    assert isinstance(REGISTRY.sql_type({'type': 'int', 'min': 0, 'max': 10}), BigInteger)
+
+
+def test_complete_profiles_narrow_types():
+    sql_type = REGISTRY.sql_type({'type': 'str', 'max_length': 10, 'complete': True})
+    assert isinstance(sql_type, String) and not isinstance(sql_type, Text)
+    assert sql_type.length == 32
+    assert isinstance(REGISTRY.sql_type({'type': 'int', 'min': 0, 'max': 10, 'complete': True}), Integer)
+    assert isinstance(REGISTRY.sql_type({'type': 'int', 'min': 0, 'max': 2 ** 40, 'complete': True}), BigInteger)
+
+
+def test_mysql_bounds_indexed_strings():
+    sql_type = REGISTRY.sql_type({'type': 'str', 'max_length': 10, 'indexed': True}, 'mysql')
+    assert isinstance(sql_type, String) and sql_type.length == MYSQL_INDEXED_VARCHAR_LENGTH
+    assert isinstance(REGISTRY.sql_type({'type': 'str', 'max_length': 10}, 'mysql'), Text)
+
+
+def test_only_full_scans_mark_columns_complete():
+    documents = [{'_id': ObjectId(), 'name': f"n{i}", 'count': i, 'tags': ['a']} for i in range(50)]
+    source = MemorySource({'items': documents})
+
+    sampled = compile_plan(source.get_collection_schema('items', sample_size=10), name='items', arrays='child')
+    full = compile_plan(source.get_collection_schema('items', full_scan=True), name='items', arrays='child')
+
+    assert not any(info.get('complete') for info in sampled.table_schema().values())
+    assert full.table_schema()['name']['complete'] and full.table_schema()['count']['complete']
+    assert sampled.table_schema()['_id']['indexed']
+    child = full.child_tables()[0].table_schema()
+    assert child['_id']['complete'] and child['_id']['indexed']
+
+
+@pytest.mark.parametrize('info, dialect, expected', [
+    ({'type': 'Decimal128'}, '', Numeric),
+    ({'type': 'Decimal128'}, 'mysql', Numeric),
+    ({'type': 'UUID'}, 'postgresql', Uuid),
+    ({'type': 'UUID'}, 'sqlite', String),
+    ({'type': 'ObjectId'}, 'sqlite', String),
+    ({'type': 'Timestamp'}, '', BigInteger),
+    ({'type': 'dict'}, 'postgresql', Text),
+])
+def test_sql_type_per_dialect(info, dialect, expected):
+    assert isinstance(REGISTRY.sql_type(info, dialect), expected)
+
+
+def test_unknown_type_names_have_no_sql_type():
+    assert REGISTRY.sql_type({'type': 'VARCHAR(10)'}) is None
+
+
+def test_dialect_overrides_fall_back_to_generic():
+    assert REGISTRY.sql_type({'type': 'Decimal128'}, 'mysql').scale == 30
+    assert REGISTRY.converter({'type': 'ObjectId'}, 'oracle') is REGISTRY.converter({'type': 'ObjectId'})
+
+
+@pytest.mark.parametrize('type_name, value, dialect, stored', [
+    ('ObjectId', ObjectId('65f0a0a0a0a0a0a0a0a0a0a0'), '', '65f0a0a0a0a0a0a0a0a0a0a0'),
+    ('UUID', uuid.UUID(int=1), '', '00000000-0000-0000-0000-000000000001'),
+    ('Decimal128', Decimal128('1.50'), '', '1.50'),
+    ('Decimal128', Decimal128('1.50'), 'postgresql', Decimal('1.50')),
+    ('Int64', Int64(7), '', 7),
+    ('Timestamp', Timestamp(1700000000, 3), '', (1700000000 << 32) | 3),
+    ('datetime', datetime(2024, 1, 1, 12, tzinfo=timezone(timedelta(hours=2))), '', datetime(2024, 1, 1, 10)),
+])
+def test_values_round_trip(type_name, value, dialect, stored):
+    info = {'type': type_name, 'types': [type_name]}
+    to_sql = REGISTRY.converter(info, dialect)
+    converted = to_sql(value) if to_sql else value
+    assert converted == stored
+    from_sql = REGISTRY.decoder(info, dialect)
+    if from_sql and type_name != 'datetime':
+        assert from_sql(converted) == value
+
+
+def test_single_type_columns_bind_as_they_are():
+    assert REGISTRY.converter({'type': 'str', 'types': ['str', 'NoneType']}) is None
+    assert REGISTRY.converter({'type': 'int'}) is None
+
+
+def test_mixed_columns_convert_each_value_by_class():
+    convert = REGISTRY.converter({'type': 'str', 'types': ['str', 'ObjectId', 'dict', 'Int64']})
+    oid = ObjectId()
+    assert [convert(v) for v in ('a', oid, {'k': [1]}, Int64(3), None)] == ['a', str(oid), '{"k":[1]}', 3, None]
+
+
+def test_register_replaces_a_conversion_for_compiled_dispatch():
+    registry = TypeRegistry()
+    registry.register('ObjectId', Conversion(lambda info: String(24), str))
+    convert = registry.value_converter()
+    oid = ObjectId()
+    assert convert(oid) == str(oid)
+    registry.register('ObjectId', OBJECT_ID_BINARY)
+    assert convert(oid) == oid.binary
+    assert isinstance(registry.sql_type({'type': 'ObjectId'}), BINARY)
+
+
+def test_json_encoders_agree():
+    value = {'name': 'é', 'when': datetime(2024, 1, 1), 'big': 2 ** 70, 'nested': [{'a': None}]}
+    assert conversions.json_dumps(value) == conversions._std_json_dumps(value)
+    assert conversions.json_loads(conversions.json_dumps({'a': [1, 2]})) == {'a': [1, 2]}
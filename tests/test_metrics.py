@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from migrator import Migrator
+from utils.metrics import Histogram, MetricsRegistry, get_registry
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram((1, 10, 100))
+    for value in (0.5, 2, 3, 50, 500):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == 10 and histogram.quantile(1.0) == 500
+    assert histogram.summary()['mean'] == pytest.approx(111.1)
+
+
+def test_only_declared_metrics_are_recorded():
+    registry = MetricsRegistry()
+    with pytest.raises(KeyError):
+        registry.inc('etl_unknown_total')
+    with pytest.raises(KeyError):
+        registry.inc('etl_load_insert_seconds')
+
+
+def test_worker_snapshots_merge_into_the_parent():
+    parent, worker = MetricsRegistry(), MetricsRegistry()
+    parent.inc('etl_load_rows_total', 10)
+    worker.inc('etl_load_rows_total', 5)
+    worker.observe('etl_load_batch_rows', 5)
+
+    parent.merge(worker.take())
+
+    assert parent.counters['etl_load_rows_total'] == 15
+    assert parent.histograms['etl_load_batch_rows'].count == 1
+    assert worker.counters == {} and worker.histograms == {}
+
+
+def test_prometheus_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    for rows in (5, 5, 200):
+        registry.observe('etl_load_batch_rows', rows)
+
+    lines = registry.to_prometheus().splitlines()
+
+    assert 'etl_load_batch_rows_bucket{le="10"} 2' in lines
+    assert 'etl_load_batch_rows_bucket{le="250"} 3' in lines
+    assert 'etl_load_batch_rows_count 3' in lines
+    assert '# TYPE etl_process_rss_bytes gauge' in lines
+
+
+def test_migrate_records_stage_metrics(sqlite_uri, tmp_path):
+    documents = [{'_id': f"{i:024d}", 'name': f"item{i}"} for i in range(300)]
+    registry = get_registry()
+    before = registry.snapshot()
+
+    Migrator(SQLConnector(sqlite_uri), MemorySource({'items': documents})).migrate(
+        'items', 'items', batch_size=100, checkpoint=False)
+
+    path = tmp_path / 'metrics.json'
+    registry.write(str(path))
+    after = json.loads(path.read_text())
+    assert after['counters']['etl_load_rows_total'] - before['counters'].get('etl_load_rows_total', 0) == 300
+    batches = before['histograms'].get('etl_load_batch_rows', {'count': 0})['count']
+    assert after['histograms']['etl_load_batch_rows']['count'] - batches == 3
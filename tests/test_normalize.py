@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import text
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from migrator import Migrator
+
+
+def order(i):
+    return {
+        '_id': f"{i:024d}",
+        'customer': {'name': f"c{i}", 'tags': ['a', 'b']},
+        'lines': [{'sku': f"s{j}", 'serials': list(range(j))} for j in range(i % 4)],
+    }
+
+
+def count(connector, table):
+    with connector.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+@pytest.fixture
+def normalized(sqlite_uri):
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'orders': [order(i) for i in range(10)]}))
+    migrator.normalize = True
+    migrator.migrate('orders', 'orders', batch_size=3, checkpoint=False)
+    target.connect()
+    return target, migrator
+
+
+def test_every_array_becomes_a_child_table(normalized):
+    target, migrator = normalized
+
+    expected = {'orders_customer_tags': 20, 'orders_lines': 13, 'orders_lines_serials': 8}
+    assert migrator.child_report() == expected
+    assert {table: count(target, table) for table in expected} == expected
+    assert count(target, 'orders') == 10
+
+
+def test_child_keys_point_at_their_parent_row(normalized):
+    target, _ = normalized
+
+    with target.engine.connect() as conn:
+        lines = conn.execute(text("SELECT _id, _parent_id, _idx, sku FROM orders_lines WHERE _parent_id = :p "
+                                  "ORDER BY _idx"), {'p': f"{3:024d}"}).fetchall()
+        orphans = conn.execute(text("SELECT COUNT(*) FROM orders_lines_serials s LEFT JOIN orders_lines l "
+                                    "ON s._parent_id = l._id WHERE l._id IS NULL")).scalar()
+
+    parent = f"{3:024d}"
+    assert [tuple(line) for line in lines] == [(f"{parent}:{j}", parent, j, f"s{j}") for j in range(3)]
+    assert orphans == 0
+    assert [fk['referred_table'] for fk in target.inspector.get_foreign_keys('orders_lines_serials')] == [
+        'orders_lines']
@@ -0,0 +1,35 @@
+import pytest
+from bson import ObjectId
+from sqlalchemy import text
+
+from benchmarks.memory_source import MemorySource
+from migrator.pipeline import PipelineContext, migrate_step
+
+
+@pytest.fixture
+def context(sqlite_uri):
+    documents = [{'_id': ObjectId(i.to_bytes(12, 'big')), 'name': f"item{i}", 'qty': -1 if i % 10 == 0 else i}
+                 for i in range(500)]
+    context = PipelineContext(None, sqlite_uri, 'items', 'items', batch_size=100,
+                              source=MemorySource({'items': documents}))
+    yield context
+    context.close()
+
+
+def test_migrate_step_counts_rows_written(context, tmp_path):
+    context.target.connect()
+    with context.target.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (_id VARCHAR(24) PRIMARY KEY, name TEXT, qty BIGINT CHECK (qty >= 0))"))
+    context.migrator.dead_letter = str(tmp_path / 'dead_letter.jsonl')
+
+    result = migrate_step(context)
+
+    assert result['rows'] == 450 and result['report']['transform']['rows'] == 500
+
+
+def test_dry_run_writes_no_rows(context):
+    context.dry_run = True
+
+    result = migrate_step(context)
+
+    assert result['rows'] == 0 and result['report']['transform']['rows'] == 500
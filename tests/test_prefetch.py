@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+from bson import ObjectId
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from migrator import Migrator
+from migrator.prefetch import QueueStats, prefetch
+
+
+class Failed(Exception):
+    pass
+
+
+def stage_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('etl-')]
+
+
+def test_items_arrive_in_order_and_are_counted():
+    stats = QueueStats('extract')
+
+    assert list(prefetch(iter(range(100)), 2, stats)) == list(range(100))
+    assert stats.items == 100 and stats.depth == 2
+
+
+def test_producer_errors_reach_the_consumer():
+    def produce():
+        yield 1
+        raise Failed()
+
+    items = prefetch(produce(), 2, QueueStats('extract'))
+
+    assert next(items) == 1
+    with pytest.raises(Failed):
+        next(items)
+    assert stage_threads() == []
+
+
+def test_closing_the_consumer_stops_and_closes_the_producer():
+    closed = threading.Event()
+
+    def produce():
+        try:
+            for i in range(10 ** 6):
+                yield i
+        finally:
+            closed.set()
+
+    items = prefetch(produce(), 2, QueueStats('extract'))
+    assert next(items) == 0
+    items.close()
+
+    assert closed.is_set() and stage_threads() == []
+
+
+def test_a_failing_load_shuts_the_stage_threads_down(sqlite_uri):
+    documents = [{'_id': ObjectId(i.to_bytes(12, 'big')), 'name': f"item{i}"} for i in range(1000)]
+    migrator = Migrator(SQLConnector(sqlite_uri), MemorySource({'items': documents}))
+    migrator.queue_depth = 1
+
+    def fail(rows):
+        raise Failed()
+
+    with pytest.raises(Failed):
+        migrator.migrate('items', 'items', batch_size=10, progress_callback=fail)
+    assert stage_threads() == []
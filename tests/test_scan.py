@@ -0,0 +1,58 @@
+import pytest
+from bson import ObjectId
+from sqlalchemy import text
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from connectors.mongodb import key_type
+from migrator import Migrator
+from migrator.checkpoint import CheckpointStore
+
+
+@pytest.fixture
+def documents():
+    ids = [ObjectId(i.to_bytes(12, 'big')) for i in range(50)] + [f"legacy{i}" for i in range(30)] + list(range(20))
+    return [{'_id': _id, 'name': f"item{i}"} for i, _id in enumerate(ids)]
+
+
+def count(connector, table):
+    with connector.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_numbers_share_one_bracket():
+    assert {key_type(1), key_type(2.5), key_type(2 ** 70)} == {'number'}
+    assert key_type(True) == 'bool' and key_type(ObjectId()) == 'ObjectId'
+
+
+def test_mixed_keys_fall_back_to_natural_order(sqlite_uri, documents):
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'items': documents}))
+
+    report = migrator.migrate('items', 'items', batch_size=15)
+
+    assert report['load']['rows'] == count(target, 'items') == 100
+    assert any('several types' in warning for warning in migrator.scan_warnings)
+    assert CheckpointStore(target.engine).load('items:items') == []
+
+
+@pytest.mark.parametrize('options', [{'workers': 2}, {'resume': True}, {'scan_mode': 'keyset'}])
+def test_mixed_keys_refuse_key_ranges(sqlite_uri, documents, options):
+    migrator = Migrator(SQLConnector(sqlite_uri), MemorySource({'items': documents}))
+    migrator.scan_mode = options.pop('scan_mode', 'auto')
+
+    with pytest.raises(ValueError, match="several types"):
+        migrator.migrate('items', 'items', batch_size=15, **options)
+
+
+def test_natural_scan_runs_without_checkpoints(sqlite_uri, documents):
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'items': documents[:50]}))
+    migrator.scan_mode = 'natural'
+
+    migrator.migrate('items', 'items', batch_size=15)
+
+    assert count(target, 'items') == 50
+    assert CheckpointStore(target.engine).load('items:items') == []
+    with pytest.raises(ValueError, match="natural order"):
+        migrator.migrate('items', 'items', batch_size=15, resume=True)
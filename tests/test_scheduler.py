@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+
+import pytest
+from bson import ObjectId
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector, get_manager
+from migrator import Migrator
+from migrator.scheduler import Job, Scheduler, load_manifest
+
+
+class CountingSlots:
+    """A semaphore that remembers how many holders it had at once."""
+
+    def __init__(self, slots):
+        self.semaphore = threading.Semaphore(slots)
+        self.lock = threading.Lock()
+        self.held = 0
+        self.most = 0
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        with self.lock:
+            self.held += 1
+            self.most = max(self.most, self.held)
+        # widen the window in which another job could overlap
+        time.sleep(0.001)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self.lock:
+            self.held -= 1
+        self.semaphore.release()
+
+
+def test_two_jobs_writing_one_table_are_rejected(tmp_path):
+    scheduler = Scheduler('mongodb://localhost:27017/etl', f"sqlite:///{tmp_path / 'target.db'}")
+
+    with pytest.raises(ValueError, match="More than one job writes to items"):
+        scheduler.run([Job('items'), Job('legacy_items', 'items'), Job('orders')])
+
+
+def test_sqlite_targets_get_one_writer(tmp_path):
+    scheduler = Scheduler('mongodb://localhost:27017/etl', f"sqlite:///{tmp_path / 'target.db'}",
+                          max_jobs=4, max_readers=3, max_writers=4)
+    assert (scheduler.max_readers, scheduler.max_writers) == (3, 1)
+    with pytest.raises(ValueError):
+        Scheduler('mongodb://localhost:27017/etl', 'postgresql://localhost/etl', max_jobs=0)
+
+
+def test_jobs_share_the_read_and_write_caps(tmp_path):
+    read_slots, write_slots = CountingSlots(2), CountingSlots(1)
+    documents = [{'_id': ObjectId(i.to_bytes(12, 'big')), 'name': f"item{i}"} for i in range(500)]
+    migrators = []
+    for job in range(4):
+        migrator = Migrator(SQLConnector(f"sqlite:///{tmp_path / f'target{job}.db'}"),
+                            MemorySource({'items': documents}))
+        migrator.read_slots, migrator.write_slots = read_slots, write_slots
+        migrators.append(migrator)
+
+    try:
+        threads = [threading.Thread(target=m.migrate, args=('items', 'items'), kwargs={'batch_size': 50})
+                   for m in migrators]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        get_manager().close()
+
+    assert [m.report()['load']['rows'] for m in migrators] == [500] * 4
+    assert read_slots.most == 2 and write_slots.most == 1
+
+
+def test_manifest_defaults_apply_to_every_job(tmp_path):
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps({
+        'defaults': {'batch_size': 500, 'staging': True},
+        'jobs': ['users', {'collection': 'orders', 'table': 'sales', 'staging': False,
+                           'filter': {'_id': {'$gt': {'$oid': '65f0a0a0a0a0a0a0a0a0a0a0'}}}}],
+    }))
+
+    users, orders = load_manifest(str(path))
+
+    assert (users.table, users.batch_size, users.settings) == ('users', 500, {'staging': True})
+    assert (orders.table, orders.settings) == ('sales', {'staging': False})
+    assert orders.query == {'_id': {'$gt': ObjectId('65f0a0a0a0a0a0a0a0a0a0a0')}}
+
+
+def test_manifest_rejects_unknown_fields(tmp_path):
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps([{'collection': 'users', 'workers': 4}]))
+
+    with pytest.raises(ValueError, match="Unknown manifest fields: workers"):
+        load_manifest(str(path))
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from sqlalchemy import text
+
+from benchmarks.memory_source import MemorySource
+from connectors import SQLConnector
+from migrator import Migrator, SpillDirectory
+from migrator.spill import READERS, WRITERS, arrow_available
+
+FORMATS = ['etlc', pytest.param('arrow', marks=pytest.mark.skipif(not arrow_available(), reason="needs pyarrow"))]
+
+COLUMNS = ['_id', 'name', 'qty', 'price', 'when', 'mixed']
+ROWS = [
+    ('a', 'x', 1, 0.5, datetime(2024, 1, 1), 'x'),
+    ('b', None, 2 ** 40, None, None, 1),
+    ('c', 'é', -3, 2.25, datetime(2024, 1, 2, 3, 4, 5), None),
+    ('d', '', 0, 0.0, datetime(2024, 1, 3), {'k': [1, 'v']}),
+]
+
+
+def count(connector, table):
+    with connector.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+@pytest.mark.parametrize('spill_format', FORMATS)
+def test_chunk_files_round_trip(tmp_path, spill_format):
+    path = str(tmp_path / f"chunk.{spill_format}")
+    WRITERS[spill_format](path, COLUMNS, ROWS)
+
+    names, columns = READERS[spill_format](path)
+
+    assert names == COLUMNS
+    assert list(zip(*columns)) == ROWS
+
+
+def extract(tmp_path, documents, spill_format='etlc', batch_size=100):
+    spill_dir = str(tmp_path / 'spill')
+    migrator = Migrator(SpillDirectory(spill_dir), MemorySource({'items': documents}))
+    migrator.spill('items', spill_dir, batch_size=batch_size, spill_format=spill_format)
+    return spill_dir
+
+
+def documents(count, offset=0):
+    return [{'_id': ObjectId((offset + i).to_bytes(12, 'big')), 'name': f"item{offset + i}", 'qty': i}
+            for i in range(count)]
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_load(sqlite_uri, spill_dir):
+    def callback(rows):
+        raise Interrupted()
+    migrator = Migrator(SQLConnector(sqlite_uri), SpillDirectory(spill_dir))
+    migrator.queue_depth = 0
+    with pytest.raises(Interrupted):
+        migrator.load_spill(spill_dir, 'items', progress_callback=callback)
+
+
+def test_resume_refuses_a_newer_extract(tmp_path, sqlite_uri):
+    spill_dir = extract(tmp_path, documents(500))
+    interrupt_load(sqlite_uri, spill_dir)
+    extract(tmp_path, documents(500, offset=1000))
+
+    migrator = Migrator(SQLConnector(sqlite_uri), SpillDirectory(spill_dir))
+    with pytest.raises(ValueError, match="earlier extract"):
+        migrator.load_spill(spill_dir, 'items', resume=True)
+
+
+def test_resume_continues_after_the_last_loaded_chunk(tmp_path, sqlite_uri):
+    spill_dir = extract(tmp_path, documents(500))
+    interrupt_load(sqlite_uri, spill_dir)
+
+    migrator = Migrator(SQLConnector(sqlite_uri), SpillDirectory(spill_dir))
+    report = migrator.load_spill(spill_dir, 'items', resume=True)
+
+    assert migrator.resumed_rows == 100 and report['load']['rows'] == 400
+    assert count(migrator.target_connector, 'items') == 500
+
+
+@pytest.mark.parametrize('spill_format', FORMATS)
+def test_extract_and_load_round_trip(tmp_path, sqlite_uri, spill_format):
+    source = documents(250)
+    spill_dir = extract(tmp_path, source, spill_format=spill_format)
+
+    migrator = Migrator(SQLConnector(sqlite_uri), SpillDirectory(spill_dir))
+    report = migrator.load_spill(spill_dir, 'items')
+
+    assert report['load']['rows'] == 250
+    with migrator.target_connector.engine.connect() as conn:
+        loaded = conn.execute(text("SELECT _id, name, qty FROM items ORDER BY qty")).fetchall()
+    assert [tuple(row) for row in loaded] == [(str(doc['_id']), doc['name'], doc['qty']) for doc in source]
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from benchmarks.memory_source import MemorySource
+from connectors import MongoDBConnector, SQLConnector
+from migrator import Migrator
+from migrator.checkpoint import CheckpointStore
+from migrator.sync import sync_job, tail_job
+
+START = datetime(2024, 1, 1)
+
+
+def document(i, name=None, minutes=0):
+    return {'_id': f"{i:024d}", 'name': name or f"item{i}", 'updatedAt': START + timedelta(minutes=minutes or i)}
+
+
+def rows(connector):
+    with connector.engine.connect() as conn:
+        return dict(conn.execute(text("SELECT _id, name FROM items")).fetchall())
+
+
+class ChangeStream:
+    """A change stream replaying a fixed list of events, each with its own resume token."""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.resume_token = None
+        self.closed = False
+
+    @property
+    def alive(self):
+        return bool(self.events)
+
+    def try_next(self):
+        event = self.events.pop(0)
+        self.resume_token = event['_id']
+        return event
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingSource(MemorySource):
+    def __init__(self, collections, stream):
+        super().__init__(collections)
+        self.stream = stream
+        self.resume_tokens = []
+
+    def open_change_stream(self, collection_name, resume_token=None, max_await_ms=1000):
+        self.resume_tokens.append(resume_token)
+        return self.stream
+
+    iter_change_batches = MongoDBConnector.iter_change_batches
+
+
+def event(token, operation, i, name=None):
+    change = {'_id': {'_data': token}, 'operationType': operation, 'documentKey': {'_id': f"{i:024d}"}}
+    if operation != 'delete':
+        change['fullDocument'] = document(i, name)
+    return change
+
+
+def test_second_sync_reads_only_documents_past_the_watermark(sqlite_uri):
+    documents = [document(i) for i in range(1, 51)]
+    target = SQLConnector(sqlite_uri)
+    source = MemorySource({'items': documents})
+
+    Migrator(target, source).sync('items', 'items', batch_size=20)
+    checkpoint, = CheckpointStore(target.engine).load(sync_job('items', 'items'))
+    assert checkpoint.last_key == documents[-1]['updatedAt']
+
+    documents[9].update(document(10, 'renamed', minutes=100))
+    documents.append(document(51, minutes=101))
+    migrator = Migrator(target, source)
+    report = migrator.sync('items', 'items', batch_size=20)
+
+    # the document holding the previous watermark is re-read and upserted again
+    assert report['load']['rows'] == 3
+    synced = rows(target)
+    assert len(synced) == 51 and synced[f"{10:024d}"] == 'renamed'
+
+
+def test_follow_applies_the_last_change_per_key(sqlite_uri):
+    stream = ChangeStream([
+        event('t1', 'update', 1, 'first'),
+        event('t2', 'insert', 7, 'new'),
+        event('t3', 'update', 1, 'second'),
+        event('t4', 'delete', 2),
+        event('t5', 'drop', 0),
+    ])
+    target = SQLConnector(sqlite_uri)
+    source = StreamingSource({'items': [document(i) for i in range(1, 4)]}, stream)
+    migrator = Migrator(target, source)
+
+    migrator.sync('items', 'items', follow=True, batch_size=100, max_wait_seconds=60)
+
+    assert rows(target) == {f"{1:024d}": 'second', f"{3:024d}": 'item3', f"{7:024d}": 'new'}
+    assert migrator.deleted_rows == 1 and stream.closed
+    checkpoint, = CheckpointStore(target.engine).load(tail_job('items', 'items'))
+    assert checkpoint.last_key == {'_data': 't5'}
+
+    Migrator(target, source).open_tail('items', 'items')
+    assert source.resume_tokens == [None, {'_data': 't5'}]
+
+
+def test_sync_refuses_normalize(sqlite_uri):
+    migrator = Migrator(SQLConnector(sqlite_uri), MemorySource({'items': []}))
+    migrator.normalize = True
+    with pytest.raises(ValueError, match="normalize"):
+        migrator.sync('items', 'items')
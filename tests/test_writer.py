@@ -0,0 +1,162 @@
+import json
+
+import pytest
+import typer
+from sqlalchemy import text
+
+from benchmarks.memory_source import MemorySource
+from cli import check_rejected
+from connectors import SQLConnector
+from migrator import Migrator
+
+CREATE = "CREATE TABLE items (_id VARCHAR(24) PRIMARY KEY, name TEXT, qty BIGINT CHECK (qty >= 0))"
+
+
+@pytest.fixture
+def target(sqlite_uri):
+    connector = SQLConnector(sqlite_uri)
+    connector.connect()
+    with connector.engine.begin() as conn:
+        conn.execute(text(CREATE))
+    yield connector
+    connector.disconnect()
+
+
+def count(connector, table):
+    with connector.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_bisect_isolates_bad_rows(target):
+    rows = [(f"{i:024d}", f"item{i}", -1 if i in (3, 17, 18) else i) for i in range(32)]
+
+    with target.session() as session:
+        result = session.insert('items', ['_id', 'name', 'qty'], rows, isolate=True)
+
+    assert result.rows == 29
+    assert [index for index, _ in result.rejected] == [3, 17, 18]
+    assert count(target, 'items') == 29
+
+
+def test_without_isolate_a_bad_row_fails_the_batch(target):
+    rows = [(f"{i:024d}", f"item{i}", -1 if i == 5 else i) for i in range(10)]
+
+    with pytest.raises(Exception):
+        with target.session() as session:
+            session.insert('items', ['_id', 'name', 'qty'], rows)
+    assert count(target, 'items') == 0
+
+
+def test_migrate_dead_letters_rejected_rows(target, tmp_path):
+    documents = [{'_id': f"{i:024d}", 'name': f"item{i}", 'qty': -i if i % 10 == 0 else i} for i in range(1, 101)]
+    dead_letter = tmp_path / 'dead_letter.jsonl'
+    migrator = Migrator(target, MemorySource({'items': documents}))
+    migrator.dead_letter = str(dead_letter)
+
+    report = migrator.migrate('items', 'items', batch_size=25, checkpoint=False)
+
+    assert report['load']['rows'] == count(target, 'items') == 90
+    assert migrator.commit_report()['rejected'] == 10
+    records = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert sorted(record['row']['qty'] for record in records) == sorted(-i for i in range(10, 101, 10))
+    with pytest.raises(typer.Exit):
+        check_rejected(migrator.commit_report(), str(dead_letter))
+
+
+def test_staged_normalized_tables_keep_foreign_keys_on_sqlite(sqlite_uri):
+    documents = [{'_id': f"{i:024d}", 'lines': [{'sku': f"s{j}", 'qty': j} for j in range(3)]} for i in range(40)]
+    target = SQLConnector(sqlite_uri)
+    migrator = Migrator(target, MemorySource({'orders': documents}))
+    migrator.staging = True
+    migrator.normalize = True
+
+    for _ in range(2):
+        migrator.migrate('orders', 'orders', batch_size=10, checkpoint=False)
+
+    target.connect()
+    assert [fk['referred_table'] for fk in target.inspector.get_foreign_keys('orders_lines')] == ['orders']
+    with target.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA foreign_key_check").fetchall() == []
+    assert count(target, 'orders_lines') == 120
+
+
+def test_replay_keeps_records_of_jobs_sharing_ids(target, tmp_path):
+    with target.engine.begin() as conn:
+        conn.execute(text(CREATE.replace('items', 'others')))
+    dead_letter = str(tmp_path / 'dead_letter.jsonl')
+    source = MemorySource({name: [{'_id': i, 'name': f"{name}{i}", 'qty': -1 if i % 2 else i} for i in range(1, 7)]
+                           for name in ('items', 'others')})
+    for name in ('items', 'others'):
+        migrator = Migrator(target, source)
+        migrator.dead_letter = dead_letter
+        migrator.migrate(name, name, batch_size=10, checkpoint=False)
+
+    result = Migrator(target, source).replay(dead_letter, refetch=False)
+
+    assert result == {'records': 6, 'written': 0, 'failing': 6}
+    records = [json.loads(line) for line in open(dead_letter)]
+    assert sorted((record['table'], record['_id']) for record in records) == [
+        (table, i) for table in ('items', 'others') for i in (1, 3, 5)]
+
+
+def test_staged_load_leaves_the_shared_pool_durable(sqlite_uri):
+    documents = [{'_id': f"{i:024d}", 'name': f"item{i}", 'qty': i} for i in range(50)]
+    target = SQLConnector(sqlite_uri)
+    target.connect()
+    pool = target.engine.pool
+    with target.engine.connect() as conn:
+        default = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+    migrator = Migrator(target, MemorySource({'items': documents}))
+    migrator.staging = True
+
+    migrator.migrate('items', 'items', batch_size=10, checkpoint=False)
+
+    assert target.engine.pool is pool
+    with target.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == default
+    assert count(target, 'items') == 50
+
+
+def batches(count, size=10, bad=()):
+    return [[(f"{b * size + i:024d}", f"item{i}", -1 if b in bad else i) for i in range(size)] for b in range(count)]
+
+
+@pytest.mark.parametrize('commit_rows, commits, max_commit_rows', [(25, 4, 30), (0, 10, 10)])
+def test_session_commits_on_the_row_interval(target, commit_rows, commits, max_commit_rows):
+    with target.session(commit_rows=commit_rows, commit_seconds=0) as session:
+        for rows in batches(10):
+            session.insert('items', ['_id', 'name', 'qty'], rows)
+        stats = session.stats
+
+    assert count(target, 'items') == 100
+    assert (stats.commits, stats.max_commit_rows, stats.batches) == (commits, max_commit_rows, 10)
+
+
+def test_a_failing_batch_rolls_back_alone(target):
+    with target.session(commit_rows=1000, commit_seconds=0) as session:
+        for rows in batches(3, bad=(1,)):
+            try:
+                session.insert('items', ['_id', 'name', 'qty'], rows)
+            except Exception:
+                pass
+        stats = session.stats
+
+    assert count(target, 'items') == 20
+    assert (stats.commits, stats.rollbacks) == (1, 1)
+
+
+def test_negative_commit_intervals_are_rejected(target):
+    with pytest.raises(ValueError):
+        target.session(commit_rows=-1)
+
+
+def test_migrate_commits_every_commit_rows(target):
+    documents = [{'_id': f"{i:024d}", 'name': f"item{i}", 'qty': i} for i in range(1000)]
+    migrator = Migrator(target, MemorySource({'items': documents}))
+    migrator.commit_rows = 300
+    migrator.commit_seconds = 0
+
+    migrator.migrate('items', 'items', batch_size=100, checkpoint=False)
+
+    report = migrator.commit_report()
+    assert (report['commits'], report['max_commit_rows'], report['batches']) == (4, 300, 10)